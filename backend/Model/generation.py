@@ -0,0 +1,244 @@
+import json
+import time
+from config import Config
+import metrics
+
+# Per-role generation settings. max_new_tokens can be overridden with
+# GENERATION_BUDGETS, e.g. "search=400,gap_analysis=300".
+GENERATION_PROFILES = {
+    "search": {
+        "max_new_tokens": 500,
+        "do_sample": True,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "stop_on_json_array": False
+    },
+    "gap_analysis": {
+        "max_new_tokens": 400,
+        "do_sample": True,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "stop_on_json_array": True
+    },
+    "topic_gap_analysis": {
+        "max_new_tokens": 300,
+        "do_sample": True,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "stop_on_json_array": True
+    },
+    "gap_naming": {
+        "max_new_tokens": 16,
+        "do_sample": False,
+        "temperature": None,
+        "top_p": None,
+        "stop_on_json_array": False
+    }
+}
+
+generations_total = metrics.counter(
+    "llm_generations_total", "LLM generate calls", ["role"])
+generated_tokens_total = metrics.counter(
+    "llm_generated_tokens_total", "Tokens produced by the LLM", ["role"])
+wasted_decode_steps_total = metrics.counter(
+    "llm_wasted_decode_steps_total", "Tokens decoded after the useful answer had already ended", ["role"])
+early_stops_total = metrics.counter(
+    "llm_early_stops_total", "Generations ended early by a stopping criterion", ["role"])
+budget_exhausted_total = metrics.counter(
+    "llm_budget_exhausted_total", "Generations that used the full max_new_tokens budget", ["role"])
+time_to_first_token_seconds = metrics.histogram(
+    "llm_time_to_first_token_seconds", "Time from the start of generate to the first new token", ["role"])
+generation_seconds = metrics.histogram(
+    "llm_generation_seconds", "Wall time of LLM generate calls", ["role"])
+tokens_per_second = metrics.histogram(
+    "llm_tokens_per_second", "Generated tokens per second of generate time", ["role"],
+    buckets=(1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500))
+
+
+def get_generation_profile(system_role):
+    """
+    Return the generation settings for a role, with budget overrides and the assisted flag applied
+    """
+    profile = dict(GENERATION_PROFILES.get(system_role, GENERATION_PROFILES["search"]))
+    if system_role in Config.GENERATION_BUDGETS:
+        profile["max_new_tokens"] = Config.GENERATION_BUDGETS[system_role]
+    profile["assisted"] = system_role in Config.ASSISTED_DECODING_ROLES
+    return profile
+
+
+# Characters that may appear outside strings inside a JSON array (structure, numbers, true/false/null)
+JSON_STRUCTURE_CHARS = set(" \t\r\n[]{},:-+.0123456789eEtrufalsn")
+
+
+class JsonArrayTracker:
+    def __init__(self):
+        """
+        Incrementally scan generated text for the first complete top-level JSON array
+        """
+        self.text = ""
+        self.end = None
+        self._scanned = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def closed(self):
+        return self.end is not None
+
+    def feed(self, chunk):
+        """
+        Add newly generated text. Returns True once a balanced array that parses as JSON has closed.
+        """
+        if self.closed:
+            return True
+
+        self.text += chunk
+        while self._scanned < len(self.text):
+            char = self.text[self._scanned]
+            self._scanned += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._start is None:
+                if char == "[":
+                    self._start = self._scanned - 1
+                    self._depth = 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        json.loads(self.text[self._start:self._scanned])
+                    except json.JSONDecodeError:
+                        # Prose like "[see below]" - keep looking for the real array
+                        self._restart()
+                        continue
+                    self.end = self._scanned
+                    return True
+            elif char not in JSON_STRUCTURE_CHARS:
+                # Prose, possibly with a stray quote that was taken for a string: not this array
+                self._restart()
+
+        return False
+
+    def _restart(self):
+        """
+        Drop the current candidate and rescan from just after its opening bracket
+        """
+        self._scanned = self._start + 1
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+
+def find_json_array_end(text):
+    """
+    Character offset just past the first complete JSON array in text, or None
+    """
+    tracker = JsonArrayTracker()
+    tracker.feed(text)
+    return tracker.end
+
+
+class JsonArrayStoppingCriteria:
+    def __init__(self, tokenizer):
+        """
+        transformers stopping criterion that ends generation once a JSON array has closed
+        """
+        self.tokenizer = tokenizer
+        self.tracker = JsonArrayTracker()
+        self.prompt_len = None
+        self.triggered = False
+
+    def should_stop(self, generated_ids):
+        """
+        Check the generated token ids (prompt excluded) for a closed array
+        """
+        text = self.tokenizer.decode(generated_ids, skip_special_tokens=True)
+        # Decoding the whole generation keeps multi-byte characters intact at token boundaries
+        self.triggered = self.tracker.feed(text[len(self.tracker.text):])
+        return self.triggered
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self.prompt_len is None:
+            # First call happens after the first new token was appended
+            self.prompt_len = input_ids.shape[1] - 1
+        stop = self.should_stop(input_ids[0, self.prompt_len:].tolist())
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
+
+
+class GenerationTimer:
+    def __init__(self):
+        """
+        Streamer for generate() that notes when the first new token arrives.
+        Follows the transformers streamer protocol: the first put() is the prompt.
+        """
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished = None
+        self._prompt_seen = False
+
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True
+        elif self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def end(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        return self.first_token_at - self.started if self.first_token_at is not None else None
+
+    @property
+    def elapsed(self):
+        return (self.finished if self.finished is not None else time.perf_counter()) - self.started
+
+
+def record_generation(system_role, tokenizer, generated_text, profile, early_stopped, timer=None):
+    """
+    Update generation metrics, including decode steps spent after the answer ended
+    and, with a GenerationTimer, time to first token and tokens per second
+    """
+    generated_tokens = len(tokenizer.encode(generated_text, add_special_tokens=False))
+    wasted = 0
+    if profile.get("stop_on_json_array"):
+        end = find_json_array_end(generated_text)
+        if end is not None and generated_text[end:].strip():
+            wasted = len(tokenizer.encode(generated_text[end:], add_special_tokens=False))
+
+    generations_total.inc(role=system_role)
+    generated_tokens_total.inc(generated_tokens, role=system_role)
+    wasted_decode_steps_total.inc(wasted, role=system_role)
+    if early_stopped:
+        early_stops_total.inc(role=system_role)
+    elif generated_tokens >= profile["max_new_tokens"]:
+        budget_exhausted_total.inc(role=system_role)
+
+    if timer is not None:
+        elapsed = timer.elapsed
+        generation_seconds.observe(elapsed, role=system_role)
+        if timer.time_to_first_token is not None:
+            time_to_first_token_seconds.observe(timer.time_to_first_token, role=system_role)
+        if elapsed > 0:
+            tokens_per_second.observe(generated_tokens / elapsed, role=system_role)
+
+    return {"generated_tokens": generated_tokens, "wasted_decode_steps": wasted}
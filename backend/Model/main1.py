@@ -1,15 +1,22 @@
-from transformers import pipeline
-import torch
 import json
+import components
+from config import Config
+from Model.prompt_lookup import prompt_lookup_generate
+from Model.generation import GenerationTimer, get_generation_profile, JsonArrayStoppingCriteria, record_generation
 
-modelPath = "D:\\Projects\\KAI-Project\\KAI-Project\\backend\\Model"
+def load_pipeline():
+    """
+    Build the text-generation pipeline. Called once through the 'llm' component.
+    """
+    import torch
+    from transformers import pipeline
 
-pipe = pipeline(
-    "text-generation",
-    model=modelPath,
-    torch_dtype=torch.bfloat16,
-    device_map="auto",
-)
+    return pipeline(
+        "text-generation",
+        model=Config.LLM_MODEL_PATH,
+        torch_dtype=torch.bfloat16,
+        device_map="auto",
+    )
 
 # Predefined system contexts for different use cases
 SYSTEM_CONTEXTS = {
@@ -33,11 +40,23 @@ SYSTEM_CONTEXTS = {
         "Consider prerequisites, practical applications, and industry best practices. "
         "Format your response as a JSON array of objects with 'topic' and 'reason' fields. "
         "Focus on specific, actionable topics that would enhance understanding of the main subject."
+    ),
+    "gap_naming": (
+        "You name topics. You are given search queries that users asked and the knowledge base could not answer well. "
+        "Reply with a short topic name (at most six words) that covers the queries, and nothing else."
     )
 }
 
+def format_passages(passages):
+    passages_text = "\nRelevant passages (answer from these and cite the document and page):\n"
+    for i, passage in enumerate(passages, 1):
+        passages_text += f"\n[{i}] '{passage.get('title') or 'Untitled'}', page {passage['page']}:\n{passage['text']}\n"
+    return passages_text
+
 def format_document_context(context):
     if not context.get("relevant_documents"):
+        if context.get("passages"):
+            return format_passages(context["passages"])
         return "No relevant documents found in the knowledge base."
     
     # Sort documents by score
@@ -59,12 +78,40 @@ def format_document_context(context):
             context_text += f"   Keywords: {', '.join(doc['keywords'])}\n"
             if doc.get('matched_keywords'):
                 context_text += f"   Matched terms: {', '.join(doc['matched_keywords'])}\n"
-        elif doc["doc_type"] == "summary" and doc.get("summary_content"):
+        elif doc["doc_type"] == "summary":
             context_text += f"   Type: Chat Summary\n"
+
+    if context.get("passages"):
+        context_text += format_passages(context["passages"])
     
     return context_text
 
-def chat_with_ai(prompt, context=None, system_role="search"):
+def generate_assisted(pipe, messages, max_new_tokens, stopping_criteria=None, streamer=None):
+    """
+    Generate a reply with prompt-lookup assisted decoding (greedy, no draft model)
+    """
+    tokenizer = pipe.tokenizer
+    input_ids = tokenizer.apply_chat_template(
+        messages, add_generation_prompt=True, return_tensors="pt"
+    ).to(pipe.model.device)
+
+    eos_token_ids = pipe.model.generation_config.eos_token_id
+    if not isinstance(eos_token_ids, list):
+        eos_token_ids = [eos_token_ids]
+
+    new_tokens, _ = prompt_lookup_generate(
+        pipe.model,
+        input_ids,
+        max_new_tokens=max_new_tokens,
+        eos_token_ids=eos_token_ids,
+        max_ngram_size=Config.PROMPT_LOOKUP_NGRAM_SIZE,
+        num_pred_tokens=Config.PROMPT_LOOKUP_NUM_TOKENS,
+        stopping_criteria=stopping_criteria,
+        streamer=streamer
+    )
+    return tokenizer.decode(new_tokens, skip_special_tokens=True)
+
+def chat_with_ai(prompt, context=None, system_role="search", assisted=None):
     try:
         # Get the appropriate system context
         system_content = SYSTEM_CONTEXTS.get(system_role, SYSTEM_CONTEXTS["search"])
@@ -97,18 +144,44 @@ def chat_with_ai(prompt, context=None, system_role="search"):
         ]
 
         # Generate response
-        response = pipe(
-            messages,
-            max_new_tokens=500,
-            num_return_sequences=1,
-            temperature=0.7,
-            pad_token_id=pipe.tokenizer.eos_token_id,
-            do_sample=True,
-            top_p=0.9
+        pipe = components.get("llm")
+        profile = get_generation_profile(system_role)
+        if assisted is None:
+            assisted = profile["assisted"]
+
+        stopping_criteria = JsonArrayStoppingCriteria(pipe.tokenizer) if profile["stop_on_json_array"] else None
+        timer = GenerationTimer()
+
+        if assisted:
+            generated_text = generate_assisted(
+                pipe, messages, max_new_tokens=profile["max_new_tokens"], stopping_criteria=stopping_criteria,
+                streamer=timer
+            )
+        else:
+            from transformers import StoppingCriteriaList
+
+            response = pipe(
+                messages,
+                max_new_tokens=profile["max_new_tokens"],
+                num_return_sequences=1,
+                temperature=profile["temperature"],
+                pad_token_id=pipe.tokenizer.eos_token_id,
+                do_sample=profile["do_sample"],
+                top_p=profile["top_p"],
+                stopping_criteria=StoppingCriteriaList([stopping_criteria]) if stopping_criteria else None,
+                streamer=timer
+            )
+            
+            # Extract the generated text
+            generated_text = response[0]['generated_text'][-1]['content']
+
+        record_generation(
+            system_role, pipe.tokenizer, generated_text, profile,
+            early_stopped=stopping_criteria is not None and stopping_criteria.triggered,
+            timer=timer
         )
         
-        # Extract the generated text and clean it
-        generated_text = response[0]['generated_text'][-1]['content']
+        # Clean the generated text
         
         # Clean up duplicate text and format
         cleaned_text = generated_text.strip()
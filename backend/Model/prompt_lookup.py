@@ -0,0 +1,142 @@
+import threading
+
+
+def find_draft_tokens(token_ids, max_ngram_size=3, num_pred_tokens=10):
+    """
+    Draft the next tokens by copying from the prompt (prompt-lookup decoding).
+
+    Looks for the most recent earlier occurrence of the trailing n-gram of
+    token_ids (longest n first) and returns the tokens that followed it.
+    Returns an empty list when nothing matches.
+    """
+    length = len(token_ids)
+    for ngram_size in range(min(max_ngram_size, length - 1), 0, -1):
+        ngram = token_ids[-ngram_size:]
+        # Scan backwards so the most recent match wins
+        for start in range(length - ngram_size - 1, -1, -1):
+            if token_ids[start:start + ngram_size] == ngram:
+                follow_start = start + ngram_size
+                return list(token_ids[follow_start:follow_start + num_pred_tokens])
+    return []
+
+
+class AssistedDecodingStats:
+    def __init__(self):
+        """
+        Running totals for prompt-lookup decoding
+        """
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.forward_passes = 0
+        self.generated_tokens = 0
+        self.drafted_tokens = 0
+        self.accepted_tokens = 0
+
+    def record(self, forward_passes, generated_tokens, drafted_tokens, accepted_tokens):
+        with self._lock:
+            self.calls += 1
+            self.forward_passes += forward_passes
+            self.generated_tokens += generated_tokens
+            self.drafted_tokens += drafted_tokens
+            self.accepted_tokens += accepted_tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "forward_passes": self.forward_passes,
+                "generated_tokens": self.generated_tokens,
+                "drafted_tokens": self.drafted_tokens,
+                "accepted_tokens": self.accepted_tokens,
+                "accepted_ratio": self.accepted_tokens / self.drafted_tokens if self.drafted_tokens else 0.0,
+                "tokens_per_forward": self.generated_tokens / self.forward_passes if self.forward_passes else 0.0
+            }
+
+
+assisted_stats = AssistedDecodingStats()
+
+
+def prompt_lookup_generate(model, input_ids, max_new_tokens, eos_token_ids,
+                           max_ngram_size=3, num_pred_tokens=10, stopping_criteria=None, streamer=None):
+    """
+    Greedy generation where draft tokens copied from the prompt are verified
+    by the model in a single forward pass.
+
+    Every step runs the model once over [last token + draft]. The longest
+    prefix of the draft that matches the model's own greedy choice is kept,
+    plus the model's next token, so the output is identical to plain greedy
+    decoding while needing fewer forward passes when the answer quotes the
+    prompt.
+
+    Args:
+        model: a causal LM (transformers PreTrainedModel)
+        input_ids: prompt tensor of shape (1, prompt_len)
+        max_new_tokens: generation budget
+        eos_token_ids: collection of token ids that end generation
+        stopping_criteria: optional object with should_stop(generated_ids) -> bool
+        streamer: optional transformers-style streamer; gets the prompt, then each step's new tokens
+
+    Returns:
+        (list of generated token ids, dict of per-call stats)
+    """
+    import torch
+    from transformers import DynamicCache
+
+    eos_token_ids = set(eos_token_ids or [])
+    token_ids = input_ids[0].tolist()
+    prompt_len = len(token_ids)
+    past_key_values = DynamicCache()
+    cached_len = 0
+    forward_passes = drafted = accepted = 0
+    if streamer is not None:
+        streamer.put(input_ids.cpu())
+
+    with torch.no_grad():
+        while len(token_ids) - prompt_len < max_new_tokens:
+            remaining = max_new_tokens - (len(token_ids) - prompt_len)
+            draft = find_draft_tokens(token_ids, max_ngram_size, min(num_pred_tokens, remaining - 1))
+
+            step_input = torch.tensor([token_ids[cached_len:] + draft], device=input_ids.device)
+            outputs = model(input_ids=step_input, past_key_values=past_key_values, use_cache=True)
+            past_key_values = outputs.past_key_values
+            forward_passes += 1
+
+            # Greedy choices at the last real token and at every draft position
+            predicted = outputs.logits[0, -(len(draft) + 1):].argmax(dim=-1).tolist()
+
+            n_matches = 0
+            while n_matches < len(draft) and draft[n_matches] == predicted[n_matches]:
+                n_matches += 1
+            drafted += len(draft)
+            accepted += n_matches
+
+            new_tokens = draft[:n_matches] + [predicted[n_matches]]
+            for i, token in enumerate(new_tokens):
+                if token in eos_token_ids:
+                    new_tokens = new_tokens[:i + 1]
+                    break
+            token_ids.extend(new_tokens)
+            if streamer is not None:
+                streamer.put(torch.tensor(new_tokens))
+
+            if new_tokens[-1] in eos_token_ids:
+                break
+            if stopping_criteria is not None and stopping_criteria.should_stop(token_ids[prompt_len:]):
+                break
+
+            # Drop cache entries for rejected draft tokens; the newest token is fed next step
+            cached_len = len(token_ids) - 1
+            past_key_values.crop(cached_len)
+
+    if streamer is not None:
+        streamer.end()
+
+    generated = token_ids[prompt_len:]
+    stats = {
+        "forward_passes": forward_passes,
+        "generated_tokens": len(generated),
+        "drafted_tokens": drafted,
+        "accepted_tokens": accepted
+    }
+    assisted_stats.record(**stats)
+    return generated, stats
@@ -0,0 +1,430 @@
+"""
+ASGI entry point exposing the same routes as app.py.
+
+    uvicorn asgi:app --port 8080
+
+Every route runs the services.py code the Flask route runs; this module only
+parses requests and wraps the (payload, status) replies. The database waits
+on the hot paths are awaited on async drivers, so they do not hold a thread:
+token/user lookups, login and signup use an async MongoDB client, and the
+search/chat graph read uses the async Neo4j driver (AsyncKnowledgeGraph).
+Model calls (sentence encoder, spaCy, the LLM) and bcrypt are CPU bound and
+run in a dedicated, bounded model thread pool. The remaining services are
+synchronous and run in the default thread pool, as does the search read on
+the in-memory graph (GRAPH_BACKEND=memory).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
+import functools
+import os
+import time
+
+from bson import ObjectId
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response
+from neo4j import AsyncGraphDatabase
+from pymongo import AsyncMongoClient
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+from werkzeug.security import safe_join
+
+from config import Config
+from auth import USER_PROJECTION, AuthError, auth_cache, token_payload
+from knowlege_graph import AsyncKnowledgeGraph
+from mongo_setup import SlowQueryLogger
+from responses import check_etag, orjson, responses_not_modified_total
+import components
+import metrics
+import request_metrics
+import services
+import tracing
+
+model_executor = ThreadPoolExecutor(max_workers=Config.ASGI_MODEL_WORKERS, thread_name_prefix="model")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.mongo = AsyncMongoClient(Config.MONGO_URI, event_listeners=[SlowQueryLogger(Config.MONGO_SLOW_QUERY_MS)])
+    app.state.db = app.state.mongo.knowledge_system
+    app.state.graph = None
+    if Config.GRAPH_BACKEND == "neo4j":
+        app.state.graph = AsyncKnowledgeGraph(
+            AsyncGraphDatabase.driver(Config.NEO4J_URI, auth=(Config.NEO4J_USERNAME, Config.NEO4J_PASSWORD)))
+    # As in app.py: MongoDB is loaded (and its indexes ensured) at startup, everything with WARMUP_ON_START
+    if Config.WARMUP_ON_START:
+        asyncio.get_running_loop().run_in_executor(model_executor, components.warm_up)
+    else:
+        asyncio.get_running_loop().run_in_executor(None, components.warm_up, ["mongo"])
+    try:
+        yield
+    finally:
+        if app.state.graph is not None:
+            await app.state.graph.close()
+        await app.state.mongo.close()
+        model_executor.shutdown(wait=False)
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(GZipMiddleware, minimum_size=Config.COMPRESSION_MIN_BYTES, compresslevel=Config.COMPRESSION_LEVEL)
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Trace the request when it is sampled or an admin sent the debug header (see tracing.py)
+    """
+    traced, debug = tracing.wants_trace(request.headers)
+    if not traced:
+        return await call_next(request)
+
+    root = tracing.start_trace(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        root.set(error=type(e).__name__)
+        tracing.finish_trace(root)
+        raise
+
+    root.set(status=response.status_code)
+    tree = tracing.finish_trace(root)
+    if debug:
+        response.headers.update(tracing.response_headers(root, tree))
+    return response
+
+
+@app.middleware("http")
+async def measure_requests(request: Request, call_next):
+    """
+    Request count, latency and in-flight gauge per route (see request_metrics.py)
+    """
+    started = time.perf_counter()
+    request_metrics.requests_in_flight.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_metrics.requests_in_flight.dec()
+        # The router stores the matched route in the scope; label by its template, not the raw path
+        route = request.scope.get("route")
+        request_metrics.observe(request.method, route.path if route is not None else "unmatched",
+                                status, time.perf_counter() - started)
+
+# orjson when installed, like the Flask app's JSON provider
+JSONResponseClass = ORJSONResponse if orjson is not None else JSONResponse
+
+
+@app.exception_handler(AuthError)
+async def auth_error_handler(request, exc):
+    return JSONResponse({'message': exc.message}, status_code=exc.status)
+
+
+def respond(payload, status=200):
+    return JSONResponseClass(payload, status_code=status)
+
+
+def respond_conditional(request, payload, endpoint):
+    """
+    200 with a weak ETag, or 304 if the client's If-None-Match already names it
+    """
+    response = respond(payload)
+    etag, fresh = check_etag(response.body, request.headers.get("if-none-match"))
+    headers = {"ETag": etag, "Cache-Control": "no-cache, private"}
+    if fresh:
+        responses_not_modified_total.inc(endpoint=endpoint)
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+async def in_model_pool(fn, *args):
+    """
+    Run a CPU-bound call (model inference, bcrypt) without blocking the event loop
+    """
+    # Copy the context so spans opened in the pool join the request's trace
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(model_executor, functools.partial(context.run, fn, *args))
+
+
+async def _authenticate(request, admin_only):
+    """
+    Async counterpart of auth.authenticate: same caches and errors, the user is loaded with the async client
+    """
+    user_id = token_payload(request.headers.get('Authorization'), admin_only)['user_id']
+    current_user = auth_cache.cached_user(user_id)
+    if current_user is not None:
+        return current_user
+
+    try:
+        user = await request.app.state.db.users.find_one({'_id': ObjectId(user_id)}, USER_PROJECTION)
+    except Exception as e:
+        raise AuthError(str(e))
+    if not user:
+        raise AuthError('User not found')
+    return auth_cache.remember_user(user_id, user)
+
+
+async def token_required(request: Request):
+    return await _authenticate(request, admin_only=False)
+
+
+async def admin_required(request: Request):
+    return await _authenticate(request, admin_only=True)
+
+
+async def fetch_search_records(request, query, entities, keywords, limit, cursor, include_summary_content):
+    """
+    services.fetch_search_records, awaiting the async Neo4j driver (the in-memory graph is read in the thread pool)
+    """
+    graph = request.app.state.graph
+    if graph is None:
+        return await run_in_threadpool(
+            services.fetch_search_records, query, entities, keywords, limit, cursor, include_summary_content)
+
+    params = services.search_params(query, entities, keywords, limit, cursor, include_summary_content)
+    try:
+        with services.stage_timer("graph") as span:
+            records = await graph.search_records(params)
+            span.set(rows=len(records))
+    except Exception as e:
+        services.report_error("fetch_search_records", f"Error in search_knowledge_graph: {str(e)}")
+        return [], None
+    return services.split_page(records, limit)
+
+
+async def search_page(request, page, handler, error):
+    """
+    /api/search and /api/chat: analyse the query in the model pool, await the graph read,
+    then build the page (services.search_page or services.chat_page) in the model pool
+    """
+    data = await request.json()
+    query = data.get('query', '')
+    try:
+        limit, cursor = services.search_args(query, data.get('limit'), data.get('cursor'))
+    except ValueError as e:
+        return respond({"error": str(e)}, 400)
+
+    try:
+        query_embedding, entities, keywords = await in_model_pool(services.analyze_query, query)
+        records, next_cursor = await fetch_search_records(
+            request, query, entities, keywords, limit, cursor, data.get('include_summary_content', False))
+        payload = await in_model_pool(page, query, query_embedding, records, next_cursor, cursor is None)
+    except Exception as e:
+        services.report_error(handler, f"{error}: {str(e)}")
+        return respond({"error": error}, 500)
+    return respond(payload)
+
+
+# API Routes
+@app.post('/api/auth/signup')
+async def signup(request: Request):
+    data = await request.json()
+    users = request.app.state.db.users
+
+    if await users.find_one({'email': data['email']}, {'_id': 1}):
+        return respond({'message': 'Email already registered'}, 400)
+
+    user = await in_model_pool(services.new_user_document, data)  # bcrypt
+    try:
+        await users.insert_one(user)
+    except DuplicateKeyError:
+        return respond({'message': 'Email already registered'}, 400)
+    return respond(jsonable_encoder(services.signup_response(user)), 201)
+
+
+@app.post('/api/auth/login')
+async def login(request: Request):
+    data = await request.json()
+    user = await request.app.state.db.users.find_one({'email': data['email']}, services.USER_LOGIN_PROJECTION)
+    payload, status = await in_model_pool(services.login_response, user, data)  # bcrypt
+    return respond(payload, status)
+
+
+@app.put('/api/user/profile')
+async def update_profile(request: Request):
+    current_user = await token_required(request)
+    payload, status = await run_in_threadpool(services.update_profile, current_user, await request.json() or {})
+    return respond(payload, status)
+
+
+async def _upload(current_user, file, topic, is_admin):
+    content = await file.read()
+
+    def save(path):
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    # Text extraction, Drive upload and the graph write are synchronous; keep them off the loop
+    payload, status = await run_in_threadpool(
+        services.upload_knowledge, current_user, topic, file.filename, file.content_type, save, is_admin
+    )
+    return respond(payload, status)
+
+
+@app.post('/api/user/knowledge/upload')
+async def upload_knowledge(request: Request, file: UploadFile = File(None), topic: str = Form(None)):
+    current_user = await token_required(request)
+    if file is None:
+        return respond({'message': 'No file provided'}, 400)
+    return await _upload(current_user, file, topic, is_admin=False)
+
+
+@app.post('/api/admin/knowledge/upload')
+async def admin_upload_knowledge(request: Request, file: UploadFile = File(None), topic: str = Form(None)):
+    current_user = await admin_required(request)
+    if file is None:
+        return respond({'message': 'No file provided'}, 400)
+    return await _upload(current_user, file, topic, is_admin=True)
+
+
+@app.get('/api/uploads/{filename}')
+async def get_file(request: Request, filename: str):
+    await token_required(request)
+    path = safe_join(services.UPLOAD_FOLDER, filename)
+    if path is None or not os.path.isfile(path):
+        return respond({'message': 'File not found'}, 404)
+    return FileResponse(path)
+
+
+@app.post('/api/search')
+async def search(request: Request):
+    return await search_page(request, services.search_page, "search", "An error occurred during search")
+
+
+@app.get('/api/gaps')
+async def get_knowledge_gaps():
+    payload, status = await in_model_pool(services.knowledge_gaps)
+    return respond(payload, status)
+
+
+@app.get('/api/gaps/clusters')
+async def get_gap_clusters():
+    """
+    Knowledge gaps found by clustering poorly answered queries (see gap_clusters.py)
+    """
+    payload, status = await run_in_threadpool(services.knowledge_gap_clusters)
+    return respond(jsonable_encoder(payload), status)
+
+
+@app.post('/api/detect_gaps')
+async def detect_gaps_endpoint(request: Request):
+    await token_required(request)
+    data = await request.json() or {}
+    payload, status = await in_model_pool(services.detect_gaps, data.get('topic', ''))
+    return respond(payload, status)
+
+
+@app.post('/api/tips')
+async def add_expert_tip(request: Request):
+    data = await request.json()
+    payload, status = await run_in_threadpool(
+        services.add_tip, data.get('document_id'), data.get('content'), data.get('expert_id'))
+    return respond(payload, status)
+
+
+@app.post('/api/experts')
+async def add_expert_endpoint(request: Request):
+    data = await request.json()
+    payload, status = await run_in_threadpool(
+        services.add_expert, data.get('name'), data.get('email'), data.get('expertise_areas'))
+    return respond(payload, status)
+
+
+@app.get('/api/experts')
+async def get_experts(request: Request):
+    payload, status = await run_in_threadpool(services.get_experts)
+    if status != 200:
+        return respond(payload, status)
+    return respond_conditional(request, payload, "get_experts")
+
+
+@app.post('/api/chat')
+async def chat(request: Request):
+    return await search_page(request, services.chat_page, "chat", "An error occurred during chat processing")
+
+
+@app.get('/api/summaries/{summary_id}')
+async def get_summary(summary_id: str):
+    payload, status = await run_in_threadpool(services.get_summary, summary_id)
+    return respond(payload, status)
+
+
+@app.post('/api/ai/generate-questions')
+async def generate_questions(request: Request):
+    await token_required(request)
+    data = await request.json()
+    payload, status = await run_in_threadpool(services.generate_questions, data.get('topic'))
+    return respond(payload, status)
+
+
+@app.post('/api/ai/summarize-chat')
+async def summarize_chat(request: Request):
+    current_user = await token_required(request)
+    data = await request.json()
+    payload, status = await run_in_threadpool(
+        services.summarize_chat, current_user, data.get('conversation'), data.get('topic'), data.get('summary_id'))
+    return respond(payload, status)
+
+
+@app.get('/api/recommendations')
+async def get_recommendations(request: Request):
+    """
+    Fetch recommended documents from Neo4j based on the user's learning field.
+    """
+    current_user = await token_required(request)
+    payload, status = await run_in_threadpool(services.recommendations, current_user)
+    if status != 200:
+        return respond(payload, status)
+    return respond_conditional(request, payload, "get_recommendations")
+
+
+@app.get('/healthz')
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests
+    """
+    return respond({"status": "ok"})
+
+
+@app.get('/readyz')
+async def readyz():
+    """
+    Readiness probe: report which components are loaded
+    """
+    payload, status = await run_in_threadpool(services.readiness)
+    return respond(payload, status)
+
+
+@app.get('/metrics')
+async def prometheus_metrics():
+    """
+    All counters, gauges and histograms in the Prometheus text format
+    """
+    return Response(metrics.exposition(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get('/api/admin/stats')
+async def admin_stats(request: Request):
+    """
+    Internal counters (generation, caches, ...) for operators
+    """
+    await admin_required(request)
+    payload, status = await run_in_threadpool(services.admin_stats)
+    return respond(payload, status)
+
+
+@app.get('/api/admin/queries')
+async def admin_queries(request: Request, order: str = "total_ms", limit: int = 50):
+    """
+    Per-fingerprint Cypher query costs, most expensive first
+    """
+    await admin_required(request)
+    payload, status = await run_in_threadpool(services.cypher_query_stats, order, limit)
+    return respond(payload, status)
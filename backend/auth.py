@@ -0,0 +1,197 @@
+from flask import request, jsonify
+from datetime import datetime, timedelta
+from functools import wraps
+from bson import ObjectId
+from cachetools import TTLCache
+import threading
+import time
+import jwt
+
+from config import Config
+import components
+import metrics
+
+# Only the fields handlers read from current_user; never the password hash
+USER_PROJECTION = {'name': 1, 'email': 1, 'role': 1, 'field': 1}
+
+cache_hits_total = metrics.counter(
+    "auth_cache_hits_total", "Authentication cache hits", ["cache"])
+cache_misses_total = metrics.counter(
+    "auth_cache_misses_total", "Authentication cache misses", ["cache"])
+
+
+class AuthCache:
+    def __init__(self, maxsize, ttl):
+        """
+        Bounded TTL caches for decoded tokens and the matching user documents.
+
+        Entries are per process, so a user update on another worker is only
+        seen here once the TTL runs out.
+        """
+        self._tokens = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def _lookup(self, cache, name, key):
+        with self._lock:
+            value = cache.get(key)
+        if value is None:
+            cache_misses_total.inc(cache=name)
+        else:
+            cache_hits_total.inc(cache=name)
+        return value
+
+    def decode_token(self, token):
+        """
+        Decode and verify a JWT, reusing the result for repeated requests with the same token
+        """
+        payload = self._lookup(self._tokens, "token", token)
+        if payload is not None:
+            if payload['exp'] <= time.time():
+                with self._lock:
+                    self._tokens.pop(token, None)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            return payload
+
+        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+        with self._lock:
+            self._tokens[token] = payload
+        return payload
+
+    def get_user(self, user_id):
+        """
+        Fetch the projected user document, from the cache when possible
+        """
+        user = self.cached_user(user_id)
+        if user is not None:
+            return user
+
+        user = components.get("mongo").users.find_one({'_id': ObjectId(user_id)}, USER_PROJECTION)
+        if not user:
+            return None
+        return self.remember_user(user_id, user)
+
+    def cached_user(self, user_id):
+        """
+        Cached user document or None
+        """
+        user = self._lookup(self._users, "user", user_id)
+        return dict(user) if user is not None else None
+
+    def remember_user(self, user_id, user):
+        # Convert ObjectId to string for JSON serialization
+        user['_id'] = str(user['_id'])
+        with self._lock:
+            self._users[user_id] = user
+        return dict(user)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+    def stats(self):
+        result = {}
+        for name in ("token", "user"):
+            hits = cache_hits_total.value(cache=name)
+            misses = cache_misses_total.value(cache=name)
+            result[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+            }
+        return result
+
+
+auth_cache = AuthCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id):
+    """
+    Drop a cached user document; call this after every write to the user
+    """
+    auth_cache.invalidate_user(user_id)
+
+
+def generate_token(user_id, role):
+    expiration = datetime.utcnow() + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
+    return jwt.encode(
+        {'user_id': str(user_id), 'role': role, 'exp': expiration},
+        Config.SECRET_KEY,
+        algorithm='HS256'
+    )
+
+
+def token_from_header(auth_header):
+    # Extract token from "Bearer <token>"
+    return auth_header.split(' ')[1] if auth_header.startswith('Bearer ') else auth_header
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def token_payload(auth_header, admin_only=False):
+    """
+    The verified token payload of an Authorization header. Raises AuthError
+    with the message and status to answer with.
+    """
+    if not auth_header:
+        raise AuthError('Token is missing')
+
+    try:
+        payload = auth_cache.decode_token(token_from_header(auth_header))
+    except jwt.ExpiredSignatureError:
+        raise AuthError('Token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthError('Invalid token')
+    except Exception as e:
+        raise AuthError(str(e))
+
+    if admin_only and payload['role'] != 'admin':
+        raise AuthError('Admin privileges required', 403)
+    return payload
+
+
+def authenticate(auth_header, admin_only=False):
+    """
+    The current user for an Authorization header. Raises AuthError like
+    token_payload, or when the user does not exist. asgi.py has an async
+    counterpart that loads the user with the async MongoDB client.
+    """
+    payload = token_payload(auth_header, admin_only)
+    try:
+        current_user = auth_cache.get_user(payload['user_id'])
+    except Exception as e:
+        raise AuthError(str(e))
+    if not current_user:
+        raise AuthError('User not found')
+    return current_user
+
+
+def _authenticated(f, admin_only):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            current_user = authenticate(request.headers.get('Authorization'), admin_only)
+        except AuthError as e:
+            return jsonify({'message': e.message}), e.status
+
+        return f(current_user, *args, **kwargs)
+
+    return decorated
+
+
+def token_required(f):
+    return _authenticated(f, admin_only=False)
+
+
+def admin_required(f):
+    return _authenticated(f, admin_only=True)
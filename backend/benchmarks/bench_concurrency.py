@@ -0,0 +1,126 @@
+"""
+Compare the Flask (threaded WSGI) and ASGI servers under concurrent load.
+
+Both apps run in-process with stubbed models (see benchmarks/stubs.py), so
+the numbers reflect how each server overlaps database and model waits. Point
+NEO4J_URI at a populated database for realistic search timings, or set
+GRAPH_BACKEND=memory (with GRAPH_SNAPSHOT_PATH) to use an in-process graph;
+without either the graph queries fail fast and only the model stages are measured.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_concurrency --concurrency 1 8 32 --requests 200 --output concurrency.json
+"""
+import os
+
+# Assisted decoding needs a real model; the stub pipeline only supports plain generation,
+# so clear the roles in case the environment opts in
+os.environ["ASSISTED_DECODING_ROLES"] = ""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+from werkzeug.serving import make_server
+
+from benchmarks import stubs
+
+QUERIES = [
+    "neural network training",
+    "database indexing strategies",
+    "rest api design",
+    "kubernetes deployment",
+]
+
+
+def start_flask(port, model_workers):
+    from app import app
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="flask-bench", daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(port, model_workers):
+    import asgi
+    # Model calls are capped by this pool; Flask runs one per request thread
+    asgi.model_executor = ThreadPoolExecutor(max_workers=model_workers, thread_name_prefix="model")
+    app = asgi.app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="asgi-bench", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return stop
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_load(base_url, path, concurrency, total):
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.post(f"{base_url}{path}", json={"query": QUERIES[i % len(QUERIES)]})
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(1 for _, status in results if status >= 500),
+        "throughput_rps": total / elapsed,
+        "p50_s": statistics.median(latencies),
+        "p95_s": percentile(latencies, 95),
+        "max_s": max(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--path", default="/api/search")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="seconds the stub LLM takes per call")
+    parser.add_argument("--model-workers", type=int, default=4, help="ASGI model thread pool size")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    stubs.install(llm_delay=args.llm_delay)
+
+    results = {}
+    for name, start, port in (("flask", start_flask, 18080), ("asgi", start_asgi, 18081)):
+        stop = start(port, args.model_workers)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            run_load(base_url, args.path, 1, 2)  # warm connections and lazy imports
+            results[name] = [run_load(base_url, args.path, c, args.requests) for c in args.concurrency]
+        finally:
+            stop()
+
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+End-to-end load test of the search, chat, recommendation and upload endpoints.
+
+A synthetic corpus (benchmarks/corpus.py) is written to the graph, the
+models, Google Drive and Slack are replaced with stubs (benchmarks/stubs.py)
+and the app is served in-process. Each scenario runs at every concurrency
+level; throughput and p50/p95/p99 latency go to stdout and, with --output,
+to a JSON file that can be compared between runs.
+
+The graph defaults to the in-memory backend. Set GRAPH_BACKEND=neo4j (and
+NEO4J_URI) to write the corpus to, and query, a real database instead.
+The benchmark user is seeded into the auth cache and the query log is off
+(QUERY_LOG_ENABLED=false), so MongoDB is not needed. Passages go to a
+temporary PASSAGE_INDEX_DIR unless one is set.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_endpoints --documents 5000 --concurrency 1 8 32 --output endpoints.json
+    python -m benchmarks.bench_endpoints --scenarios search chat --server asgi --snapshot corpus.pkl.gz
+"""
+import os
+import tempfile
+
+# Assisted decoding needs a real model; the stub pipeline only supports plain generation
+os.environ["ASSISTED_DECODING_ROLES"] = ""
+os.environ.setdefault("GRAPH_BACKEND", "memory")
+# The seeded benchmark user must not expire from the auth cache mid-run
+os.environ.setdefault("AUTH_CACHE_TTL_SECONDS", "86400")
+# The query log is written to MongoDB, which the benchmark does not need otherwise
+os.environ.setdefault("QUERY_LOG_ENABLED", "false")
+# Uploads index their passages on disk; keep them out of the backend's own passage index
+os.environ.setdefault("PASSAGE_INDEX_DIR", tempfile.mkdtemp(prefix="bench-passages-"))
+
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bson import ObjectId
+
+from benchmarks import corpus, stubs
+from benchmarks.bench_concurrency import percentile, start_asgi, start_flask
+from config import Config
+import components
+
+SCENARIOS = ["search", "chat", "recommendations", "upload", "admin_upload"]
+
+
+def build_graph(args):
+    """
+    The populated graph and a description of the corpus
+    """
+    from memory_graph import MemoryKnowledgeGraph
+
+    started = time.perf_counter()
+    if Config.GRAPH_BACKEND == "memory" and args.snapshot and os.path.exists(args.snapshot):
+        kg = MemoryKnowledgeGraph.load(args.snapshot)
+        components.component("graph").override(kg)
+        source = "snapshot"
+    else:
+        kg = components.get("graph")
+        corpus.generate(kg, documents=args.documents, experts=args.experts, tips=args.tips,
+                        summaries=args.summaries, seed=args.seed)
+        source = "generated"
+        if args.snapshot and Config.GRAPH_BACKEND == "memory":
+            kg.save(args.snapshot)
+
+    return {
+        "backend": Config.GRAPH_BACKEND,
+        "source": source,
+        "documents": args.documents,
+        "experts": args.experts,
+        "tips": args.tips,
+        "summaries": args.summaries,
+        "seed": args.seed,
+        "build_seconds": time.perf_counter() - started
+    }
+
+
+def benchmark_user():
+    """
+    An admin user in the auth cache, and a bearer token for it
+    """
+    from auth import auth_cache, generate_token
+
+    user_id = str(ObjectId())
+    auth_cache.remember_user(user_id, {
+        "_id": user_id, "name": "Benchmark User", "email": "bench@example.com",
+        "role": "admin", "field": corpus.FIELDS[0]
+    })
+    return f"Bearer {generate_token(user_id, 'admin')}"
+
+
+def scenario_request(name, token, queries, seed):
+    """
+    Function (session, i) -> response issuing the i-th request of a scenario
+    """
+    headers = {"Authorization": token}
+
+    if name in ("search", "chat"):
+        def send(session, base_url, i):
+            return session.post(f"{base_url}/api/{name}", json={"query": queries[i % len(queries)]})
+    elif name == "recommendations":
+        def send(session, base_url, i):
+            return session.get(f"{base_url}/api/recommendations", headers=headers)
+    else:
+        path = "/api/admin/knowledge/upload" if name == "admin_upload" else "/api/user/knowledge/upload"
+        counter = itertools.count()
+
+        def send(session, base_url, i):
+            n = next(counter)
+            files = {"file": (f"bench_{n}.txt", corpus.upload_text(n, seed), "text/plain")}
+            # Titles are unique in Neo4j
+            return session.post(f"{base_url}{path}", headers=headers, files=files,
+                                data={"topic": f"Benchmark upload {name} {seed}-{n}-{time.time_ns()}"})
+    return send
+
+
+def run_load(base_url, send, concurrency, total):
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = send(local.session, base_url, i)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(1 for _, status in results if status >= 400),
+        "throughput_rps": total / elapsed,
+        "p50_s": statistics.median(latencies),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "max_s": max(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--experts", type=int, default=50)
+    parser.add_argument("--tips", type=int, default=2000)
+    parser.add_argument("--summaries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--snapshot", help="in-memory graph snapshot to load, or to write after generating")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--server", choices=["flask", "asgi"], default="flask")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and concurrency level")
+    parser.add_argument("--embed-delay", type=float, default=0.01, help="seconds per stub encoder call")
+    parser.add_argument("--nlp-delay", type=float, default=0.005, help="seconds per stub spaCy call")
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="seconds per stub LLM call")
+    parser.add_argument("--drive-delay", type=float, default=0.1, help="seconds per stub Drive upload")
+    parser.add_argument("--slack-delay", type=float, default=0.05, help="seconds per stub Slack post")
+    parser.add_argument("--model-workers", type=int, default=4, help="ASGI model thread pool size")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    stubs.install(embed_delay=args.embed_delay, nlp_delay=args.nlp_delay, llm_delay=args.llm_delay)
+    stubs.install_drive(args.drive_delay)
+    slack = stubs.install_slack(args.slack_delay)
+
+    corpus_info = build_graph(args)
+    token = benchmark_user()
+    queries = corpus.queries(max(args.requests, 1), seed=args.seed)
+
+    start, port = (start_flask, 18080) if args.server == "flask" else (start_asgi, 18081)
+    stop = start(port, args.model_workers)
+    results = {}
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        for name in args.scenarios:
+            send = scenario_request(name, token, queries, args.seed)
+            run_load(base_url, send, 1, 2)  # warm connections and lazy imports
+            results[name] = [run_load(base_url, send, c, args.requests) for c in args.concurrency]
+    finally:
+        stop()
+
+    report = {
+        "config": {
+            "server": args.server,
+            "python": platform.python_version(),
+            "corpus": corpus_info,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "delays_s": {
+                "embed": args.embed_delay, "nlp": args.nlp_delay, "llm": args.llm_delay,
+                "drive": args.drive_delay, "slack": args.slack_delay
+            }
+        },
+        "slack_posts": slack.posts,
+        "results": results
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
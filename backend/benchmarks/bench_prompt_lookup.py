@@ -0,0 +1,101 @@
+"""
+Compare plain generation with prompt-lookup assisted decoding on search-style prompts.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_prompt_lookup --runs 5 --output prompt_lookup.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from Model.main1 import chat_with_ai
+from Model.prompt_lookup import assisted_stats
+import components
+
+SAMPLE_QUERIES = [
+    "Which documents cover neural network training?",
+    "Where can I learn about database indexing strategies?",
+    "What do we have on REST API design?",
+]
+
+
+def build_context(query):
+    """
+    A search context shaped like the one /api/chat builds
+    """
+    documents = []
+    for i, (title, field, keywords) in enumerate([
+        ("Deep Learning Fundamentals", "Machine Learning", ["neural networks", "backpropagation", "gradient descent", "training"]),
+        ("Database Indexing Handbook", "Databases", ["b-tree", "indexing strategies", "query planner", "composite index"]),
+        ("Designing REST APIs", "Web Development", ["rest api design", "http methods", "versioning", "pagination"]),
+    ]):
+        documents.append({
+            "title": title,
+            "field": field,
+            "keywords": keywords,
+            "matched_keywords": keywords[:2],
+            "score": 1.0 - i * 0.1,
+            "viewLink": f"https://example.com/{i}",
+            "doc_type": "document"
+        })
+    return {"query": query, "relevant_documents": documents}
+
+
+def run_mode(assisted, runs):
+    latencies = []
+    for _ in range(runs):
+        for query in SAMPLE_QUERIES:
+            started = time.perf_counter()
+            chat_with_ai(query, build_context(query), system_role="search", assisted=assisted)
+            latencies.append(time.perf_counter() - started)
+    return {
+        "requests": len(latencies),
+        "mean_s": statistics.mean(latencies),
+        "p50_s": statistics.median(latencies),
+        "max_s": max(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="passes over the sample queries per mode")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    print(f"Loaded LLM in {components.warm_up(['llm'])['llm']:.2f}s")
+
+    # One untimed call per mode so lazy CUDA/kernel setup is not measured
+    chat_with_ai(SAMPLE_QUERIES[0], build_context(SAMPLE_QUERIES[0]), assisted=False)
+    chat_with_ai(SAMPLE_QUERIES[0], build_context(SAMPLE_QUERIES[0]), assisted=True)
+
+    baseline = run_mode(False, args.runs)
+    before = assisted_stats.snapshot()
+    assisted = run_mode(True, args.runs)
+    after = assisted_stats.snapshot()
+
+    drafted = after["drafted_tokens"] - before["drafted_tokens"]
+    accepted = after["accepted_tokens"] - before["accepted_tokens"]
+    generated = after["generated_tokens"] - before["generated_tokens"]
+    forward_passes = after["forward_passes"] - before["forward_passes"]
+    assisted.update({
+        "drafted_tokens": drafted,
+        "accepted_tokens": accepted,
+        "accepted_ratio": accepted / drafted if drafted else 0.0,
+        "tokens_per_forward": generated / forward_passes if forward_passes else 0.0
+    })
+
+    results = {
+        "baseline": baseline,
+        "assisted": assisted,
+        "speedup_p50": baseline["p50_s"] / assisted["p50_s"] if assisted["p50_s"] else None
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Memory and recall of quantised passage embeddings (float16, int8) against float32.
+
+A synthetic set of unit vectors shaped like sentence embeddings (clustered
+topics, unequal spread per dimension) is written to a passage index per
+dtype. Queries are noisy copies of indexed vectors. For every dtype and
+rescore factor we report the bytes scanned per search, the memory saved
+against float32, recall@k against exact float32 search and its delta from
+the float32 path, and query latency.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_quantization --passages 200000 --k 10 --output quantization.json
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from passage_index import PassageIndex
+
+DOCUMENT_ID = "00000000-0000-4000-8000-000000000000"
+
+
+def synthetic_embeddings(count, dim, topics, seed):
+    """
+    Unit vectors around topic centres, with a few dimensions spread much wider than the rest
+    """
+    rng = np.random.default_rng(seed)
+    spread = rng.lognormal(0, 0.6, dim).astype(np.float32)
+    centres = rng.standard_normal((topics, dim)).astype(np.float32) * spread
+    vectors = centres[rng.integers(0, topics, count)] + 0.8 * rng.standard_normal((count, dim)).astype(np.float32) * spread
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_index(path, dtype, embeddings, batch_size=10000):
+    index = PassageIndex(path, dtype=dtype)
+    for start in range(0, len(embeddings), batch_size):
+        batch = embeddings[start:start + batch_size]
+        index.add_document(DOCUMENT_ID, "benchmark", [(1, str(start + i)) for i in range(len(batch))], batch)
+    return index
+
+
+def run(index, queries, exact, k):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, exact):
+        started = time.perf_counter()
+        hits = index.search(query, k=k, min_score=-1.0)
+        latencies.append(time.perf_counter() - started)
+        found = {int(hit["text"]) for hit in hits}
+        recalls.append(len(found & expected) / k)
+    return statistics.mean(recalls), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passages", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeds to 384 dimensions")
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    embeddings = synthetic_embeddings(args.passages, args.dim, args.topics, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = embeddings[rng.integers(0, args.passages, args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [set(np.argsort(-(embeddings @ query))[:args.k].tolist()) for query in queries]
+
+    results = {"passages": args.passages, "dim": args.dim, "k": args.k, "queries": args.queries, "runs": []}
+    baseline = None
+    for dtype in ("float32", "float16", "int8"):
+        with tempfile.TemporaryDirectory() as path:
+            started = time.perf_counter()
+            index = build_index(path, dtype, embeddings)
+            build_seconds = time.perf_counter() - started
+            stats = index.stats()
+
+            for factor in ([1] if dtype == "float32" else args.rescore_factors):
+                index.rescore_factor = factor
+                index.search(queries[0], k=args.k)  # page the matrices in before timing
+                recall, latencies = run(index, queries, exact, args.k)
+                if baseline is None:
+                    baseline = {"recall": recall, "scan_bytes": stats["scan_bytes"]}
+                results["runs"].append({
+                    "dtype": dtype,
+                    "rescore_factor": factor if dtype != "float32" else None,
+                    "scan_bytes": stats["scan_bytes"],
+                    "memory_saved_bytes": baseline["scan_bytes"] - stats["scan_bytes"],
+                    "memory_saved_ratio": 1 - stats["scan_bytes"] / baseline["scan_bytes"],
+                    f"recall_at_{args.k}": recall,
+                    "recall_delta": recall - baseline["recall"],
+                    "p50_ms": 1000 * statistics.median(latencies),
+                    "p95_ms": 1000 * sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+                    "build_s": build_seconds
+                })
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Synthetic knowledge base for benchmarks.
+
+generate() writes documents, experts, tips and chat summaries into any
+KnowledgeGraph (Neo4j or in-memory). Titles, keywords and fields are drawn
+from a small vocabulary so search queries built with queries() hit a
+realistic share of the corpus. The same seed always produces the same corpus.
+"""
+import random
+
+import numpy as np
+
+FIELDS = ["Machine Learning", "Databases", "Web Development", "DevOps", "Security", "Data Engineering"]
+
+SUBJECTS = {
+    "Machine Learning": ["neural networks", "gradient descent", "transformers", "feature engineering",
+                         "model evaluation", "embeddings", "reinforcement learning"],
+    "Databases": ["indexing strategies", "query planning", "transactions", "replication", "graph databases",
+                  "schema design"],
+    "Web Development": ["rest api design", "react hooks", "authentication", "caching", "websockets",
+                        "accessibility"],
+    "DevOps": ["kubernetes deployment", "ci pipelines", "observability", "infrastructure as code",
+               "container images"],
+    "Security": ["threat modeling", "secret management", "oauth flows", "dependency scanning", "encryption"],
+    "Data Engineering": ["stream processing", "batch pipelines", "data quality", "partitioning",
+                         "change data capture"],
+}
+
+QUALIFIERS = ["introduction to", "advanced", "practical", "troubleshooting", "patterns for", "a guide to",
+              "lessons learned in", "best practices for"]
+
+FIRST_NAMES = ["Ada", "Grace", "Alan", "Barbara", "Edsger", "Margaret", "Donald", "Frances", "Ken", "Radia"]
+LAST_NAMES = ["Lovelace", "Hopper", "Turing", "Liskov", "Dijkstra", "Hamilton", "Knuth", "Allen", "Thompson",
+              "Perlman"]
+
+
+def _embedding(rng, dimension):
+    vector = rng.standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _sentence(rnd, subjects):
+    return f"When working on {rnd.choice(subjects)}, start from {rnd.choice(subjects)} and check {rnd.choice(subjects)}."
+
+
+def generate(kg, documents=1000, experts=50, tips=2000, summaries=200, seed=0, dimension=384):
+    """
+    Populate kg and return the ids created and the fields used
+    """
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    all_subjects = [subject for subjects in SUBJECTS.values() for subject in subjects]
+
+    doc_ids = []
+    for i in range(documents):
+        field = rnd.choice(FIELDS)
+        subject = rnd.choice(SUBJECTS[field])
+        # Titles are unique in Neo4j
+        title = f"{rnd.choice(QUALIFIERS).capitalize()} {subject} {i}"
+        keywords = rnd.sample(SUBJECTS[field], k=min(3, len(SUBJECTS[field]))) + [field.lower()]
+        doc_ids.append(kg.add_document({
+            "title": title,
+            "filename": f"doc_{i}.pdf",
+            "original_filename": f"{subject.replace(' ', '_')}_{i}.pdf",
+            "author_id": f"author-{i % 97}",
+            "author_name": f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+            "field": field,
+            "keywords": keywords,
+            "fileLink": f"https://drive.example.com/file/doc{i}/view",
+            "meme_type": "application/pdf",
+            "embedding": _embedding(rng, dimension)
+        }))
+
+    expert_ids = []
+    for i in range(experts):
+        areas = rnd.sample(all_subjects, k=3)
+        name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {i}"
+        expert_ids.append(kg.add_expert(name, f"expert{i}@example.com", areas))
+
+    # Tips go to a subset of documents so the rest show up as knowledge gaps
+    tipped = doc_ids[:max(1, len(doc_ids) * 2 // 3)] if doc_ids else []
+    tip_count = 0
+    if tipped and expert_ids:
+        for _ in range(tips):
+            kg.add_tip(_sentence(rnd, all_subjects), rnd.choice(tipped), rnd.choice(expert_ids))
+            tip_count += 1
+
+    summary_ids = []
+    for i in range(summaries):
+        topic = f"{rnd.choice(all_subjects).capitalize()} chat {i}"
+        content = " ".join(_sentence(rnd, all_subjects) for _ in range(5))
+        summary_ids.append(kg.add_chat_summary(topic, content, f"author-{i % 97}", "Benchmark User",
+                                               turn_count=10, turns_hash=f"{i:08x}"))
+
+    return {
+        "documents": doc_ids,
+        "experts": expert_ids,
+        "tips": tip_count,
+        "summaries": summary_ids,
+        "fields": FIELDS
+    }
+
+
+def queries(count, seed=0):
+    """
+    Search queries drawn from the corpus vocabulary, with some misses mixed in
+    """
+    rnd = random.Random(seed)
+    all_subjects = [subject for subjects in SUBJECTS.values() for subject in subjects]
+    misses = ["quantum error correction", "medieval history", "sourdough baking"]
+    return [rnd.choice(misses) if i % 10 == 9 else rnd.choice(all_subjects) for i in range(count)]
+
+
+def upload_text(index, seed=0):
+    """
+    Body of a small text document for the upload endpoints
+    """
+    rnd = random.Random(seed * 100003 + index)
+    all_subjects = [subject for subjects in SUBJECTS.values() for subject in subjects]
+    return "\n".join(_sentence(rnd, all_subjects) for _ in range(40))
@@ -0,0 +1,65 @@
+"""
+Local stand-in for the Gemini generateContent API, for load tests.
+
+Usage (from the backend directory):
+    python -m benchmarks.gemini_stub --port 8765 --latency 0.2
+    GEMINI_BASE_URL=http://127.0.0.1:8765 GEMINI_API_KEY=stub flask run
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUESTIONS = json.dumps([f"Stub question {i}?" for i in range(1, 11)])
+# Opening of services.QUESTIONS_PROMPT; every other prompt is answered with a summary
+QUESTIONS_PROMPT_PREFIX = "Generate 10 important questions about "
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the client's pooled connections are reused as they would be against Gemini
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt = body.get("contents", [{}])[0].get("parts", [{}])[0].get("text", "")
+        time.sleep(self.latency)
+
+        if prompt.startswith(QUESTIONS_PROMPT_PREFIX):
+            text = QUESTIONS
+        else:
+            text = f"Stub summary of a {len(prompt)} character prompt."
+
+        payload = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]}
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=0, latency=0.0):
+    """
+    Build a stub server (port 0 picks a free port); call serve_forever() on it
+    """
+    handler = type("Handler", (GeminiStubHandler,), {"latency": latency})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency)
+    print(f"Gemini stub listening on http://127.0.0.1:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Stand-ins for the heavy model components, for load tests that measure the
+serving path rather than model speed. Each stub sleeps for a fixed time,
+which releases the GIL the way torch inference does.
+"""
+import threading
+import time
+import uuid
+
+import numpy as np
+
+import components
+
+
+class StubEmbedder:
+    def __init__(self, delay=0.01, dimension=384):
+        self.delay = delay
+        self.dimension = dimension
+
+    def encode(self, text, **kwargs):
+        # One delay per call, like a batched forward pass
+        time.sleep(self.delay)
+        if isinstance(text, (list, tuple)):
+            return np.stack([self._vector(t) for t in text]) if text else np.zeros((0, self.dimension), np.float32)
+        return self._vector(text)
+
+    def _vector(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+        return rng.standard_normal(self.dimension).astype(np.float32)
+
+
+class StubToken:
+    def __init__(self, text):
+        self.text = text
+        self.lemma_ = text.lower()
+        self.is_stop = len(text) <= 3
+        self.is_punct = not any(c.isalnum() for c in text)
+
+
+class StubDoc:
+    def __init__(self, text):
+        self.tokens = [StubToken(t) for t in text.split()]
+        self.ents = []
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+
+class StubNlp:
+    def __init__(self, delay=0.005):
+        self.delay = delay
+
+    def __call__(self, text):
+        time.sleep(self.delay)
+        return StubDoc(text)
+
+
+class StubTokenizer:
+    eos_token_id = 0
+
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+
+class StubPipeline:
+    def __init__(self, delay=0.2, reply="The knowledge base covers this topic in the documents listed above."):
+        """
+        Text-generation pipeline replacement returning a canned reply after delay seconds
+        """
+        self.delay = delay
+        self.reply = reply
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, messages, **kwargs):
+        time.sleep(self.delay)
+        return [{"generated_text": list(messages) + [{"role": "assistant", "content": self.reply}]}]
+
+
+class StubSlackClient:
+    def __init__(self, delay=0.05):
+        """
+        slack_sdk WebClient replacement that counts posted messages
+        """
+        self.delay = delay
+        self.posts = 0
+        self._lock = threading.Lock()
+
+    def chat_postMessage(self, **message):
+        time.sleep(self.delay)
+        with self._lock:
+            self.posts += 1
+        return {"ok": True}
+
+
+def stub_drive_upload(delay=0.1):
+    """
+    Replacement for pdf_processor.upload_file returning Drive-like file details after delay seconds
+    """
+    def upload_file(file_path, mime_type="application/pdf"):
+        time.sleep(delay)
+        file_id = uuid.uuid4().hex
+        return {
+            "id": file_id,
+            "mimeType": mime_type,
+            "webViewLink": f"https://drive.example.com/file/{file_id}/view",
+            "webContentLink": f"https://drive.example.com/file/{file_id}/download"
+        }
+    return upload_file
+
+
+def install_drive(delay=0.1):
+    """
+    Route uploads to a stub Google Drive instead of the real API
+    """
+    import pdf_processor
+    pdf_processor.upload_file = stub_drive_upload(delay)
+
+
+def install_slack(delay=0.05):
+    """
+    Send gap notifications to a stub Slack client through the real outbox; returns the client
+    """
+    from notifications import SlackOutbox
+    import services
+
+    client = StubSlackClient(delay)
+    if services.notification_outbox:
+        services.notification_outbox.stop()
+    services.slack_client = client
+    services.notification_outbox = SlackOutbox(
+        client, services.expert_channel, window_seconds=1, min_interval_seconds=0, topic_cooldown_seconds=60)
+    return client
+
+
+def install(embed_delay=0.01, nlp_delay=0.005, llm_delay=0.2):
+    """
+    Override the model components with stubs. Assisted decoding needs a real
+    model, so callers should leave ASSISTED_DECODING_ROLES empty (the default)
+    or clear it before importing the app.
+    """
+    components.component("embedder").override(StubEmbedder(embed_delay))
+    components.component("nlp").override(StubNlp(nlp_delay))
+    components.component("llm").override(StubPipeline(llm_delay))
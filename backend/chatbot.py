@@ -32,32 +32,8 @@ class Chatbot:
         # Simulate outreach
         message_id = self.generate_message_id()
         
-        with self.knowledge_graph.driver.session() as session:
-            session.run(
-                """
-                CREATE (o:Outreach {
-                    id: $id,
-                    query: $query,
-                    status: 'pending',
-                    created_at: datetime()
-                })
-                """,
-                id=message_id,
-                query=query
-            )
-            
-            # Link outreach to gap documents
-            for gap in gaps:
-                session.run(
-                    """
-                    MATCH (o:Outreach), (d:Document)
-                    WHERE o.id = $outreach_id AND d.id = $doc_id
-                    CREATE (o)-[:CONCERNS]->(d)
-                    """,
-                    outreach_id=message_id,
-                    doc_id=gap["id"]
-                )
-                
+        self.knowledge_graph.add_outreach(message_id, [gap["id"] for gap in gaps], query=query)
+
         return {
             "message_id": message_id,
             "status": "expert_input_requested"
@@ -87,42 +63,9 @@ class Chatbot:
             message_id = self.generate_message_id()
             outreach_ids.append(message_id)
             
-            with self.knowledge_graph.driver.session() as session:
-                session.run(
-                    """
-                    CREATE (o:Outreach {
-                        id: $id,
-                        topic: $topic,
-                        status: 'pending',
-                        created_at: datetime()
-                    })
-                    """,
-                    id=message_id,
-                    topic=gap["title"]
-                )
-                
-                # Link outreach to document
-                session.run(
-                    """
-                    MATCH (o:Outreach), (d:Document)
-                    WHERE o.id = $outreach_id AND d.id = $doc_id
-                    CREATE (o)-[:CONCERNS]->(d)
-                    """,
-                    outreach_id=message_id,
-                    doc_id=gap["id"]
-                )
-                
-                # Link outreach to experts
-                for expert in experts:
-                    session.run(
-                        """
-                        MATCH (o:Outreach), (e:Expert)
-                        WHERE o.id = $outreach_id AND e.id = $expert_id
-                        CREATE (o)-[:ASSIGNED_TO]->(e)
-                        """,
-                        outreach_id=message_id,
-                        expert_id=expert["id"]
-                    )
+            self.knowledge_graph.add_outreach(
+                message_id, [gap["id"]], topic=gap["title"], expert_ids=[expert["id"] for expert in experts]
+            )
             
             logging.info(f"Created outreach {message_id} for document: {gap['title']}")
             
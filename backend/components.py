@@ -0,0 +1,225 @@
+import atexit
+import logging
+import threading
+import time
+
+from config import Config
+import metrics
+
+
+class LazyComponent:
+    def __init__(self, name, factory, required=True):
+        """
+        Wrap an expensive resource so it is only built on first use
+        """
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self._instance = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """
+        Return the component, building it on the first call
+        """
+        if self._loaded:
+            return self._instance
+
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                try:
+                    self._instance = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    logging.error(f"Failed to load component '{self.name}': {e}")
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self._loaded = True
+                logging.info(f"Loaded component '{self.name}' in {self.load_seconds:.2f}s")
+
+        return self._instance
+
+    def override(self, instance):
+        """
+        Replace the component with a ready-made instance (tests, benchmarks)
+        """
+        with self._lock:
+            self._instance = instance
+            self._loaded = True
+            self.load_seconds = 0.0
+            self.error = None
+
+    def reset(self):
+        """
+        Drop the loaded instance so the next get() rebuilds it
+        """
+        with self._lock:
+            self._instance = None
+            self._loaded = False
+            self.load_seconds = None
+
+    def status(self):
+        return {
+            "loaded": self._loaded,
+            "required": self.required,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error
+        }
+
+
+_registry = {}
+
+
+def register(name, factory, required=True):
+    """
+    Register a lazily built component under the given name
+    """
+    component = LazyComponent(name, factory, required=required)
+    _registry[name] = component
+    return component
+
+
+def get(name):
+    return _registry[name].get()
+
+
+def component(name):
+    return _registry[name]
+
+
+def warm_up(names=None):
+    """
+    Load the given components (all registered ones by default) and return their load times
+    """
+    timings = {}
+    for name in names or list(_registry):
+        try:
+            _registry[name].get()
+        except Exception:
+            timings[name] = None
+            continue
+        timings[name] = _registry[name].load_seconds
+
+    logging.info(f"Warm-up finished: {timings}")
+    return timings
+
+
+def status():
+    return {name: comp.status() for name, comp in _registry.items()}
+
+
+component_loaded = metrics.gauge("component_loaded", "1 once a lazy component is loaded", ["component"])
+model_memory_bytes = metrics.gauge(
+    "model_memory_bytes", "Parameter and buffer memory of loaded torch models", ["component"])
+
+
+def _model_memory_bytes(instance):
+    """
+    Bytes held by a torch model's parameters and buffers, or None for anything else
+    """
+    model = getattr(instance, "model", instance)  # pipelines wrap the model
+    if not hasattr(model, "parameters") or not hasattr(model, "buffers"):
+        return None
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+@metrics.on_collect
+def _collect_component_metrics():
+    for name, comp in list(_registry.items()):
+        component_loaded.set(1 if comp.loaded else 0, component=name)
+        if comp.loaded:
+            size = _model_memory_bytes(comp._instance)
+            if size is not None:
+                model_memory_bytes.set(size, component=name)
+
+
+def is_ready(names=None):
+    """
+    True once every required component (or every one of the given names) is loaded
+    """
+    if names is not None:
+        return all(_registry[name].loaded for name in names)
+    return all(comp.loaded for comp in _registry.values() if comp.required)
+
+
+# Default factories. Heavy libraries are imported inside the factories so that
+# importing this module (and app.py) stays cheap.
+def _load_nlp():
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+
+def _load_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(Config.EMBEDDING_MODEL)
+
+
+def _load_llm():
+    from Model.main1 import load_pipeline
+    return load_pipeline()
+
+
+def _load_mongo():
+    from pymongo import MongoClient
+    from mongo_setup import SlowQueryLogger, ensure_indexes
+    client = MongoClient(Config.MONGO_URI, event_listeners=[SlowQueryLogger(Config.MONGO_SLOW_QUERY_MS)])
+    db = client.knowledge_system
+    ensure_indexes(db)
+    return db
+
+
+def _load_neo4j():
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(Config.NEO4J_URI, auth=(Config.NEO4J_USERNAME, Config.NEO4J_PASSWORD))
+
+
+def _load_graph():
+    """
+    The KnowledgeGraph for GRAPH_BACKEND, shared by all requests
+    """
+    if Config.GRAPH_BACKEND == "memory":
+        from memory_graph import MemoryKnowledgeGraph
+        graph = MemoryKnowledgeGraph.open(Config.GRAPH_SNAPSHOT_PATH)
+        if Config.GRAPH_SNAPSHOT_PATH:
+            atexit.register(graph.save, Config.GRAPH_SNAPSHOT_PATH)
+        return graph
+
+    from knowlege_graph import KnowledgeGraph
+    return KnowledgeGraph(driver=get("neo4j"))
+
+
+def _load_passages():
+    from passage_index import PassageIndex
+    return PassageIndex(Config.PASSAGE_INDEX_DIR, dtype=Config.PASSAGE_EMBEDDING_DTYPE,
+                        rescore_factor=Config.PASSAGE_RESCORE_FACTOR)
+
+
+def _load_gemini():
+    from gemini_client import GeminiClient
+    return GeminiClient(
+        Config.GEMINI_API_KEY,
+        Config.GEMINI_BASE_URL,
+        model=Config.GEMINI_MODEL,
+        timeout=(Config.GEMINI_CONNECT_TIMEOUT_SECONDS, Config.GEMINI_READ_TIMEOUT_SECONDS),
+        max_retries=Config.GEMINI_MAX_RETRIES
+    )
+
+
+register("nlp", _load_nlp)
+register("embedder", _load_embedder)
+register("llm", _load_llm)
+register("mongo", _load_mongo)
+register("neo4j", _load_neo4j, required=Config.GRAPH_BACKEND == "neo4j")
+register("graph", _load_graph)
+register("passages", _load_passages, required=False)
+register("gemini", _load_gemini, required=False)
@@ -1,10 +1,142 @@
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def parse_budgets(value):
+    """
+    {role: max_new_tokens} from "role=budget,role=budget"; malformed entries are skipped with a warning
+    """
+    budgets = {}
+    for item in (item.strip() for item in value.split(',')):
+        if not item:
+            continue
+        parts = item.split('=', 1)
+        if len(parts) != 2 or not parts[0].strip() or not parts[1].strip().isdigit():
+            logging.warning(f"Ignoring malformed GENERATION_BUDGETS entry {item!r}")
+            continue
+        budgets[parts[0].strip()] = int(parts[1])
+    return budgets
+
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/knowledge_system')
     JWT_EXPIRATION_HOURS = 24
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+
+    # Graph store: 'neo4j', or 'memory' for the in-process networkx graph (memory_graph.py).
+    # The memory graph is loaded from GRAPH_SNAPSHOT_PATH at start and saved back on exit when set.
+    GRAPH_BACKEND = os.getenv('GRAPH_BACKEND', 'neo4j').lower()
+    GRAPH_SNAPSHOT_PATH = os.getenv('GRAPH_SNAPSHOT_PATH', '')
+
+    # Neo4j connection (GRAPH_BACKEND=neo4j)
+    NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+    NEO4J_USERNAME = os.getenv('NEO4J_USERNAME', 'neo4j')
+    NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
+
+    # Models
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    LLM_MODEL_PATH = os.getenv('LLM_MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Model'))
+
+    # Warm up heavy components in a background thread when the app starts
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'false').lower() == 'true'
+
+    # Roles answered with prompt-lookup assisted decoding (comma separated), e.g. "search". Opt in:
+    # assisted decoding is greedy, so listed roles no longer get the sampled replies of plain generation
+    ASSISTED_DECODING_ROLES = [r.strip() for r in os.getenv('ASSISTED_DECODING_ROLES', '').split(',') if r.strip()]
+    PROMPT_LOOKUP_NGRAM_SIZE = int(os.getenv('PROMPT_LOOKUP_NGRAM_SIZE', '3'))
+    PROMPT_LOOKUP_NUM_TOKENS = int(os.getenv('PROMPT_LOOKUP_NUM_TOKENS', '10'))
+
+    # Per-role max_new_tokens overrides, e.g. "search=400,gap_analysis=300"
+    GENERATION_BUDGETS = parse_budgets(os.getenv('GENERATION_BUDGETS', ''))
+
+    # Decoded-token and user-document cache used by token_required/admin_required
+    AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '4096'))
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv('AUTH_CACHE_TTL_SECONDS', '60'))
+
+    # MongoDB commands slower than this are logged as slow queries
+    MONGO_SLOW_QUERY_MS = int(os.getenv('MONGO_SLOW_QUERY_MS', '100'))
+
+    # Cypher queries: slower than CYPHER_SLOW_QUERY_MS are logged; with CYPHER_PROFILE_ABOVE_MS > 0 the
+    # next run of a query that slow is sent as PROFILE (at most once per interval) to record its db hits
+    CYPHER_SLOW_QUERY_MS = float(os.getenv('CYPHER_SLOW_QUERY_MS', '500'))
+    CYPHER_PROFILE_ABOVE_MS = float(os.getenv('CYPHER_PROFILE_ABOVE_MS', '0'))
+    CYPHER_PROFILE_INTERVAL_SECONDS = float(os.getenv('CYPHER_PROFILE_INTERVAL_SECONDS', '300'))
+    CYPHER_MAX_FINGERPRINTS = int(os.getenv('CYPHER_MAX_FINGERPRINTS', '500'))
+
+    # Query log: every search/chat query with its embedding and the cosine similarity of its closest
+    # passage (MongoDB, kept QUERY_LOG_RETENTION_DAYS). The gap clustering job (gap_clusters.py) groups
+    # queries scoring below GAP_SCORE_THRESHOLD (cosine, -1..1) in the last GAP_CLUSTER_WINDOW_DAYS into
+    # at most GAP_CLUSTERS gaps.
+    QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'true').lower() == 'true'
+    QUERY_LOG_RETENTION_DAYS = int(os.getenv('QUERY_LOG_RETENTION_DAYS', '90'))
+    GAP_SCORE_THRESHOLD = float(os.getenv('GAP_SCORE_THRESHOLD', '0.3'))
+    GAP_CLUSTERS = int(os.getenv('GAP_CLUSTERS', '8'))
+    GAP_CLUSTER_MIN_SIZE = int(os.getenv('GAP_CLUSTER_MIN_SIZE', '3'))
+    GAP_CLUSTER_WINDOW_DAYS = int(os.getenv('GAP_CLUSTER_WINDOW_DAYS', '7'))
+    GAP_CLUSTER_MAX_QUERIES = int(os.getenv('GAP_CLUSTER_MAX_QUERIES', '50000'))
+
+    # Slack gap notifications: digest window, spacing between posts, per-topic cooldown
+    SLACK_DIGEST_WINDOW_SECONDS = float(os.getenv('SLACK_DIGEST_WINDOW_SECONDS', '30'))
+    SLACK_MIN_POST_INTERVAL_SECONDS = float(os.getenv('SLACK_MIN_POST_INTERVAL_SECONDS', '1.1'))
+    SLACK_TOPIC_COOLDOWN_SECONDS = float(os.getenv('SLACK_TOPIC_COOLDOWN_SECONDS', '3600'))
+    FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
+
+    # Gemini API (question generation and chat summaries)
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    GEMINI_CONNECT_TIMEOUT_SECONDS = float(os.getenv('GEMINI_CONNECT_TIMEOUT_SECONDS', '5'))
+    GEMINI_READ_TIMEOUT_SECONDS = float(os.getenv('GEMINI_READ_TIMEOUT_SECONDS', '60'))
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+    QUESTIONS_CACHE_SIZE = int(os.getenv('QUESTIONS_CACHE_SIZE', '1024'))
+    QUESTIONS_CACHE_TTL_SECONDS = int(os.getenv('QUESTIONS_CACHE_TTL_SECONDS', '86400'))
+
+    # Chat summaries: new turns beyond this many characters are summarised map-reduce style
+    SUMMARY_CHUNK_CHARS = int(os.getenv('SUMMARY_CHUNK_CHARS', '12000'))
+
+    # Search paging: default and maximum rows per /api/search or /api/chat page
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+    SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', '100'))
+
+    # Response compression: bodies at least this large are gzip/deflate encoded
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', '6'))
+
+    # Embedding service: encode requests are batched up to this size or this wait
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+    EMBEDDING_BATCH_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', '5'))
+
+    # Passage index (passage_index.py): uploaded documents are split into chunks of PASSAGE_CHUNK_WORDS
+    # words overlapping by PASSAGE_CHUNK_OVERLAP_WORDS. /api/chat takes the PASSAGE_CANDIDATES passages
+    # closest to the query and gives the LLM the best ones fitting in PASSAGE_TOKEN_BUDGET (0 disables).
+    PASSAGE_INDEX_DIR = os.getenv('PASSAGE_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'passages'))
+    PASSAGE_CHUNK_WORDS = int(os.getenv('PASSAGE_CHUNK_WORDS', '150'))
+    PASSAGE_CHUNK_OVERLAP_WORDS = int(os.getenv('PASSAGE_CHUNK_OVERLAP_WORDS', '30'))
+    PASSAGE_CANDIDATES = int(os.getenv('PASSAGE_CANDIDATES', '20'))
+    PASSAGE_MIN_SCORE = float(os.getenv('PASSAGE_MIN_SCORE', '0.3'))
+    PASSAGE_TOKEN_BUDGET = int(os.getenv('PASSAGE_TOKEN_BUDGET', '1200'))
+    # Passage embeddings scanned as float32, float16 or int8 (a quarter of the memory; see
+    # benchmarks/bench_quantization.py). Quantised scans keep PASSAGE_RESCORE_FACTOR times as many
+    # candidates and rescore them at float32
+    PASSAGE_EMBEDDING_DTYPE = os.getenv('PASSAGE_EMBEDDING_DTYPE', 'float32').lower()
+    PASSAGE_RESCORE_FACTOR = int(os.getenv('PASSAGE_RESCORE_FACTOR', '4'))
+
+    # Query-analysis cache (embedding, entities, keywords per normalised query)
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '10000'))
+
+    # Request tracing: with TRACING_ENABLED, a TRACE_SAMPLE_RATE fraction of requests have their span
+    # tree written to the 'trace' logger. Requests sending TRACE_DEBUG_HEADER with an admin token are
+    # traced regardless and get the tree back in X-Trace and Server-Timing response headers (set the
+    # header name to an empty string to disable; TRACE_DEBUG_ADMIN_ONLY=false honours it for anyone,
+    # for local development).
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+    TRACE_DEBUG_HEADER = os.getenv('TRACE_DEBUG_HEADER', 'X-Debug-Trace')
+    TRACE_DEBUG_ADMIN_ONLY = os.getenv('TRACE_DEBUG_ADMIN_ONLY', 'true').lower() == 'true'
+
+    # ASGI app (asgi.py): threads running model calls (encoder, spaCy, LLM, bcrypt) off the event loop
+    ASGI_MODEL_WORKERS = int(os.getenv('ASGI_MODEL_WORKERS', '4'))
@@ -0,0 +1,196 @@
+"""
+Cost accounting for the Cypher queries sent to Neo4j.
+
+KnowledgeGraph._run reports every query here. Queries are
+grouped by fingerprint: the statement with comments, literals and
+whitespace normalised away, so the same query with different parameters
+lands in one bucket. Per fingerprint we keep call and row counts, wall
+time and the server's result_available_after / result_consumed_after.
+
+Queries slower than Config.CYPHER_SLOW_QUERY_MS are logged. With
+Config.CYPHER_PROFILE_ABOVE_MS set, the next run of a query that took
+longer is sent as PROFILE and its db hits are recorded; each fingerprint
+is profiled at most once per CYPHER_PROFILE_INTERVAL_SECONDS.
+"""
+from functools import lru_cache
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from config import Config
+import metrics
+
+neo4j_queries_total = metrics.counter("neo4j_queries_total", "Neo4j queries run", ["operation"])
+neo4j_query_errors_total = metrics.counter("neo4j_query_errors_total", "Neo4j queries that raised", ["operation"])
+neo4j_query_duration_seconds = metrics.histogram(
+    "neo4j_query_duration_seconds", "Neo4j query latency, including fetching all records", ["operation"])
+neo4j_slow_queries_total = metrics.counter(
+    "neo4j_slow_queries_total", "Neo4j queries slower than CYPHER_SLOW_QUERY_MS", ["operation"])
+neo4j_profiled_queries_total = metrics.counter(
+    "neo4j_profiled_queries_total", "Neo4j queries run under PROFILE", ["operation"])
+
+_COMMENT = re.compile(r"(^|\s)//[^\n]*")
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+# Statements PROFILE cannot wrap (schema commands) or that already carry a prefix
+_NOT_PROFILEABLE = ("create constraint", "create index", "drop ", "show ", "profile ", "explain ")
+
+STAT_ORDERS = ("total_ms", "max_ms", "calls", "rows", "errors", "db_hits_max")
+
+
+def normalize(query):
+    """
+    The query with comments dropped, literals replaced by ? and whitespace collapsed
+    """
+    text = _COMMENT.sub(r"\1", query)
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    (fingerprint, normalised text) of a query; the queries are module constants, so this is cached
+    """
+    text = normalize(query)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16], text
+
+
+def profile_db_hits(plan):
+    """
+    Total db hits over a PROFILE plan tree (summary.profile)
+    """
+    if not plan:
+        return 0
+    return plan.get("dbHits", 0) + sum(profile_db_hits(child) for child in plan.get("children", []))
+
+
+class CypherProfiler:
+    def __init__(self, slow_query_ms=500, profile_above_ms=0, profile_interval_seconds=300, max_fingerprints=500):
+        """
+        Per-fingerprint query statistics, the slow-query log and PROFILE sampling
+        """
+        self.slow_query_ms = slow_query_ms
+        self.profile_above_ms = profile_above_ms
+        self.profile_interval_seconds = profile_interval_seconds
+        self.max_fingerprints = max_fingerprints
+        self._stats = {}
+        self._profile_due = set()
+        self._last_profiled = {}
+        self._untracked = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, query):
+        """
+        (fingerprint, statement to send, whether it is PROFILEd) for a query about to run
+        """
+        key, _ = fingerprint(query)
+        if self.profile_above_ms and key in self._profile_due:
+            with self._lock:
+                if key in self._profile_due:
+                    self._profile_due.discard(key)
+                    self._last_profiled[key] = time.monotonic()
+                    return key, "PROFILE " + query, True
+        return key, query, False
+
+    def record(self, operation, query, seconds, rows=0, summary=None, profiled=False, error=None):
+        """
+        Account one execution; summary is the driver's ResultSummary when the query completed
+        """
+        key, text = fingerprint(query)
+        elapsed_ms = seconds * 1000
+        available_ms = getattr(summary, "result_available_after", None)
+        consumed_ms = getattr(summary, "result_consumed_after", None)
+        db_hits = profile_db_hits(getattr(summary, "profile", None)) if profiled else None
+
+        neo4j_queries_total.inc(operation=operation)
+        neo4j_query_duration_seconds.observe(seconds, operation=operation)
+        if error is not None:
+            neo4j_query_errors_total.inc(operation=operation)
+        if profiled:
+            neo4j_profiled_queries_total.inc(operation=operation)
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    self._untracked += 1
+                    stats = None
+                else:
+                    stats = self._stats[key] = {
+                        "fingerprint": key, "query": text, "operations": set(), "calls": 0, "errors": 0,
+                        "rows": 0, "total_ms": 0.0, "max_ms": 0.0, "available_after_ms": 0,
+                        "consumed_after_ms": 0, "slow": 0, "profiled": 0, "db_hits_last": None,
+                        "db_hits_max": None
+                    }
+            if stats is not None:
+                stats["operations"].add(operation)
+                stats["calls"] += 1
+                stats["rows"] += rows
+                stats["total_ms"] += elapsed_ms
+                stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+                stats["available_after_ms"] += available_ms or 0
+                stats["consumed_after_ms"] += consumed_ms or 0
+                if error is not None:
+                    stats["errors"] += 1
+                if elapsed_ms >= self.slow_query_ms:
+                    stats["slow"] += 1
+                if db_hits is not None:
+                    stats["profiled"] += 1
+                    stats["db_hits_last"] = db_hits
+                    stats["db_hits_max"] = max(stats["db_hits_max"] or 0, db_hits)
+
+            if (self.profile_above_ms and not profiled and error is None and elapsed_ms >= self.profile_above_ms
+                    and not text.lower().startswith(_NOT_PROFILEABLE)
+                    and time.monotonic() - self._last_profiled.get(key, float("-inf")) >= self.profile_interval_seconds):
+                self._profile_due.add(key)
+
+        if elapsed_ms >= self.slow_query_ms:
+            neo4j_slow_queries_total.inc(operation=operation)
+            logging.warning(
+                f"Slow Cypher query {key} ({operation}) took {elapsed_ms:.1f}ms "
+                f"(available after {available_ms}ms, consumed after {consumed_ms}ms, rows: {rows}"
+                f"{f', db hits: {db_hits}' if db_hits is not None else ''}): {text[:300]}"
+            )
+
+    def stats(self, order_by="total_ms", limit=None):
+        """
+        Per-fingerprint aggregates, most expensive first
+        """
+        if order_by not in STAT_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(STAT_ORDERS)}")
+        with self._lock:
+            entries = [dict(stats, operations=sorted(stats["operations"])) for stats in self._stats.values()]
+            untracked = self._untracked
+
+        for entry in entries:
+            calls = entry["calls"]
+            entry["mean_ms"] = entry["total_ms"] / calls if calls else 0.0
+            entry["mean_rows"] = entry["rows"] / calls if calls else 0.0
+        entries.sort(key=lambda entry: entry[order_by] or 0, reverse=True)
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "profile_above_ms": self.profile_above_ms,
+            "fingerprints": len(entries),
+            "untracked_calls": untracked,
+            "queries": entries[:limit] if limit else entries
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._profile_due.clear()
+            self._last_profiled.clear()
+            self._untracked = 0
+
+
+cypher_profiler = CypherProfiler(
+    slow_query_ms=Config.CYPHER_SLOW_QUERY_MS,
+    profile_above_ms=Config.CYPHER_PROFILE_ABOVE_MS,
+    profile_interval_seconds=Config.CYPHER_PROFILE_INTERVAL_SECONDS,
+    max_fingerprints=Config.CYPHER_MAX_FINGERPRINTS
+)
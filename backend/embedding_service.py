@@ -0,0 +1,122 @@
+from concurrent.futures import Future
+import itertools
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from config import Config
+import components
+import metrics
+
+embedding_batches_total = metrics.counter(
+    "embedding_batches_total", "Encoder calls made by the embedding service")
+embedding_texts_total = metrics.counter(
+    "embedding_texts_total", "Texts embedded by the embedding service")
+embedding_encode_seconds = metrics.counter(
+    "embedding_encode_seconds_total", "Time spent inside the encoder")
+embedding_queue_wait_seconds = metrics.counter(
+    "embedding_queue_wait_seconds_total", "Time texts spent queued before their batch was encoded")
+
+# Queue priorities: single query encodes go ahead of bulk (ingestion, corpus) texts
+INTERACTIVE, BULK = 0, 1
+
+
+class EmbeddingBatcher:
+    def __init__(self, get_model, max_batch_size=32, max_wait_ms=5):
+        """
+        Micro-batches encode requests from concurrent callers.
+
+        Each caller queues its text and waits on a future. A worker thread
+        takes the first queued text, gathers more until max_batch_size texts
+        are pending or max_wait_ms has passed, encodes them in one call and
+        hands every caller its own vector. Texts are taken in priority order
+        (INTERACTIVE before BULK, then first come first served), so a query
+        arriving behind a large encode_many waits for at most one batch.
+        """
+        self.get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, text, priority=INTERACTIVE):
+        """
+        Queue a text and return a concurrent.futures.Future for its vector
+        """
+        self.start()
+        future = Future()
+        self._queue.put((priority, next(self._sequence), time.monotonic(), text, future))
+        return future
+
+    def encode(self, text):
+        return self.submit(text).result()
+
+    def encode_many(self, texts, priority=BULK):
+        """
+        Vectors for several texts as a (len(texts), dim) float32 array
+        """
+        futures = [self.submit(text, priority) for text in texts]
+        return np.stack([future.result() for future in futures]) if futures else np.zeros((0, 0), dtype=np.float32)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._encode([entry[2:] for entry in batch])
+
+    def _encode(self, batch):
+        started = time.monotonic()
+        try:
+            vectors = self.get_model().encode([text for _, text, _ in batch], batch_size=len(batch))
+        except Exception as e:
+            logging.error(f"Embedding batch of {len(batch)} failed: {e}")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        finished = time.monotonic()
+        embedding_batches_total.inc()
+        embedding_texts_total.inc(len(batch))
+        embedding_encode_seconds.inc(finished - started)
+        embedding_queue_wait_seconds.inc(sum(started - queued_at for queued_at, _, _ in batch))
+
+        for (_, _, future), vector in zip(batch, vectors):
+            future.set_result(np.asarray(vector, dtype=np.float32))
+
+    def stats(self):
+        batches = embedding_batches_total.value()
+        texts = embedding_texts_total.value()
+        seconds = embedding_encode_seconds.value()
+        return {
+            "batches": batches,
+            "texts": texts,
+            "mean_batch_size": texts / batches if batches else 0.0,
+            "texts_per_second": texts / seconds if seconds else 0.0,
+            "mean_queue_wait_ms": 1000 * embedding_queue_wait_seconds.value() / texts if texts else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+
+# Every query, search corpus and ingestion encode goes through this one batcher
+embedding_service = EmbeddingBatcher(
+    lambda: components.get("embedder"),
+    max_batch_size=Config.EMBEDDING_BATCH_SIZE,
+    max_wait_ms=Config.EMBEDDING_BATCH_WAIT_MS
+)
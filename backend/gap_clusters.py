@@ -0,0 +1,177 @@
+"""
+Knowledge gaps discovered from the query log.
+
+Queries whose closest passage (cosine similarity, see services.log_query)
+scored below Config.GAP_SCORE_THRESHOLD are clustered on their embeddings
+with mini-batch k-means. Clusters are ranked by how many poorly answered
+queries they hold and how poorly they were answered. The LLM is only asked
+to name each cluster from its most central queries; it never reads the
+knowledge base. The ranked clusters are published as one MongoDB document
+that /api/gaps/clusters returns as is.
+
+Run the job periodically, e.g. from cron:
+    flask --app app cluster-gaps
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+
+import numpy as np
+from pymongo import DESCENDING
+
+from config import Config
+from query_cache import normalize_query
+from query_log import decode_embeddings
+import metrics
+
+gap_cluster_runs_total = metrics.counter("gap_cluster_runs_total", "Query-log clustering runs", ["status"])
+gap_cluster_seconds = metrics.counter("gap_cluster_seconds_total", "Time spent clustering the query log")
+
+LATEST_ID = "latest"
+
+
+def cluster_queries(embeddings, queries, scores, n_clusters=8, min_cluster_size=3, representatives=5, seed=0):
+    """
+    Group poorly answered queries by meaning.
+
+    Args:
+        embeddings: (n, dim) array of query embeddings
+        queries: the n query strings
+        scores: the n best-match scores
+    Returns:
+        clusters ranked by weight (size * (1 - mean score)), each with its
+        size, mean score, cohesion (mean cosine to the centroid) and its most
+        central distinct queries
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(embeddings) < min_cluster_size:
+        return []
+
+    # Unit vectors, so k-means on euclidean distance groups by cosine similarity
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+    k = max(1, min(n_clusters, len(embeddings) // min_cluster_size))
+    model = MiniBatchKMeans(n_clusters=k, random_state=seed, batch_size=1024, n_init=3)
+    labels = model.fit_predict(embeddings)
+    centroids = model.cluster_centers_ / np.maximum(np.linalg.norm(model.cluster_centers_, axis=1, keepdims=True), 1e-12)
+    similarity = np.einsum("ij,ij->i", embeddings, centroids[labels])
+
+    clusters = []
+    for label in range(k):
+        members = np.flatnonzero(labels == label)
+        if len(members) < min_cluster_size:
+            continue
+
+        # Most central first; repeated queries are listed once, with how often they were asked
+        counts = Counter(normalize_query(queries[i]) for i in members)
+        central, seen = [], set()
+        for i in members[np.argsort(-similarity[members])]:
+            key = normalize_query(queries[i])
+            if key not in seen:
+                seen.add(key)
+                central.append({"query": queries[i], "count": counts[key]})
+            if len(central) >= representatives:
+                break
+
+        mean_score = float(scores[members].mean())
+        clusters.append({
+            "size": int(len(members)),
+            "distinct_queries": len(counts),
+            "mean_score": round(mean_score, 4),
+            "cohesion": round(float(similarity[members].mean()), 4),
+            "weight": round(len(members) * (1 - mean_score), 4),
+            "queries": central
+        })
+
+    clusters.sort(key=lambda cluster: cluster["weight"], reverse=True)
+    for rank, cluster in enumerate(clusters, 1):
+        cluster["rank"] = rank
+    return clusters
+
+
+def llm_cluster_name(queries):
+    """
+    Short topic name for a cluster, from its most central queries
+    """
+    from Model.main1 import chat_with_ai
+
+    prompt = "Queries:\n" + "\n".join(f"- {query}" for query in queries)
+    reply = chat_with_ai(prompt, system_role="gap_naming")
+    lines = reply.strip().splitlines() if reply else []
+    return lines[0].strip(" \"'*#-.").strip()[:80] if lines else ""
+
+
+def name_clusters(clusters, namer=llm_cluster_name, previous=None):
+    """
+    Set each cluster's topic. Names from the previous run are reused for
+    clusters led by the same query, so unchanged gaps cost no LLM call.
+    """
+    reuse = {cluster["queries"][0]["query"]: cluster["topic"] for cluster in previous or [] if cluster.get("topic")}
+    for cluster in clusters:
+        lead = cluster["queries"][0]["query"]
+        topic = reuse.get(lead)
+        if not topic:
+            try:
+                topic = namer([entry["query"] for entry in cluster["queries"]])
+            except Exception as e:
+                logging.error(f"Could not name gap cluster: {e}")
+                topic = None
+        # Fall back to the most central query
+        cluster["topic"] = topic or lead
+    return clusters
+
+
+def load_low_scoring(db, since, threshold, limit):
+    """
+    (embeddings, queries, scores) of the newest logged queries scoring below threshold
+    """
+    cursor = (db.query_log
+              .find({"score": {"$lt": threshold}, "created_at": {"$gte": since}},
+                    {"_id": 0, "query": 1, "embedding": 1, "score": 1})
+              .sort("created_at", DESCENDING)
+              .limit(limit))
+    rows = list(cursor)
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32), [], []
+    return decode_embeddings([row["embedding"] for row in rows]), [row["query"] for row in rows], [row["score"] for row in rows]
+
+
+def latest_clusters(db):
+    return db.gap_clusters.find_one({"_id": LATEST_ID}, {"_id": 0})
+
+
+def run(db, namer=llm_cluster_name):
+    """
+    Cluster the recent low-scoring queries and publish the ranked gaps
+    """
+    started = time.perf_counter()
+    since = datetime.now(timezone.utc) - timedelta(days=Config.GAP_CLUSTER_WINDOW_DAYS)
+    try:
+        embeddings, queries, scores = load_low_scoring(
+            db, since, Config.GAP_SCORE_THRESHOLD, Config.GAP_CLUSTER_MAX_QUERIES)
+        clusters = cluster_queries(embeddings, queries, scores, n_clusters=Config.GAP_CLUSTERS,
+                                   min_cluster_size=Config.GAP_CLUSTER_MIN_SIZE)
+        previous = latest_clusters(db)
+        name_clusters(clusters, namer, previous["clusters"] if previous else None)
+    except Exception:
+        gap_cluster_runs_total.inc(status="error")
+        raise
+    finally:
+        gap_cluster_seconds.inc(time.perf_counter() - started)
+
+    published = {
+        "generated_at": datetime.now(timezone.utc),
+        "since": since,
+        "score_threshold": Config.GAP_SCORE_THRESHOLD,
+        "queries": len(queries),
+        "clusters": clusters
+    }
+    db.gap_clusters.replace_one({"_id": LATEST_ID}, published, upsert=True)
+    gap_cluster_runs_total.inc(status="ok")
+    logging.info(f"Published {len(clusters)} gap clusters from {len(queries)} low-scoring queries")
+    return published
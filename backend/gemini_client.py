@@ -0,0 +1,83 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import requests
+import logging
+
+import metrics
+
+gemini_requests_total = metrics.counter(
+    "gemini_requests_total", "Calls to the Gemini generateContent API", ["status"])
+gemini_prompt_chars_total = metrics.counter(
+    "gemini_prompt_chars_total", "Prompt characters sent to Gemini")
+
+
+class GeminiError(Exception):
+    pass
+
+
+class GeminiClient:
+    def __init__(self, api_key, base_url, model="gemini-2.0-flash", timeout=(5, 60),
+                 max_retries=2, pool_size=10):
+        """
+        Gemini generateContent client sharing one pooled HTTP session.
+
+        Connection errors and 429/5xx responses are retried with exponential
+        backoff, up to max_retries times. timeout is (connect, read) in seconds.
+        base_url can point at a local stub server for load tests.
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["POST"],
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def generate(self, prompt, temperature=0.7, max_output_tokens=1024):
+        """
+        Send a single-turn prompt and return the generated text, or None if no candidate came back
+        """
+        url = f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+        payload = {
+            "contents": [{
+                "parts": [{
+                    "text": prompt
+                }]
+            }],
+            "generationConfig": {
+                "temperature": temperature,
+                "topK": 40,
+                "topP": 0.95,
+                "maxOutputTokens": max_output_tokens,
+            }
+        }
+
+        gemini_prompt_chars_total.inc(len(prompt))
+        try:
+            response = self.session.post(url, params={"key": self.api_key}, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            gemini_requests_total.inc(status="error")
+            raise GeminiError(f"Gemini request failed: {e}") from e
+
+        gemini_requests_total.inc(status="ok")
+        response_data = response.json()
+        if 'candidates' in response_data and response_data['candidates']:
+            return response_data['candidates'][0]['content']['parts'][0]['text']
+
+        logging.warning("Gemini returned no candidates")
+        return None
+
+    def close(self):
+        self.session.close()
@@ -1,33 +1,411 @@
+from abc import ABC, abstractmethod
+
 from neo4j import GraphDatabase
 import uuid
 import logging
+import time
+
+from cypher_profiler import cypher_profiler
+
+# Read queries
+ALL_EXPERTS_QUERY = """
+                MATCH (e:Expert)
+                OPTIONAL MATCH (e)-[:PROVIDED]->(t:Tip)-[:HAS_TIP]-(d:Document)
+                RETURN e.id as id, e.name as name, e.email as email, e.expertise_areas as areas,
+                       count(DISTINCT t) as tips_count
+                """
+
+FIELD_DOCUMENTS_QUERY = """
+            MATCH (d:Document)
+            WHERE toLower(d.field) = toLower($field)
+            OR ANY(kw IN d.keywords WHERE toLower(kw) CONTAINS toLower($field))
+            RETURN
+                d.id as id,
+                d.title as title,
+                d.filename as filename,
+                d.fileLink as fileLink,
+                d.original_filename as original_filename,
+                d.author_name as author_name,
+                d.field as field,
+                d.keywords as keywords,
+                d.meme_type as meme_type,
+                toString(d.created_at) as created_at
+            ORDER BY d.created_at DESC
+            LIMIT 10
+            """
+
+# Materialised recommendations: a (:FieldRecommendations {field, document_ids}) node per learning
+# field (lowercased) holding the ids FIELD_DOCUMENTS_QUERY returns for it, newest first. Lists are
+# created by the first read of a field; add_document then prepends every new document to the lists
+# it matches, in the same statement that creates it.
+RECOMMENDATION_LIMIT = 10
+
+FIELD_RECOMMENDATIONS_QUERY = """
+            MATCH (r:FieldRecommendations {field: $field})
+            OPTIONAL MATCH (d:Document)
+            WHERE d.id IN r.document_ids
+            WITH r, d
+            ORDER BY d.created_at DESC
+            RETURN r.field as field, collect(d {
+                .id, .title, .filename, .fileLink, .original_filename, .author_name, .field, .keywords,
+                .meme_type, created_at: toString(d.created_at)
+            }) as documents
+            """
+
+STORE_FIELD_RECOMMENDATIONS_QUERY = """
+            MERGE (r:FieldRecommendations {field: $field})
+            SET r.document_ids = $document_ids, r.refreshed_at = datetime()
+            """
+
+ADD_DOCUMENT_QUERY = """
+            CREATE (d:Document:Gap {tip_count: 0, id: $id, title: $title, filename: $filename, original_filename: $original_filename, author_id: $author_id, author_name: $author_name, field: $field, keywords: $keywords, fileLink: $fileLink, meme_type: $meme_type, embedding: $embedding, created_at: datetime()})
+            WITH d
+            MATCH (r:FieldRecommendations)
+            WHERE toLower(d.field) = r.field
+            OR ANY(kw IN d.keywords WHERE toLower(kw) CONTAINS r.field)
+            SET r.document_ids = ([d.id] + r.document_ids)[0..$recommendation_limit]
+            """
+
+# Queries behind /api/search, /api/chat, /api/gaps and /api/tips
+# Each branch is ranked and cut to $limit rows on its own before the merge.
+# Rows sort by (relevance_score DESC, id ASC); the cursor is the last row of
+# the previous page and only rows strictly after it are returned.
+SEARCH_QUERY = """
+            CALL {
+                // First match documents
+                MATCH (d:Document)
+                WHERE
+                    toLower(d.title) CONTAINS toLower($search_query)
+                    OR
+                    toLower(d.original_filename) CONTAINS toLower($search_query)
+                    OR
+                    ANY(keyword IN d.keywords
+                        WHERE ANY(search_term IN $search_terms
+                            WHERE toLower(keyword) CONTAINS toLower(search_term)))
+                WITH d,
+                    CASE
+                        WHEN toLower(d.title) CONTAINS toLower($search_query) THEN 2
+                        WHEN toLower(d.original_filename) CONTAINS toLower($search_query) THEN 1.5
+                        ELSE 0
+                    END +
+                    size([keyword IN d.keywords
+                        WHERE ANY(search_term IN $search_terms
+                            WHERE toLower(keyword) CONTAINS toLower(search_term))]) as matching_count,
+                    toLower(d.title) CONTAINS toLower($search_query)
+                    OR
+                    ANY(keyword IN d.keywords
+                        WHERE ANY(search_term IN $search_terms
+                            WHERE toLower(keyword) CONTAINS toLower(search_term))) as gap_candidate
+                WITH d, gap_candidate, toFloat(matching_count) / (2 + size($search_terms)) as relevance_score
+                WHERE $cursor_score IS NULL
+                    OR relevance_score < $cursor_score
+                    OR (relevance_score = $cursor_score AND d.id > $cursor_id)
+                RETURN
+                    d.id as id,
+                    d.title as title,
+                    d.fileLink as fileLink,
+                    d.keywords as keywords,
+                    d.field as field,
+                    d.meme_type as meme_type,
+                    d.filename as filename,
+                    d.original_filename as original_filename,
+                    d.fileLink as viewLink,
+                    d.keywords as matched_keywords,
+                    relevance_score,
+                    d.author_name as author,
+                    toString(d.created_at) as created_at,
+                    'document' as doc_type,
+                    null as summary_content,
+                    gap_candidate
+                ORDER BY relevance_score DESC, id ASC
+                LIMIT $limit
+
+                UNION ALL
+
+                // Match summaries
+                MATCH (s:Summary)
+                WHERE
+                    toLower(s.topic) CONTAINS toLower($search_query)
+                    OR
+                    toLower(s.content) CONTAINS toLower($search_query)
+                WITH s,
+                    CASE
+                        WHEN toLower(s.topic) CONTAINS toLower($search_query) THEN 2
+                        WHEN toLower(s.content) CONTAINS toLower($search_query) THEN 1
+                        ELSE 0
+                    END as matching_count
+                WITH s, toFloat(matching_count) / (2 + size($search_terms)) as relevance_score
+                WHERE $cursor_score IS NULL
+                    OR relevance_score < $cursor_score
+                    OR (relevance_score = $cursor_score AND s.id > $cursor_id)
+                RETURN
+                    s.id as id,
+                    s.topic as title,
+                    null as fileLink,
+                    [] as keywords,
+                    s.field as field,
+                    'text/plain' as meme_type,
+                    null as filename,
+                    'Chat Summary' as original_filename,
+                    null as viewLink,
+                    [] as matched_keywords,
+                    relevance_score,
+                    s.author_name as author,
+                    toString(s.created_at) as created_at,
+                    'summary' as doc_type,
+                    CASE WHEN $include_summary_content THEN s.content ELSE null END as summary_content,
+                    false as gap_candidate
+                ORDER BY relevance_score DESC, id ASC
+                LIMIT $limit
+            }
+            RETURN *
+            ORDER BY relevance_score DESC, id ASC
+            LIMIT $limit
+            """
+
+ALL_TOPICS_QUERY = """
+                MATCH (d:Document)
+                RETURN DISTINCT
+                    d.title as topic,
+                    d.keywords as keywords,
+                    d.field as field,
+                    d.id as id
+                ORDER BY d.title
+            """
+
+TOPIC_QUERY = """
+                MATCH (d:Document)
+                WHERE toLower(d.title) CONTAINS toLower($topic)
+                   OR ANY(kw IN d.keywords WHERE toLower(kw) CONTAINS toLower($topic))
+                RETURN DISTINCT
+                    d.title as topic,
+                    d.keywords as keywords,
+                    d.field as field,
+                    d.id as id
+                ORDER BY d.title
+            """
+
+ADD_TIP_QUERY = """
+                MATCH (d:Document {id: $document_id})
+                MATCH (e:Expert {id: $expert_id})
+                CREATE (t:Tip {id: randomUUID(), content: $content, timestamp: datetime()})
+                CREATE (d)-[:HAS_TIP]->(t)
+                CREATE (e)-[:PROVIDED]->(t)
+                SET d.tip_count = coalesce(d.tip_count, 0) + 1
+                REMOVE d:Gap
+                RETURN t.id as tip_id
+            """
+
+# Gap state: every Document carries tip_count, and the :Gap label while it has no tips. Both are
+# updated in the statements that create documents and attach tips (creating the HAS_TIP relationship
+# locks the document first, so concurrent tips cannot lose an increment), so gap readers scan only :Gap
+# nodes instead of anti-joining every Document with its tips. GAP_BACKFILL_QUERY sets them on
+# documents written before this existed (see KnowledgeGraph.migrate_gap_state).
+KNOWLEDGE_GAPS_QUERY = """
+                MATCH (d:Document:Gap)
+                RETURN d.id as id, d.title as title, d.type as type
+                """
+
+GAP_BACKFILL_QUERY = """
+                MATCH (d:Document)
+                WHERE d.id > $after
+                WITH d
+                ORDER BY d.id
+                LIMIT $batch_size
+                WITH d, size([(d)-[:HAS_TIP]->() | 1]) as tips
+                SET d.tip_count = tips
+                FOREACH (_ IN CASE WHEN tips = 0 THEN [1] ELSE [] END | SET d:Gap)
+                FOREACH (_ IN CASE WHEN tips > 0 THEN [1] ELSE [] END | REMOVE d:Gap)
+                RETURN max(d.id) as last_id, count(d) as updated, sum(CASE WHEN tips = 0 THEN 1 ELSE 0 END) as gaps
+                """
+
+# Tips created through /api/tips carry content/timestamp, those from add_tip text/created_at
+DOCUMENT_BATCH_QUERY = """
+                MATCH (d:Document)
+                WHERE d.id > $after
+                  AND ($since IS NULL
+                       OR d.created_at >= datetime($since)
+                       OR EXISTS {
+                           MATCH (d)-[:HAS_TIP]->(t:Tip)
+                           WHERE coalesce(t.created_at, t.timestamp) >= datetime($since)
+                       })
+                WITH d
+                ORDER BY d.id
+                LIMIT $batch_size
+                OPTIONAL MATCH (d)-[:HAS_TIP]->(t:Tip)<-[:PROVIDED]-(e:Expert)
+                WITH d, collect({tip_id: t.id, text: coalesce(t.text, t.content), expert_name: e.name}) as tips
+                RETURN d.id as doc_id, d.title as title, d.type as type, d.embedding as embedding, tips
+                ORDER BY doc_id
+                """
+
+
+def document_from_record(record):
+    # Filter out None values from tips
+    tips = [tip for tip in record["tips"] if tip["tip_id"] is not None]
+    return {
+        "id": record["doc_id"],
+        "title": record["title"],
+        "type": record["type"],
+        "embedding": record["embedding"],
+        "tips_count": len(tips),
+        "tips": tips
+    }
+
+
+def expert_from_record(record):
+    return {
+        "id": record["id"],
+        "name": record["name"],
+        "email": record["email"],
+        "expertise_areas": record["areas"],
+        "tips_count": record["tips_count"]
+    }
+
 
-class KnowledgeGraph:
-    def __init__(self, uri, user, password):  # Fixed __init__ method name
+def field_document_from_record(record):
+    return {
+        "id": record["id"],
+        "title": record["title"],
+        "filename": record["filename"],
+        "fileLink": record["fileLink"],
+        "original_filename": record["original_filename"],
+        "author_name": record["author_name"],
+        "field": record["field"],
+        "keywords": record["keywords"],
+        "meme_type": record["meme_type"],
+        "created_at": record["created_at"]
+    }
+
+
+class KnowledgeGraphBackend(ABC):
+    """
+    The methods services.py calls on the "graph" component. KnowledgeGraph (Neo4j)
+    and memory_graph.MemoryKnowledgeGraph both implement all of them, with the
+    same return shapes; a backend missing one cannot be instantiated.
+    """
+    @abstractmethod
+    def close(self): ...
+
+    @abstractmethod
+    def init_db(self): ...
+
+    @abstractmethod
+    def add_document(self, knowledge): ...
+
+    @abstractmethod
+    def add_document_with_summary(self, title, summary, author_id, author_name): ...
+
+    @abstractmethod
+    def add_expert(self, name, email, expertise_areas): ...
+
+    @abstractmethod
+    def add_tip(self, text, document_id, expert_id): ...
+
+    @abstractmethod
+    def add_expert_tip(self, document_id, content, expert_id): ...
+
+    @abstractmethod
+    def add_outreach(self, outreach_id, document_ids, query=None, topic=None, expert_ids=()): ...
+
+    @abstractmethod
+    def get_document_with_tips(self, doc_id): ...
+
+    @abstractmethod
+    def get_all_documents(self): ...
+
+    @abstractmethod
+    def iter_documents(self, batch_size=500, since=None): ...
+
+    @abstractmethod
+    def iter_document_batches(self, batch_size=500, since=None): ...
+
+    @abstractmethod
+    def get_all_experts(self): ...
+
+    @abstractmethod
+    def find_knowledge_gaps(self): ...
+
+    @abstractmethod
+    def migrate_gap_state(self, batch_size=1000): ...
+
+    @abstractmethod
+    def find_experts_for_topic(self, topic): ...
+
+    @abstractmethod
+    def search_records(self, params): ...
+
+    @abstractmethod
+    def get_topics(self, topic=None): ...
+
+    @abstractmethod
+    def add_chat_summary(self, topic, summary, author_id, author_name, turn_count=None, turns_hash=None): ...
+
+    @abstractmethod
+    def get_chat_summary(self, summary_id): ...
+
+    @abstractmethod
+    def update_chat_summary(self, summary_id, summary, turn_count, turns_hash): ...
+
+    @abstractmethod
+    def get_documents_for_field(self, field): ...
+
+    @abstractmethod
+    def get_recommendations(self, field): ...
+
+    @abstractmethod
+    def store_recommendations(self, field, documents): ...
+
+
+class KnowledgeGraph(KnowledgeGraphBackend):
+    def __init__(self, uri=None, user=None, password=None, driver=None):  # Fixed __init__ method name
         """
-        Initialize connection to Neo4j database
+        Initialize connection to Neo4j database.
+        With driver, reuse an existing (shared) driver instead of opening one.
         """
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-        logging.info(f"Connected to Neo4j at {uri}")
-        
+        self._owns_driver = driver is None
+        self.driver = GraphDatabase.driver(uri, auth=(user, password)) if driver is None else driver
+        if self._owns_driver:
+            logging.info(f"Connected to Neo4j at {uri}")
+
     def close(self):
         """
-        Close the driver connection
+        Close the driver connection (a shared driver is left open)
         """
-        self.driver.close()
+        if self._owns_driver:
+            self.driver.close()
+
+    def _run(self, operation, query, **params):
+        """
+        Run one query in its own session and return all its records.
+        Timings, row counts and server-side summaries go to the Cypher
+        profiler under operation (the calling method's name).
+        """
+        _, statement, profiled = cypher_profiler.prepare(query)
+        started = time.perf_counter()
+        try:
+            with self.driver.session() as session:
+                result = session.run(statement, **params)
+                records = list(result)
+                summary = result.consume()
+        except Exception as e:
+            cypher_profiler.record(operation, query, time.perf_counter() - started, profiled=profiled, error=e)
+            raise
+        cypher_profiler.record(operation, query, time.perf_counter() - started, rows=len(records),
+                               summary=summary, profiled=profiled)
+        return records
         
     def init_db(self):
         """
         Initialize database schema with constraints
         """
-        with self.driver.session() as session:
-            # Create constraints for unique IDs
-            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE")
-            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (t:Tip) REQUIRE t.id IS UNIQUE")
-            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (e:Expert) REQUIRE e.id IS UNIQUE")
-            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (d:Document) REQUIRE d.title IS UNIQUE")
-            
-            logging.info("Database schema initialized")
+        # Create constraints for unique IDs
+        self._run("init_db", "CREATE CONSTRAINT IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE")
+        self._run("init_db", "CREATE CONSTRAINT IF NOT EXISTS FOR (t:Tip) REQUIRE t.id IS UNIQUE")
+        self._run("init_db", "CREATE CONSTRAINT IF NOT EXISTS FOR (e:Expert) REQUIRE e.id IS UNIQUE")
+        self._run("init_db", "CREATE CONSTRAINT IF NOT EXISTS FOR (d:Document) REQUIRE d.title IS UNIQUE")
+        self._run("init_db", "CREATE CONSTRAINT IF NOT EXISTS FOR (r:FieldRecommendations) REQUIRE r.field IS UNIQUE")
+
+        logging.info("Database schema initialized")
             
     def add_document(self, knowledge):
         """
@@ -35,11 +413,13 @@ class KnowledgeGraph:
         """
         doc_id = str(uuid.uuid4())
         
-        with self.driver.session() as session:
-            session.run(
-                "CREATE (d:Document {id: $id, title: $title, filename: $filename, original_filename: $original_filename, author_id: $author_id, author_name: $author_name, field: $field, keywords: $keywords, fileLink: $fileLink, meme_type: $meme_type, created_at: datetime()})",
-                id=doc_id, title=knowledge['title'], filename=knowledge['filename'], original_filename=knowledge['original_filename'], author_id=knowledge['author_id'], author_name=knowledge['author_name'], field=knowledge['field'], keywords=knowledge['keywords'], fileLink=knowledge['fileLink'], meme_type=knowledge['meme_type']
-            )
+        # Also prepends the document to the materialised recommendation lists it belongs to
+        self._run(
+            "add_document",
+            ADD_DOCUMENT_QUERY,
+            recommendation_limit=RECOMMENDATION_LIMIT,
+            id=doc_id, title=knowledge['title'], filename=knowledge['filename'], original_filename=knowledge['original_filename'], author_id=knowledge['author_id'], author_name=knowledge['author_name'], field=knowledge['field'], keywords=knowledge['keywords'], fileLink=knowledge['fileLink'], meme_type=knowledge['meme_type'], embedding=knowledge.get('embedding')
+        )
             
         return doc_id
     
@@ -49,11 +429,11 @@ class KnowledgeGraph:
         """
         doc_id = str(uuid.uuid4())
         
-        with self.driver.session() as session:
-            session.run(
-                "CREATE (d:Document {id: $id, title: $title, content: $content, author_id: $author_id, author_name: $author_name, created_at: datetime()})",
-                id=doc_id, title=title, content=summary, author_id=author_id, author_name=author_name
-            )
+        self._run(
+            "add_document_with_summary",
+            "CREATE (d:Document:Gap {id: $id, title: $title, content: $content, author_id: $author_id, author_name: $author_name, tip_count: 0, created_at: datetime()})",
+            id=doc_id, title=title, content=summary, author_id=author_id, author_name=author_name
+        )
             
         return doc_id   
     
@@ -64,11 +444,11 @@ class KnowledgeGraph:
         """
         expert_id = str(uuid.uuid4())
         
-        with self.driver.session() as session:
-            session.run(
-                "CREATE (e:Expert {id: $id, name: $name, email: $email, expertise_areas: $areas, created_at: datetime()})",
-                id=expert_id, name=name, email=email, areas=expertise_areas
-            )
+        self._run(
+            "add_expert",
+            "CREATE (e:Expert {id: $id, name: $name, email: $email, expertise_areas: $areas, created_at: datetime()})",
+            id=expert_id, name=name, email=email, areas=expertise_areas
+        )
             
         return expert_id
         
@@ -78,32 +458,36 @@ class KnowledgeGraph:
         """
         tip_id = str(uuid.uuid4())
         
-        with self.driver.session() as session:
-            # Create the tip
-            session.run(
-                "CREATE (t:Tip {id: $id, text: $text, created_at: datetime()})",
-                id=tip_id, text=text
-            )
-            
-            # Link tip to document
-            session.run(
-                """
-                MATCH (d:Document), (t:Tip)
-                WHERE d.id = $doc_id AND t.id = $tip_id
-                CREATE (d)-[:HAS_TIP]->(t)
-                """,
-                doc_id=document_id, tip_id=tip_id
-            )
-            
-            # Link tip to expert
-            session.run(
-                """
-                MATCH (e:Expert), (t:Tip)
-                WHERE e.id = $expert_id AND t.id = $tip_id
-                CREATE (e)-[:PROVIDED]->(t)
-                """,
-                expert_id=expert_id, tip_id=tip_id
-            )
+        # Create the tip
+        self._run(
+            "add_tip",
+            "CREATE (t:Tip {id: $id, text: $text, created_at: datetime()})",
+            id=tip_id, text=text
+        )
+
+        # Link tip to document
+        self._run(
+            "add_tip",
+            """
+            MATCH (d:Document), (t:Tip)
+            WHERE d.id = $doc_id AND t.id = $tip_id
+            CREATE (d)-[:HAS_TIP]->(t)
+            SET d.tip_count = coalesce(d.tip_count, 0) + 1
+            REMOVE d:Gap
+            """,
+            doc_id=document_id, tip_id=tip_id
+        )
+
+        # Link tip to expert
+        self._run(
+            "add_tip",
+            """
+            MATCH (e:Expert), (t:Tip)
+            WHERE e.id = $expert_id AND t.id = $tip_id
+            CREATE (e)-[:PROVIDED]->(t)
+            """,
+            expert_id=expert_id, tip_id=tip_id
+        )
             
         return tip_id
         
@@ -111,191 +495,326 @@ class KnowledgeGraph:
         """
         Get a document and all its associated tips
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (d:Document {id: $id})
-                OPTIONAL MATCH (d)-[:HAS_TIP]->(t:Tip)<-[:PROVIDED]-(e:Expert)
-                RETURN d.id as doc_id, d.title as title, d.content as content, 
-                       collect({tip_id: t.id, text: t.text, expert: e.name}) as tips
-                """,
-                id=doc_id
-            )
-            
-            record = result.single()
-            if not record:
-                return None
-                
-            return {
-                "id": record["doc_id"],
-                "title": record["title"],
-                "content": record["content"],
-                "tips": [tip for tip in record["tips"] if tip["tip_id"] is not None]
-            }
+        records = self._run(
+            "get_document_with_tips",
+            """
+            MATCH (d:Document {id: $id})
+            OPTIONAL MATCH (d)-[:HAS_TIP]->(t:Tip)<-[:PROVIDED]-(e:Expert)
+            RETURN d.id as doc_id, d.title as title, d.content as content, 
+                   collect({tip_id: t.id, text: t.text, expert: e.name}) as tips
+            """,
+            id=doc_id
+        )
+
+        if not records:
+            return None
+
+        record = records[0]
+        return {
+            "id": record["doc_id"],
+            "title": record["title"],
+            "content": record["content"],
+            "tips": [tip for tip in record["tips"] if tip["tip_id"] is not None]
+        }
             
     def get_all_documents(self):
         """
-        Get all documents with their associated tips
+        Get all documents with their associated tips.
+        Loads everything into memory; prefer iter_documents for large graphs.
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (d:Document)
-                OPTIONAL MATCH (d)-[:HAS_TIP]->(t:Tip)<-[:PROVIDED]-(e:Expert)
-                RETURN d.id as doc_id, d.title as title, d.type as type,
-                       collect({tip_id: t.id, text: t.text, expert_name: e.name}) as tips
-                """
-            )
-            
-            documents = []
-            for record in result:
-                # Filter out None values from tips
-                tips = [tip for tip in record["tips"] if tip["tip_id"] is not None]
-                
-                documents.append({
-                    "id": record["doc_id"],
-                    "title": record["title"],
-                    "type": record["type"],
-                    "tips_count": len(tips),
-                    "tips": tips
-                })
-                
-            return documents
-    
+        return list(self.iter_documents())
+
+    def iter_documents(self, batch_size=500, since=None):
+        """
+        Stream documents with their tips, ordered by id
+        """
+        for batch in self.iter_document_batches(batch_size=batch_size, since=since):
+            yield from batch
+
+    def iter_document_batches(self, batch_size=500, since=None):
+        """
+        Yield lists of at most batch_size documents (with tips), ordered by id.
+
+        Pages are fetched with keyset pagination on d.id, so only one batch
+        is held at a time. With since (datetime or ISO string) only documents
+        created, or given a tip, at or after that time are returned.
+        """
+        if since is not None and not isinstance(since, str):
+            since = since.isoformat()
+
+        after = ""
+        while True:
+            records = self._run("iter_document_batches", DOCUMENT_BATCH_QUERY,
+                                after=after, since=since, batch_size=batch_size)
+            batch = [document_from_record(record) for record in records]
+
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]["id"]
+
     def get_all_experts(self):
         """
         Get all experts from the knowledge graph
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (e:Expert)
-                OPTIONAL MATCH (e)-[:PROVIDED]->(t:Tip)-[:HAS_TIP]-(d:Document)
-                RETURN e.id as id, e.name as name, e.email as email, e.expertise_areas as areas,
-                       count(DISTINCT t) as tips_count
-                """
-            )
-            
-            experts = []
-            for record in result:
-                experts.append({
-                    "id": record["id"],
-                    "name": record["name"],
-                    "email": record["email"],
-                    "expertise_areas": record["areas"],
-                    "tips_count": record["tips_count"]
-                })
-                
-            return experts
-            
+        return [expert_from_record(record) for record in self._run("get_all_experts", ALL_EXPERTS_QUERY)]
+
     def find_knowledge_gaps(self):
         """
-        Find documents that have no associated tips (knowledge gaps)
+        Find documents that have no associated tips (knowledge gaps), via the :Gap label
         """
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (d:Document)
-                WHERE NOT (d)-[:HAS_TIP]->()
-                RETURN d.id as id, d.title as title, d.type as type
-                """
-            )
-            
-            gaps = [{"id": record["id"], "title": record["title"], "type": record["type"]} 
-                   for record in result]
-            
-            return gaps
+        records = self._run("find_knowledge_gaps", KNOWLEDGE_GAPS_QUERY)
+
+        gaps = [{"id": record["id"], "title": record["title"], "type": record["type"]} 
+               for record in records]
+
+        return gaps
             
+    def migrate_gap_state(self, batch_size=1000):
+        """
+        Backfill tip_count and the :Gap label on every document, batch_size
+        documents per statement. Safe to re-run. Returns (documents, gaps).
+        """
+        after, updated, gaps = "", 0, 0
+        while True:
+            records = self._run("migrate_gap_state", GAP_BACKFILL_QUERY, after=after, batch_size=batch_size)
+            if not records or not records[0]["updated"]:
+                break
+            updated += records[0]["updated"]
+            gaps += records[0]["gaps"]
+            after = records[0]["last_id"]
+        logging.info(f"Gap state backfilled on {updated} documents ({gaps} gaps)")
+        return updated, gaps
+
     def find_experts_for_topic(self, topic):
         """
         Find experts based on their expertise areas
         """
-        with self.driver.session() as session:
-            result = session.run(
+        records = self._run(
+            "find_experts_for_topic",
+            """
+            MATCH (e:Expert)
+            WHERE any(area IN e.expertise_areas WHERE toLower(area) CONTAINS toLower($topic))
+            RETURN e.id as id, e.name as name, e.email as email, e.expertise_areas as areas
+            """,
+            topic=topic
+        )
+
+        experts = [{"id": record["id"], "name": record["name"], "email": record["email"], "areas": record["areas"]}
+                 for record in records]
+
+        return experts  # Fixed indentation issue at line 211
+
+    def search_records(self, params):
+        """
+        Rows of SEARCH_QUERY for parameters built by services.search_params
+        """
+        return self._run("search_records", SEARCH_QUERY, **params)
+
+    def get_topics(self, topic=None):
+        """
+        Document topics (title, keywords, field, id) ordered by title, optionally
+        only those whose title or keywords contain topic
+        """
+        if topic is None:
+            return self._run("get_topics", ALL_TOPICS_QUERY)
+        return self._run("get_topics", TOPIC_QUERY, topic=topic)
+
+    def add_expert_tip(self, document_id, content, expert_id):
+        """
+        Attach a tip from an expert to a document in one statement.
+        Returns the tip id, or None if the document or the expert does not exist.
+        """
+        records = self._run("add_expert_tip", ADD_TIP_QUERY, document_id=document_id, content=content, expert_id=expert_id)
+        return records[0]["tip_id"] if records else None
+
+    def add_outreach(self, outreach_id, document_ids, query=None, topic=None, expert_ids=()):
+        """
+        Record a pending request for expert input about some documents
+        """
+        self._run(
+            "add_outreach",
+            """
+            CREATE (o:Outreach {
+                id: $id,
+                query: $query,
+                topic: $topic,
+                status: 'pending',
+                created_at: datetime()
+            })
+            """,
+            id=outreach_id,
+            query=query,
+            topic=topic
+        )
+
+        # Link outreach to documents
+        self._run(
+            "add_outreach",
+            """
+            MATCH (o:Outreach {id: $outreach_id}), (d:Document)
+            WHERE d.id IN $doc_ids
+            CREATE (o)-[:CONCERNS]->(d)
+            """,
+            outreach_id=outreach_id,
+            doc_ids=list(document_ids)
+        )
+
+        # Link outreach to experts
+        if expert_ids:
+            self._run(
+                "add_outreach",
                 """
-                MATCH (e:Expert)
-                WHERE any(area IN e.expertise_areas WHERE toLower(area) CONTAINS toLower($topic))
-                RETURN e.id as id, e.name as name, e.email as email, e.expertise_areas as areas
+                MATCH (o:Outreach {id: $outreach_id}), (e:Expert)
+                WHERE e.id IN $expert_ids
+                CREATE (o)-[:ASSIGNED_TO]->(e)
                 """,
-                topic=topic
+                outreach_id=outreach_id,
+                expert_ids=list(expert_ids)
             )
-            
-            experts = [{"id": record["id"], "name": record["name"], "email": record["email"], "areas": record["areas"]}
-                     for record in result]
-            
-            return experts  # Fixed indentation issue at line 211
 
-    def add_chat_summary(self, topic, summary, author_id, author_name):
+    def add_chat_summary(self, topic, summary, author_id, author_name, turn_count=None, turns_hash=None):
         """
         Add a chat summary as a separate Summary node in the knowledge graph
         """
         summary_id = str(uuid.uuid4())
         
-        with self.driver.session() as session:
-            session.run(
-                """
-                CREATE (s:Summary {
-                    id: $id,
-                    topic: $topic,
-                    content: $summary,
-                    author_id: $author_id,
-                    author_name: $author_name,
-                    type: 'chat_summary',
-                    created_at: datetime()
-                })
-                """,
-                id=summary_id,
-                topic=topic,
-                summary=summary,
-                author_id=author_id,
-                author_name=author_name
-            )
+        self._run(
+            "add_chat_summary",
+            """
+            CREATE (s:Summary {
+                id: $id,
+                topic: $topic,
+                content: $summary,
+                author_id: $author_id,
+                author_name: $author_name,
+                type: 'chat_summary',
+                turn_count: $turn_count,
+                turns_hash: $turns_hash,
+                created_at: datetime(),
+                updated_at: datetime()
+            })
+            """,
+            id=summary_id,
+            topic=topic,
+            summary=summary,
+            author_id=author_id,
+            author_name=author_name,
+            turn_count=turn_count,
+            turns_hash=turns_hash
+        )
             
         return summary_id
-    
-    def get_documents_for_field(self, field):
-         """
-         Retrieve documents from Neo4j that match the user's learning field.
-         In this example, we check if the Document's 'field' property
-         matches the user's field (case-insensitive).
-         """
-         with self.driver.session() as session:
-            result = session.run(
+
+    def get_chat_summary(self, summary_id):
+        """
+        Get a stored chat summary together with how many turns it covers
+        """
+        records = self._run(
+            "get_chat_summary",
             """
-            MATCH (d:Document)
-            WHERE toLower(d.field) = toLower($field)
-            OR ANY(kw IN d.keywords WHERE toLower(kw) CONTAINS toLower($field))
-            RETURN
-                d.id as id,
-                d.title as title,
-                d.filename as filename,
-                d.fileLink as fileLink,
-                d.original_filename as original_filename,
-                d.author_name as author_name,
-                d.field as field,
-                d.keywords as keywords,
-                d.meme_type as meme_type,
-                toString(d.created_at) as created_at
-            ORDER BY d.created_at DESC
-            LIMIT 10
+            MATCH (s:Summary {id: $id})
+            RETURN s.id as id, s.topic as topic, s.content as content, s.author_id as author_id,
+                   s.turn_count as turn_count, s.turns_hash as turns_hash
             """,
-            field=field
+            id=summary_id
         )
 
-            docs = []
-            for record in result:
-                doc = {
-                "id": record["id"],
-                "title": record["title"],
-                "filename": record["filename"],
-                "fileLink": record["fileLink"],
-                "original_filename": record["original_filename"],
-                "author_name": record["author_name"],
-                "field": record["field"],
-                "keywords": record["keywords"],
-                "meme_type": record["meme_type"],
-                "created_at": record["created_at"]
-            }
-            docs.append(doc)
-            return docs
+        if not records:
+            return None
+
+        record = records[0]
+        return {
+            "id": record["id"],
+            "topic": record["topic"],
+            "content": record["content"],
+            "author_id": record["author_id"],
+            "turn_count": record["turn_count"],
+            "turns_hash": record["turns_hash"]
+        }
+
+    def update_chat_summary(self, summary_id, summary, turn_count, turns_hash):
+        """
+        Replace the content of a rolling chat summary after new turns were folded in
+        """
+        self._run(
+            "update_chat_summary",
+            """
+            MATCH (s:Summary {id: $id})
+            SET s.content = $summary, s.turn_count = $turn_count,
+                s.turns_hash = $turns_hash, s.updated_at = datetime()
+            """,
+            id=summary_id,
+            summary=summary,
+            turn_count=turn_count,
+            turns_hash=turns_hash
+        )
+    
+    def get_documents_for_field(self, field):
+        """
+        Retrieve documents from Neo4j that match the user's learning field.
+        In this example, we check if the Document's 'field' property
+        matches the user's field (case-insensitive).
+        """
+        records = self._run("get_documents_for_field", FIELD_DOCUMENTS_QUERY, field=field)
+        return [field_document_from_record(record) for record in records]
+
+    def get_recommendations(self, field):
+        """
+        Recommended documents for a learning field from its materialised list.
+        On the first read of a field the list is built from get_documents_for_field.
+        """
+        key = field.lower()
+        records = self._run("get_recommendations", FIELD_RECOMMENDATIONS_QUERY, field=key)
+        if records:
+            return records[0]["documents"]
+
+        documents = self.get_documents_for_field(field)
+        self.store_recommendations(field, documents)
+        return documents
+
+    def store_recommendations(self, field, documents):
+        """
+        Materialise the recommendation list of a field (documents as returned by get_documents_for_field)
+        """
+        self._run("store_recommendations", STORE_FIELD_RECOMMENDATIONS_QUERY,
+                  field=field.lower(), document_ids=[doc["id"] for doc in documents][:RECOMMENDATION_LIMIT])
+
+
+class AsyncKnowledgeGraph:
+    def __init__(self, driver):
+        """
+        The hot read paths on the async Neo4j driver, for asgi.py: a request waiting
+        on the database does not hold a thread. Writes and the rarer reads stay on
+        the sync KnowledgeGraph.
+        """
+        self.driver = driver
+
+    async def close(self):
+        await self.driver.close()
+
+    async def _run(self, operation, query, **params):
+        """
+        Async counterpart of KnowledgeGraph._run, accounted in the same Cypher profiler
+        """
+        _, statement, profiled = cypher_profiler.prepare(query)
+        started = time.perf_counter()
+        try:
+            async with self.driver.session() as session:
+                result = await session.run(statement, **params)
+                records = [record async for record in result]
+                summary = await result.consume()
+        except Exception as e:
+            cypher_profiler.record(operation, query, time.perf_counter() - started, profiled=profiled, error=e)
+            raise
+        cypher_profiler.record(operation, query, time.perf_counter() - started, rows=len(records),
+                               summary=summary, profiled=profiled)
+        return records
 
+    async def search_records(self, params):
+        """
+        Rows of SEARCH_QUERY for parameters built by services.search_params
+        """
+        return await self._run("search_records", SEARCH_QUERY, **params)
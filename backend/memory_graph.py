@@ -0,0 +1,545 @@
+"""
+In-process KnowledgeGraph backed by a networkx MultiDiGraph.
+
+Implements knowlege_graph.KnowledgeGraphBackend with the same return shapes
+as knowlege_graph.KnowledgeGraph, so small
+deployments, tests and benchmarks can run without a Neo4j server
+(GRAPH_BACKEND=memory). Nodes are keyed by their id and carry a "label"
+attribute (Document, Tip, Expert, Summary, Outreach, FieldRecommendations); relationships are
+edges keyed by their type (HAS_TIP, PROVIDED, CONCERNS, ASSIGNED_TO).
+
+The graph can be saved to and loaded from a gzip-compressed pickle
+snapshot. Only load snapshots you wrote yourself: unpickling runs code.
+"""
+from datetime import datetime, timezone
+import gzip
+import logging
+import os
+import pickle
+import threading
+import uuid
+
+import networkx as nx
+import numpy as np
+
+from knowlege_graph import RECOMMENDATION_LIMIT, KnowledgeGraphBackend
+
+SNAPSHOT_VERSION = 1
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else None
+
+
+def _contains(value, fragment):
+    """
+    Cypher's toLower(value) CONTAINS toLower(fragment); null never matches
+    """
+    value = _lower(value)
+    return value is not None and fragment.lower() in value
+
+
+def _to_string(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _parse_datetime(value):
+    # Like Cypher's datetime($since): ISO strings without an offset are UTC
+    parsed = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _page_key(row):
+    return -row["relevance_score"], row["id"]
+
+
+def _after_cursor(score, row_id, cursor_score, cursor_id):
+    return cursor_score is None or score < cursor_score or (score == cursor_score and row_id > cursor_id)
+
+
+class MemoryKnowledgeGraph(KnowledgeGraphBackend):
+    def __init__(self, graph=None):
+        """
+        Knowledge graph held in memory. Every method takes one lock, so the
+        instance can be shared by all request threads.
+        """
+        self.graph = graph if graph is not None else nx.MultiDiGraph()
+        self._lock = threading.RLock()
+        # label -> {id: node attributes}, so label scans skip unrelated nodes
+        self._labels = {}
+        for node_id, data in self.graph.nodes(data=True):
+            self._labels.setdefault(data["label"], {})[node_id] = data
+        # Documents without tips are also indexed under "Gap", like the :Gap label in Neo4j
+        self._labels["Gap"] = {}
+        self.migrate_gap_state()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Graph from a snapshot written by save()
+        """
+        with gzip.open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported graph snapshot version: {snapshot.get('version')}")
+        graph = cls(snapshot["graph"])
+        logging.info(f"Loaded graph snapshot {path} ({graph.graph.number_of_nodes()} nodes)")
+        return graph
+
+    @classmethod
+    def open(cls, path=None):
+        """
+        Graph from the snapshot at path if it exists, otherwise an empty one
+        """
+        if path and os.path.exists(path):
+            return cls.load(path)
+        return cls()
+
+    def save(self, path):
+        """
+        Write a snapshot; the file is replaced atomically
+        """
+        with self._lock:
+            data = pickle.dumps({"version": SNAPSHOT_VERSION, "graph": self.graph}, protocol=pickle.HIGHEST_PROTOCOL)
+
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        logging.info(f"Saved graph snapshot to {path}")
+
+    def close(self):
+        pass
+
+    def init_db(self):
+        """
+        Nothing to set up; ids are generated unique
+        """
+        logging.info("In-memory graph initialized")
+
+    # Graph helpers; callers hold the lock
+    def _create(self, label, **properties):
+        node_id = properties.get("id") or str(uuid.uuid4())
+        properties["id"] = node_id
+        self.graph.add_node(node_id, label=label, **properties)
+        self._labels.setdefault(label, {})[node_id] = self.graph.nodes[node_id]
+        return node_id
+
+    def _nodes(self, label):
+        return list(self._labels.get(label, {}).values())
+
+    def _node(self, node_id, label):
+        data = self.graph.nodes.get(node_id)
+        return data if data is not None and data["label"] == label else None
+
+    def _targets(self, node_id, rel_type, label):
+        return [self.graph.nodes[target] for _, target, key in self.graph.out_edges(node_id, keys=True)
+                if key == rel_type and self.graph.nodes[target]["label"] == label]
+
+    def _sources(self, node_id, rel_type, label):
+        return [self.graph.nodes[source] for source, _, key in self.graph.in_edges(node_id, keys=True)
+                if key == rel_type and self.graph.nodes[source]["label"] == label]
+
+    def _tips_with_experts(self, doc_id):
+        # (d)-[:HAS_TIP]->(t:Tip)<-[:PROVIDED]-(e:Expert)
+        return [(tip, expert) for tip in self._targets(doc_id, "HAS_TIP", "Tip")
+                for expert in self._sources(tip["id"], "PROVIDED", "Expert")]
+
+    def _tip_added(self, doc_id):
+        doc = self.graph.nodes[doc_id]
+        doc["tip_count"] = doc.get("tip_count", 0) + 1
+        self._labels["Gap"].pop(doc_id, None)
+
+    def add_document(self, knowledge):
+        """
+        Add a document to the knowledge graph
+        """
+        embedding = knowledge.get('embedding')
+        with self._lock:
+            doc_id = self._create(
+                "Document", title=knowledge['title'], filename=knowledge['filename'],
+                original_filename=knowledge['original_filename'], author_id=knowledge['author_id'],
+                author_name=knowledge['author_name'], field=knowledge['field'], keywords=knowledge['keywords'],
+                fileLink=knowledge['fileLink'], meme_type=knowledge['meme_type'],
+                # float32 halves the snapshot size of the stored title embeddings
+                embedding=np.asarray(embedding, dtype=np.float32) if embedding is not None else None,
+                tip_count=0, created_at=_now()
+            )
+            self._labels["Gap"][doc_id] = self.graph.nodes[doc_id]
+            # Prepend to the materialised recommendation lists the document belongs to
+            doc = self.graph.nodes[doc_id]
+            for recommendations in self._nodes("FieldRecommendations"):
+                if self._matches_field(doc, recommendations["field"]):
+                    recommendations["document_ids"] = ([doc_id] + recommendations["document_ids"])[:RECOMMENDATION_LIMIT]
+            return doc_id
+
+    def add_document_with_summary(self, title, summary, author_id, author_name):
+        """
+        Add a document with a summary to the knowledge graph
+        """
+        with self._lock:
+            doc_id = self._create("Document", title=title, content=summary, author_id=author_id,
+                                  author_name=author_name, tip_count=0, created_at=_now())
+            self._labels["Gap"][doc_id] = self.graph.nodes[doc_id]
+            return doc_id
+
+    def add_expert(self, name, email, expertise_areas):
+        """
+        Add an expert to the knowledge graph
+        """
+        with self._lock:
+            return self._create("Expert", name=name, email=email, expertise_areas=expertise_areas, created_at=_now())
+
+    def add_tip(self, text, document_id, expert_id):
+        """
+        Add an expert tip related to a document
+        """
+        with self._lock:
+            tip_id = self._create("Tip", text=text, created_at=_now())
+            if self._node(document_id, "Document"):
+                self.graph.add_edge(document_id, tip_id, key="HAS_TIP")
+                self._tip_added(document_id)
+            if self._node(expert_id, "Expert"):
+                self.graph.add_edge(expert_id, tip_id, key="PROVIDED")
+        return tip_id
+
+    def add_expert_tip(self, document_id, content, expert_id):
+        """
+        Attach a tip from an expert to a document.
+        Returns the tip id, or None if the document or the expert does not exist.
+        """
+        with self._lock:
+            if not self._node(document_id, "Document") or not self._node(expert_id, "Expert"):
+                return None
+            tip_id = self._create("Tip", content=content, timestamp=_now())
+            self.graph.add_edge(document_id, tip_id, key="HAS_TIP")
+            self._tip_added(document_id)
+            self.graph.add_edge(expert_id, tip_id, key="PROVIDED")
+        return tip_id
+
+    def add_outreach(self, outreach_id, document_ids, query=None, topic=None, expert_ids=()):
+        """
+        Record a pending request for expert input about some documents
+        """
+        with self._lock:
+            self._create("Outreach", id=outreach_id, query=query, topic=topic, status='pending', created_at=_now())
+            for doc_id in document_ids:
+                if self._node(doc_id, "Document"):
+                    self.graph.add_edge(outreach_id, doc_id, key="CONCERNS")
+            for expert_id in expert_ids:
+                if self._node(expert_id, "Expert"):
+                    self.graph.add_edge(outreach_id, expert_id, key="ASSIGNED_TO")
+
+    def get_document_with_tips(self, doc_id):
+        """
+        Get a document and all its associated tips
+        """
+        with self._lock:
+            doc = self._node(doc_id, "Document")
+            if not doc:
+                return None
+            return {
+                "id": doc["id"],
+                "title": doc.get("title"),
+                "content": doc.get("content"),
+                "tips": [{"tip_id": tip["id"], "text": tip.get("text"), "expert": expert.get("name")}
+                         for tip, expert in self._tips_with_experts(doc_id)]
+            }
+
+    def get_all_documents(self):
+        """
+        Get all documents with their associated tips
+        """
+        return list(self.iter_documents())
+
+    def iter_documents(self, batch_size=500, since=None):
+        """
+        Stream documents with their tips, ordered by id
+        """
+        for batch in self.iter_document_batches(batch_size=batch_size, since=since):
+            yield from batch
+
+    def iter_document_batches(self, batch_size=500, since=None):
+        """
+        Yield lists of at most batch_size documents (with tips), ordered by id.
+        With since, only documents created, or given a tip, at or after that time.
+        """
+        since = _parse_datetime(since) if since is not None else None
+
+        after = ""
+        while True:
+            with self._lock:
+                batch = []
+                for doc in sorted((d for d in self._nodes("Document") if d["id"] > after), key=lambda d: d["id"]):
+                    if len(batch) >= batch_size:
+                        break
+                    document = self._document(doc, since)
+                    if document is not None:
+                        batch.append(document)
+
+            if not batch:
+                return
+            yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]["id"]
+
+    def _document(self, doc, since):
+        if since is not None and not (doc.get("created_at") and doc["created_at"] >= since):
+            tip_times = [tip.get("created_at") or tip.get("timestamp")
+                         for tip in self._targets(doc["id"], "HAS_TIP", "Tip")]
+            if not any(t and t >= since for t in tip_times):
+                return None
+
+        # Tips created through /api/tips carry content, those from add_tip text
+        tips = [{"tip_id": tip["id"], "text": tip["text"] if tip.get("text") is not None else tip.get("content"),
+                 "expert_name": expert.get("name")}
+                for tip, expert in self._tips_with_experts(doc["id"])]
+        return {
+            "id": doc["id"],
+            "title": doc.get("title"),
+            "type": doc.get("type"),
+            "embedding": doc.get("embedding"),
+            "tips_count": len(tips),
+            "tips": tips
+        }
+
+    def get_all_experts(self):
+        """
+        Get all experts from the knowledge graph
+        """
+        with self._lock:
+            experts = []
+            for expert in self._nodes("Expert"):
+                tips = [tip for tip in self._targets(expert["id"], "PROVIDED", "Tip")
+                        if self._sources(tip["id"], "HAS_TIP", "Document")
+                        or self._targets(tip["id"], "HAS_TIP", "Document")]
+                experts.append({
+                    "id": expert["id"],
+                    "name": expert.get("name"),
+                    "email": expert.get("email"),
+                    "expertise_areas": expert.get("expertise_areas"),
+                    "tips_count": len(tips)
+                })
+            return experts
+
+    def find_knowledge_gaps(self):
+        """
+        Find documents that have no associated tips (knowledge gaps)
+        """
+        with self._lock:
+            return [{"id": doc["id"], "title": doc.get("title"), "type": doc.get("type")} for doc in self._nodes("Gap")]
+
+    def migrate_gap_state(self, batch_size=1000):
+        """
+        Recompute tip_count and the Gap index of every document (snapshots
+        written before they existed). Returns (documents, gaps).
+        """
+        with self._lock:
+            gaps = self._labels["Gap"]
+            gaps.clear()
+            documents = self._nodes("Document")
+            for doc in documents:
+                doc["tip_count"] = sum(1 for _, _, key in self.graph.out_edges(doc["id"], keys=True) if key == "HAS_TIP")
+                if doc["tip_count"] == 0:
+                    gaps[doc["id"]] = doc
+            return len(documents), len(gaps)
+
+    def find_experts_for_topic(self, topic):
+        """
+        Find experts based on their expertise areas
+        """
+        with self._lock:
+            return [{"id": expert["id"], "name": expert.get("name"), "email": expert.get("email"),
+                     "areas": expert.get("expertise_areas")}
+                    for expert in self._nodes("Expert")
+                    if any(_contains(area, topic) for area in expert.get("expertise_areas") or [])]
+
+    def search_records(self, params):
+        """
+        The rows SEARCH_QUERY returns for parameters built by services.search_params
+        """
+        search_query = params["search_query"]
+        search_terms = params["search_terms"]
+        limit = params["limit"]
+        cursor = params["cursor_score"], params["cursor_id"]
+        denominator = 2 + len(search_terms)
+
+        with self._lock:
+            documents = []
+            for doc in self._nodes("Document"):
+                keywords = doc.get("keywords") or []
+                title_match = _contains(doc.get("title"), search_query)
+                filename_match = _contains(doc.get("original_filename"), search_query)
+                matched = [kw for kw in keywords if any(_contains(kw, term) for term in search_terms)]
+                if not (title_match or filename_match or matched):
+                    continue
+
+                score = ((2 if title_match else 1.5 if filename_match else 0) + len(matched)) / denominator
+                if not _after_cursor(score, doc["id"], *cursor):
+                    continue
+                documents.append({
+                    "id": doc["id"],
+                    "title": doc.get("title"),
+                    "fileLink": doc.get("fileLink"),
+                    "keywords": doc.get("keywords"),
+                    "field": doc.get("field"),
+                    "meme_type": doc.get("meme_type"),
+                    "filename": doc.get("filename"),
+                    "original_filename": doc.get("original_filename"),
+                    "viewLink": doc.get("fileLink"),
+                    "matched_keywords": doc.get("keywords"),
+                    "relevance_score": score,
+                    "author": doc.get("author_name"),
+                    "created_at": _to_string(doc.get("created_at")),
+                    "doc_type": 'document',
+                    "summary_content": None,
+                    # As in SEARCH_QUERY, a match on the filename alone does not make a gap candidate
+                    "gap_candidate": title_match or bool(matched)
+                })
+
+            summaries = []
+            for summary in self._nodes("Summary"):
+                if _contains(summary.get("topic"), search_query):
+                    score = 2 / denominator
+                elif _contains(summary.get("content"), search_query):
+                    score = 1 / denominator
+                else:
+                    continue
+                if not _after_cursor(score, summary["id"], *cursor):
+                    continue
+                summaries.append({
+                    "id": summary["id"],
+                    "title": summary.get("topic"),
+                    "fileLink": None,
+                    "keywords": [],
+                    "field": summary.get("field"),
+                    "meme_type": 'text/plain',
+                    "filename": None,
+                    "original_filename": 'Chat Summary',
+                    "viewLink": None,
+                    "matched_keywords": [],
+                    "relevance_score": score,
+                    "author": summary.get("author_name"),
+                    "created_at": _to_string(summary.get("created_at")),
+                    "doc_type": 'summary',
+                    "summary_content": summary.get("content") if params["include_summary_content"] else None,
+                    "gap_candidate": False
+                })
+
+        return sorted(documents + summaries, key=_page_key)[:limit]
+
+    def get_topics(self, topic=None):
+        """
+        Document topics (title, keywords, field, id) ordered by title, optionally
+        only those whose title or keywords contain topic
+        """
+        with self._lock:
+            documents = [doc for doc in self._nodes("Document")
+                         if topic is None or _contains(doc.get("title"), topic)
+                         or any(_contains(kw, topic) for kw in doc.get("keywords") or [])]
+            rows = [{"topic": doc.get("title"), "keywords": doc.get("keywords"), "field": doc.get("field"),
+                     "id": doc["id"]} for doc in documents]
+        # Cypher sorts nulls last
+        return sorted(rows, key=lambda row: (row["topic"] is None, row["topic"] or ""))
+
+    def add_chat_summary(self, topic, summary, author_id, author_name, turn_count=None, turns_hash=None):
+        """
+        Add a chat summary as a separate Summary node in the knowledge graph
+        """
+        now = _now()
+        with self._lock:
+            return self._create(
+                "Summary", topic=topic, content=summary, author_id=author_id, author_name=author_name,
+                type='chat_summary', turn_count=turn_count, turns_hash=turns_hash, created_at=now, updated_at=now
+            )
+
+    def get_chat_summary(self, summary_id):
+        """
+        Get a stored chat summary together with how many turns it covers
+        """
+        with self._lock:
+            summary = self._node(summary_id, "Summary")
+            if not summary:
+                return None
+            return {
+                "id": summary["id"],
+                "topic": summary.get("topic"),
+                "content": summary.get("content"),
+                "author_id": summary.get("author_id"),
+                "turn_count": summary.get("turn_count"),
+                "turns_hash": summary.get("turns_hash")
+            }
+
+    def update_chat_summary(self, summary_id, summary, turn_count, turns_hash):
+        """
+        Replace the content of a rolling chat summary after new turns were folded in
+        """
+        with self._lock:
+            node = self._node(summary_id, "Summary")
+            if node:
+                node.update(content=summary, turn_count=turn_count, turns_hash=turns_hash, updated_at=_now())
+
+    @staticmethod
+    def _matches_field(doc, field):
+        return (_lower(doc.get("field")) == field.lower()
+                or any(_contains(kw, field) for kw in doc.get("keywords") or []))
+
+    @staticmethod
+    def _field_document(doc):
+        return {
+            "id": doc["id"],
+            "title": doc.get("title"),
+            "filename": doc.get("filename"),
+            "fileLink": doc.get("fileLink"),
+            "original_filename": doc.get("original_filename"),
+            "author_name": doc.get("author_name"),
+            "field": doc.get("field"),
+            "keywords": doc.get("keywords"),
+            "meme_type": doc.get("meme_type"),
+            "created_at": _to_string(doc.get("created_at"))
+        }
+
+    def get_documents_for_field(self, field):
+        """
+        Documents whose field matches the user's learning field (case-insensitive)
+        or whose keywords contain it, newest first
+        """
+        with self._lock:
+            documents = [doc for doc in self._nodes("Document") if self._matches_field(doc, field)]
+            documents.sort(key=lambda doc: doc.get("created_at") or datetime.min.replace(tzinfo=timezone.utc),
+                           reverse=True)
+            return [self._field_document(doc) for doc in documents[:RECOMMENDATION_LIMIT]]
+
+    def get_recommendations(self, field):
+        """
+        Recommended documents for a learning field from its materialised list.
+        On the first read of a field the list is built from get_documents_for_field.
+        """
+        with self._lock:
+            recommendations = self._node(f"field-recommendations:{field.lower()}", "FieldRecommendations")
+            if recommendations is not None:
+                return [self._field_document(self.graph.nodes[doc_id])
+                        for doc_id in recommendations["document_ids"] if doc_id in self.graph]
+
+            documents = self.get_documents_for_field(field)
+            self.store_recommendations(field, documents)
+            return documents
+
+    def store_recommendations(self, field, documents):
+        """
+        Materialise the recommendation list of a field (documents as returned by get_documents_for_field)
+        """
+        key = field.lower()
+        with self._lock:
+            node = self._node(f"field-recommendations:{key}", "FieldRecommendations")
+            document_ids = [doc["id"] for doc in documents][:RECOMMENDATION_LIMIT]
+            if node is not None:
+                node.update(document_ids=document_ids, refreshed_at=_now())
+            else:
+                self._create("FieldRecommendations", id=f"field-recommendations:{key}", field=key,
+                             document_ids=document_ids, refreshed_at=_now())
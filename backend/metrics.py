@@ -0,0 +1,193 @@
+import bisect
+import logging
+import math
+import threading
+
+# Content type of exposition() output
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from fast cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    def __init__(self, name, description, labelnames=()):
+        """
+        A monotonically increasing value, optionally split by labels
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Observations counted into cumulative buckets, with their sum and count, optionally split by labels
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def sum(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[1] if state else 0.0
+
+    def samples(self):
+        """
+        (labels, {"buckets": [(upper bound, cumulative count), ...], "sum": ..., "count": ...}) per label set
+        """
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        result = []
+        for key, counts, total, count in values:
+            cumulative, running = [], 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                running += bucket_count
+                cumulative.append((bound, running))
+            result.append((dict(zip(self.labelnames, key)), {"buckets": cumulative, "sum": total, "count": count}))
+        return result
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+_collectors = []
+
+
+def _get_or_create(cls, name, description, labelnames, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, description, labelnames, **kwargs)
+            _registry[name] = metric
+        return metric
+
+
+def counter(name, description, labelnames=()):
+    return _get_or_create(Counter, name, description, labelnames)
+
+
+def gauge(name, description, labelnames=()):
+    return _get_or_create(Gauge, name, description, labelnames)
+
+
+def histogram(name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, description, labelnames, buckets=buckets)
+
+
+def on_collect(fn):
+    """
+    Register fn() to run before every snapshot/exposition, to refresh gauges that are read on demand
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def _collect():
+    for fn in list(_collectors):
+        try:
+            fn()
+        except Exception as e:
+            logging.error(f"Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+
+
+def snapshot():
+    """
+    Current value of every metric, keyed by metric name and then by label values
+    """
+    _collect()
+    result = {}
+    for name, metric in list(_registry.items()):
+        values = {}
+        for labels, value in metric.samples():
+            key = ",".join(f"{k}={v}" for k, v in labels.items()) or "total"
+            # Histograms are summarised by count and sum; /metrics has the buckets
+            values[key] = {"count": value["count"], "sum": value["sum"]} if isinstance(metric, Histogram) else value
+        result[name] = values
+    return result
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels.items()) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition():
+    """
+    Every metric in the Prometheus text format (version 0.0.4)
+    """
+    _collect()
+    lines = []
+    for name, metric in sorted(list(_registry.items())):
+        kind = "histogram" if isinstance(metric, Histogram) else "gauge" if isinstance(metric, Gauge) else "counter"
+        lines.append(f"# HELP {name} " + metric.description.replace("\\", "\\\\").replace("\n", "\\n"))
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in metric.samples():
+            if kind == "histogram":
+                for bound, count in value["buckets"]:
+                    lines.append(f"{name}_bucket{_labels(labels, ('le', _number(bound)))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
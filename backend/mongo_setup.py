@@ -0,0 +1,93 @@
+from pymongo import ASCENDING, monitoring
+from pymongo.errors import OperationFailure
+import logging
+import threading
+
+from config import Config
+import metrics
+
+# Every index the app relies on, per collection. ensure_indexes() creates any
+# that are missing; create_index is a no-op for indexes that already exist.
+INDEXES = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "name": "email_unique", "unique": True},
+    ],
+    # Entries expire after the retention period; the clustering job reads low scores in a time window
+    "query_log": [
+        {"keys": [("created_at", ASCENDING)], "name": "created_at_ttl",
+         "expireAfterSeconds": Config.QUERY_LOG_RETENTION_DAYS * 86400},
+        {"keys": [("score", ASCENDING), ("created_at", ASCENDING)], "name": "score_created_at"},
+    ],
+}
+
+mongo_commands_total = metrics.counter(
+    "mongo_commands_total", "MongoDB commands sent", ["command", "status"])
+mongo_command_duration_seconds = metrics.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ["command"])
+mongo_slow_commands_total = metrics.counter(
+    "mongo_slow_commands_total", "MongoDB commands slower than MONGO_SLOW_QUERY_MS", ["command"])
+
+# Commands that are driver housekeeping rather than application queries
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue", "buildInfo"}
+
+
+def ensure_indexes(db):
+    """
+    Create the declared indexes. Failures are logged so a bad index (e.g.
+    duplicate emails blocking the unique index) does not stop the app.
+    """
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            options = {key: value for key, value in index.items() if key != "keys"}
+            try:
+                db[collection].create_index(index["keys"], **options)
+            except OperationFailure as e:
+                logging.error(f"Could not create index {index['name']} on {collection}: {e}")
+    logging.info(f"MongoDB indexes ensured for: {', '.join(INDEXES)}")
+
+
+class SlowQueryLogger(monitoring.CommandListener):
+    def __init__(self, threshold_ms):
+        """
+        Log commands that take longer than threshold_ms, using pymongo command monitoring
+        """
+        self.threshold_ms = threshold_ms
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        command = event.command
+        # Keep only the shape of the query: field names, not user-supplied values
+        query = command.get("filter") or command.get("q") or {}
+        summary = {
+            "collection": command.get(event.command_name),
+            "filter_fields": sorted(query.keys()) if isinstance(query, dict) else [],
+            "projection": sorted((command.get("projection") or {}).keys())
+        }
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = summary
+
+    def _finish(self, event, status):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        with self._lock:
+            summary = self._pending.pop((event.connection_id, event.request_id), {})
+
+        mongo_commands_total.inc(command=event.command_name, status=status)
+        duration_ms = event.duration_micros / 1000
+        mongo_command_duration_seconds.observe(duration_ms / 1000, command=event.command_name)
+        if duration_ms >= self.threshold_ms:
+            mongo_slow_commands_total.inc(command=event.command_name)
+            logging.warning(
+                f"Slow MongoDB {event.command_name} on {event.database_name}.{summary.get('collection')} "
+                f"took {duration_ms:.1f}ms (filter fields: {summary.get('filter_fields')}, "
+                f"projection: {summary.get('projection')})"
+            )
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
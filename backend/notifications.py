@@ -0,0 +1,183 @@
+from slack_sdk.errors import SlackApiError
+from urllib.parse import quote
+import logging
+import queue
+import threading
+import time
+
+import metrics
+
+notifications_enqueued_total = metrics.counter(
+    "slack_notifications_enqueued_total", "Gap notifications accepted by the outbox")
+notifications_dropped_total = metrics.counter(
+    "slack_notifications_dropped_total", "Gap notifications dropped because the outbox queue was full")
+topics_suppressed_total = metrics.counter(
+    "slack_topics_suppressed_total", "Gap topics skipped because they were notified recently")
+digests_sent_total = metrics.counter(
+    "slack_digests_sent_total", "Digest messages posted to Slack", ["status"])
+
+
+class SlackOutbox:
+    def __init__(self, client, channel, window_seconds=30, min_interval_seconds=1.1,
+                 topic_cooldown_seconds=3600, max_queue_size=1000, max_retries=3,
+                 frontend_url="http://localhost:3000"):
+        """
+        Background sender for knowledge-gap notifications.
+
+        Searches put gaps on a queue and return immediately. A sender thread
+        gathers them per topic for window_seconds, posts one digest message,
+        spaces posts at least min_interval_seconds apart (Slack allows about
+        one message per second per channel), and skips topics already sent
+        within topic_cooldown_seconds.
+        """
+        self.client = client
+        self.channel = channel
+        self.window_seconds = window_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.topic_cooldown_seconds = topic_cooldown_seconds
+        self.max_retries = max_retries
+        self.frontend_url = frontend_url
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._pending = {}  # topic -> list of queries that hit it
+        self._window_started = None
+        self._last_sent = {}  # topic -> time of the last digest that included it
+        self._last_post_at = 0.0
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="slack-outbox", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Flush whatever is pending and stop the sender thread
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, gaps, query):
+        """
+        Queue gap topics found for a search. Never blocks; returns False if the queue is full.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((time.monotonic(), query, [gap["topic"] for gap in gaps]))
+        except queue.Full:
+            notifications_dropped_total.inc()
+            logging.warning("Slack outbox is full, dropping gap notification")
+            return False
+        notifications_enqueued_total.inc()
+        return True
+
+    def _run(self):
+        while True:
+            timeout = self.window_seconds
+            if self._window_started is not None:
+                timeout = max(0.0, self._window_started + self.window_seconds - time.monotonic())
+
+            try:
+                queued_at, query, topics = self._queue.get(timeout=min(timeout, 0.5))
+                self._add(queued_at, query, topics)
+            except queue.Empty:
+                pass
+
+            window_due = (self._window_started is not None
+                          and time.monotonic() >= self._window_started + self.window_seconds)
+            if window_due or (self._stopping.is_set() and self._queue.empty()):
+                self._flush()
+                if self._stopping.is_set() and self._queue.empty():
+                    return
+
+    def _add(self, queued_at, query, topics):
+        now = time.monotonic()
+        for topic in topics:
+            last_sent = self._last_sent.get(topic)
+            if last_sent is not None and now - last_sent < self.topic_cooldown_seconds:
+                topics_suppressed_total.inc()
+                continue
+            queries = self._pending.setdefault(topic, [])
+            if query not in queries:
+                queries.append(query)
+            if self._window_started is None:
+                self._window_started = queued_at
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        self._window_started = None
+        if not pending:
+            return
+
+        now = time.monotonic()
+        for topic in pending:
+            self._last_sent[topic] = now
+        # Forget cooldowns that have expired so the map stays bounded
+        self._last_sent = {t: at for t, at in self._last_sent.items() if now - at < self.topic_cooldown_seconds}
+
+        self._post(self.build_digest(pending))
+
+    def build_digest(self, pending):
+        """
+        One message listing every pending topic with the searches that surfaced it
+        """
+        lines = []
+        for topic, queries in sorted(pending.items(), key=lambda item: -len(item[1])):
+            shown = ", ".join(f"\"{q}\"" for q in queries[:3])
+            more = f" and {len(queries) - 3} more" if len(queries) > 3 else ""
+            lines.append(f"• {topic} (searched for: {shown}{more})")
+        message = "Knowledge Gaps Detected\nThe following topics need expert input:\n" + "\n".join(lines)
+
+        first_query = next(iter(pending.values()))[0]
+        return {
+            "channel": self.channel,
+            "text": message,
+            "blocks": [
+                {
+                    "type": "section",
+                    "text": {"type": "mrkdwn", "text": message}
+                },
+                {
+                    "type": "actions",
+                    "elements": [
+                        {
+                            "type": "button",
+                            "text": {"type": "plain_text", "text": "Add Expertise"},
+                            "value": "add_tip",
+                            "url": f"{self.frontend_url}/expert?query={quote(first_query)}"  # Frontend expert page
+                        }
+                    ]
+                }
+            ]
+        }
+
+    def _post(self, message):
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_post_at + self.min_interval_seconds - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_post_at = time.monotonic()
+
+            try:
+                self.client.chat_postMessage(**message)
+                digests_sent_total.inc(status="ok")
+                return True
+            except SlackApiError as e:
+                if e.response.status_code == 429 and attempt < self.max_retries:
+                    headers = {k.lower(): v for k, v in (e.response.headers or {}).items()}
+                    retry_after = int(headers.get("retry-after", 1))
+                    logging.warning(f"Slack rate limited, retrying in {retry_after}s")
+                    time.sleep(retry_after)
+                    continue
+                digests_sent_total.inc(status="error")
+                logging.error(f"Error sending Slack notification: {e.response['error']}")
+                return False
+            except Exception as e:
+                digests_sent_total.inc(status="error")
+                logging.error(f"Error sending Slack notification: {e}")
+                return False
@@ -0,0 +1,357 @@
+"""
+Passage store for retrieval-augmented chat.
+
+At ingestion each document's page texts are split into overlapping chunks
+of Config.PASSAGE_CHUNK_WORDS words. Chunk embeddings are appended to a
+float32 matrix on disk that is memory-mapped for search, so the index does
+not have to fit in (or be loaded into) process memory. Row i of the offsets
+table points back to the chunk's document and page and to its text in the
+passages file:
+
+    embeddings.f32   (rows, dim) float32, unit length
+    offsets.bin      rows of OFFSET_DTYPE
+    passages.txt     UTF-8 chunk texts, back to back
+    documents.jsonl  {"id", "title"} per indexed document
+    embeddings-N.f16 or embeddings-N.i8
+                     the same vectors as float16 or int8 (see quantization.py), when
+                     the index stores them quantised; N tells apart re-quantised copies
+    meta.json        {"dim", "rows", "quantization"}; written last, so a crash
+                     mid-append leaves the index at its previous size
+
+/api/chat searches the matrix with the query embedding and feeds the best
+passages that fit in Config.PASSAGE_TOKEN_BUDGET to the LLM.
+
+With a quantised dtype (Config.PASSAGE_EMBEDDING_DTYPE) only the quantised
+matrix is scanned, for rescore_factor * k candidates; those rows alone are
+read from the float32 matrix and rescored exactly. The int8 scales are
+recalibrated over all vectors whenever the index has doubled since the last
+calibration, so the rewrite costs O(1) per passage over time.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from quantization import STORAGE_DTYPES, int8_scales, quantize, query_weights
+import metrics
+
+OFFSET_DTYPE = np.dtype([
+    ("document", "S36"),
+    ("page", "<i4"),
+    ("ordinal", "<i4"),
+    ("text_offset", "<i8"),
+    ("text_length", "<i4")
+])
+
+passages_indexed_total = metrics.counter("passages_indexed_total", "Passages added to the passage index")
+passage_index_rows = metrics.gauge("passage_index_rows", "Passages in the passage index")
+passage_scan_bytes = metrics.gauge("passage_scan_bytes", "Size of the embedding matrix scanned per passage search")
+
+QUANTIZED_SUFFIXES = {"float16": "f16", "int8": "i8"}
+
+
+def estimate_tokens(text):
+    """
+    Rough LLM token count (about four characters per token), without loading a tokenizer
+    """
+    return len(text) // 4 + 1
+
+
+def chunk_pages(pages, chunk_words=150, overlap_words=30):
+    """
+    (page number, text) chunks of at most chunk_words words, each repeating the
+    last overlap_words words of the previous chunk on the same page
+    """
+    step = max(1, chunk_words - overlap_words)
+    chunks = []
+    for page, text in enumerate(pages, 1):
+        words = (text or "").split()
+        for start in range(0, len(words), step):
+            chunks.append((page, " ".join(words[start:start + chunk_words])))
+            if start + chunk_words >= len(words):
+                break
+    return chunks
+
+
+def select_passages(passages, token_budget):
+    """
+    Highest scoring passages whose estimated tokens fit in token_budget together
+    """
+    selected, used = [], 0
+    for passage in sorted(passages, key=lambda passage: passage["score"], reverse=True):
+        tokens = estimate_tokens(passage["text"])
+        if used + tokens > token_budget:
+            continue
+        selected.append(passage)
+        used += tokens
+    return selected
+
+
+class PassageIndex:
+    def __init__(self, path, search_block_rows=16384, dtype="float32", rescore_factor=4):
+        """
+        Open (or create) the passage index stored in the directory path.
+        dtype is how the scanned copy of the embeddings is stored: float32, float16 or int8.
+        """
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(STORAGE_DTYPES)}")
+        self.path = path
+        self.search_block_rows = search_block_rows
+        self.dtype = dtype
+        self.rescore_factor = rescore_factor
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        meta = self._read_meta()
+        self.dim = meta.get("dim")
+        self._quantization = meta.get("quantization")
+        self._titles = self._read_titles()
+
+        # Quantise (or drop the quantised copy) when the index was written with another dtype
+        rows = meta.get("rows", 0)
+        if self.dtype == "float32" and self._quantization:
+            self._quantization = None
+            self._commit(rows)
+        elif self.dtype != "float32" and rows and not self._quantized_matches():
+            logging.info(f"Quantising {rows} passage embeddings to {self.dtype}")
+            self._quantize_all(rows)
+            self._commit(rows)
+        self._view = self._map(rows)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _commit(self, rows):
+        """
+        Make the first rows passages (and the current quantised matrix) the index
+        """
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "rows": rows, "quantization": self._quantization}, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+        # Quantised copies that are no longer referenced; open memory maps keep theirs readable
+        current = self._quantization["file"] if self._quantization else None
+        for name in os.listdir(self.path):
+            if name.startswith("embeddings-") and name != current:
+                os.remove(self._file(name))
+
+    def _read_titles(self):
+        titles = {}
+        try:
+            with open(self._file("documents.jsonl")) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        titles[entry["id"]] = entry["title"]
+        except FileNotFoundError:
+            pass
+        return titles
+
+    def _quantized_matches(self):
+        quantization = self._quantization
+        return (quantization is not None and quantization["dtype"] == self.dtype
+                and os.path.exists(self._file(quantization["file"])))
+
+    def _scales(self):
+        if self.dtype != "int8" or not self._quantization:
+            return None
+        return np.asarray(self._quantization["scales"], dtype=np.float32)
+
+    def _quantize_all(self, rows):
+        """
+        Write a new quantised matrix from the first rows float32 vectors,
+        recalibrating the int8 scales over all of them
+        """
+        source = np.memmap(self._file("embeddings.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+        blocks = range(0, rows, self.search_block_rows)
+        scales = None
+        if self.dtype == "int8":
+            scales = np.max([int8_scales(source[start:start + self.search_block_rows]) for start in blocks], axis=0)
+
+        name = f"embeddings-{rows}.{QUANTIZED_SUFFIXES[self.dtype]}"
+        with open(self._file(name), "wb") as f:
+            for start in blocks:
+                f.write(quantize(source[start:start + self.search_block_rows], self.dtype, scales).tobytes())
+        self._quantization = {
+            "dtype": self.dtype,
+            "file": name,
+            "scales": scales.tolist() if scales is not None else None,
+            "calibrated_rows": rows
+        }
+
+    def _map(self, rows):
+        """
+        (embeddings, offsets, scanned matrix, int8 scales) over the first rows rows
+        """
+        passage_index_rows.set(rows)
+        scales = self._scales()
+        if not rows:
+            embeddings = np.zeros((0, self.dim or 0), dtype=np.float32)
+            passage_scan_bytes.set(0)
+            return embeddings, np.zeros(0, dtype=OFFSET_DTYPE), embeddings.astype(STORAGE_DTYPES[self.dtype]), scales
+        embeddings = np.memmap(self._file("embeddings.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+        offsets = np.memmap(self._file("offsets.bin"), dtype=OFFSET_DTYPE, mode="r", shape=(rows,))
+        scanned = embeddings
+        if self.dtype != "float32":
+            scanned = np.memmap(self._file(self._quantization["file"]), dtype=STORAGE_DTYPES[self.dtype],
+                                mode="r", shape=(rows, self.dim))
+        passage_scan_bytes.set(scanned.nbytes)
+        return embeddings, offsets, scanned, scales
+
+    def __len__(self):
+        return len(self._view[1])
+
+    def add_document(self, document_id, title, chunks, embeddings):
+        """
+        Append a document's chunks ((page, text) pairs, see chunk_pages) with
+        their embeddings. Returns the number of passages added.
+        """
+        if not chunks:
+            return 0
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.shape[0] != len(chunks):
+            raise ValueError(f"{len(chunks)} chunks but {embeddings.shape[0]} embeddings")
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(embeddings.shape[1])
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embeddings have dimension {embeddings.shape[1]}, the index has {self.dim}")
+
+            rows = len(self)
+            total = rows + len(chunks)
+            texts = [text.encode("utf-8") for _, text in chunks]
+            text_offset = self._truncate(rows)
+            offsets = np.zeros(len(chunks), dtype=OFFSET_DTYPE)
+            offsets["document"] = document_id.encode("ascii")
+            offsets["page"] = [page for page, _ in chunks]
+            offsets["ordinal"] = np.arange(len(chunks))
+            offsets["text_length"] = [len(text) for text in texts]
+            offsets["text_offset"] = text_offset + np.concatenate(([0], np.cumsum(offsets["text_length"][:-1])))
+
+            with open(self._file("passages.txt"), "ab") as f:
+                f.write(b"".join(texts))
+            with open(self._file("embeddings.f32"), "ab") as f:
+                f.write(embeddings.tobytes())
+            with open(self._file("offsets.bin"), "ab") as f:
+                f.write(offsets.tobytes())
+            if self.dtype != "float32":
+                quantization = self._quantization
+                if quantization is None or (self.dtype == "int8" and total >= 2 * quantization["calibrated_rows"]):
+                    self._quantize_all(total)
+                else:
+                    with open(self._file(quantization["file"]), "ab") as f:
+                        f.write(quantize(embeddings, self.dtype, self._scales()).tobytes())
+            if document_id not in self._titles:
+                with open(self._file("documents.jsonl"), "a") as f:
+                    f.write(json.dumps({"id": document_id, "title": title}) + "\n")
+                self._titles[document_id] = title
+
+            self._commit(total)
+            self._view = self._map(total)
+
+        passages_indexed_total.inc(len(chunks))
+        return len(chunks)
+
+    def _truncate(self, rows):
+        """
+        Drop anything past the committed rows (left by an interrupted append);
+        returns where the next passage text starts
+        """
+        text_end = 0
+        if rows:
+            last = self._view[1][rows - 1]
+            text_end = int(last["text_offset"]) + int(last["text_length"])
+        sizes = [("embeddings.f32", rows * (self.dim or 0) * 4),
+                 ("offsets.bin", rows * OFFSET_DTYPE.itemsize),
+                 ("passages.txt", text_end)]
+        if self._quantization:
+            itemsize = np.dtype(STORAGE_DTYPES[self.dtype]).itemsize
+            sizes.append((self._quantization["file"], rows * self.dim * itemsize))
+        for name, size in sizes:
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                logging.warning(f"Truncating {path} to the {rows} committed passages")
+                os.truncate(path, size)
+        return text_end
+
+    def _top(self, matrix, weights, k):
+        """
+        (rows, scores) of the k rows of matrix scoring highest against weights
+        """
+        best_rows, best_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        # Blockwise, so only one block of the memory map is paged in and scored at a time
+        for start in range(0, len(matrix), self.search_block_rows):
+            scores = np.asarray(matrix[start:start + self.search_block_rows], dtype=np.float32) @ weights
+            top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            best_rows = np.concatenate((best_rows, top + start))
+            best_scores = np.concatenate((best_scores, scores[top]))
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        return best_rows, best_scores
+
+    def search(self, query_embedding, k=20, min_score=0.0):
+        """
+        The k passages most similar to the query (cosine), best first, with their text
+        """
+        embeddings, offsets, scanned, scales = self._view
+        if not len(offsets) or query_embedding is None:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != self.dim:
+            return []
+        query = query / norm
+
+        if self.dtype == "float32":
+            rows, scores = self._top(scanned, query, k)
+        else:
+            # Candidates from the quantised matrix, rescored on their float32 rows
+            rows, _ = self._top(scanned, query_weights(query, self.dtype, scales), k * self.rescore_factor)
+            rows = np.sort(rows)
+            scores = embeddings[rows] @ query
+
+        order = np.argsort(-scores)[:k]
+        hits = [(int(rows[i]), float(scores[i])) for i in order if scores[i] >= min_score]
+        return self._passages(hits, offsets)
+
+    def _passages(self, hits, offsets):
+        passages = []
+        with open(self._file("passages.txt"), "rb") as f:
+            for row, score in hits:
+                entry = offsets[row]
+                f.seek(int(entry["text_offset"]))
+                document_id = entry["document"].decode("ascii")
+                passages.append({
+                    "document_id": document_id,
+                    "title": self._titles.get(document_id),
+                    "page": int(entry["page"]),
+                    "ordinal": int(entry["ordinal"]),
+                    "score": round(score, 4),
+                    "text": f.read(int(entry["text_length"])).decode("utf-8")
+                })
+        return passages
+
+    def stats(self):
+        embeddings, offsets, scanned, _ = self._view
+        return {
+            "passages": len(offsets),
+            "documents": len(self._titles),
+            "dim": self.dim,
+            "dtype": self.dtype,
+            "embedding_bytes": int(embeddings.nbytes),
+            "scan_bytes": int(scanned.nbytes)
+        }
@@ -6,8 +6,9 @@ import fitz  # PyMuPDF
 import asyncio
 import textract
 from yake import KeywordExtractor
-import spacy
 import os
+import components
+import tracing
 
 # Google Drive API credentials
 SCOPES = ["https://www.googleapis.com/auth/drive.file"]
@@ -51,19 +52,24 @@ def download_pdf(url, save_path="download.pdf"):
 
 
 def extract_metadata(file_name):
-    doc = fitz.open(file_name)
-    doc_metadata = doc.metadata  # Renamed to avoid shadowing
+    with tracing.span("text_extraction") as span:
+        doc = fitz.open(file_name)
+        doc_metadata = doc.metadata  # Renamed to avoid shadowing
 
-    # Extract text
-    text = textract.process(file_name).decode("utf-8")
+        # Extract text, and per page for the passage index
+        text = textract.process(file_name).decode("utf-8")
+        pages = [page.get_text() for page in doc] or [text]
+        span.set(chars=len(text), pages=len(pages))
 
     # Extract keywords
-    kw_extractor = KeywordExtractor(n=10, dedupLim=0.9)
-    keywords = [kw[0] for kw in kw_extractor.extract_keywords(text)]
+    with tracing.span("yake"):
+        kw_extractor = KeywordExtractor(n=10, dedupLim=0.9)
+        keywords = [kw[0] for kw in kw_extractor.extract_keywords(text)]
 
     # Extract named entities
-    nlp = spacy.load("en_core_web_sm")
-    doc_nlp = nlp(text)
+    with tracing.span("ner"):
+        nlp = components.get("nlp")
+        doc_nlp = nlp(text)
     entities = {}  # Dictionary to store named entities
 
     for entity in doc_nlp.ents:  # Fixed loop variable
@@ -82,13 +88,15 @@ def extract_metadata(file_name):
         "creation_date": doc_metadata.get("creationDate", "Unknown"),
         "keywords": keywords,
         "named_entities": entities,
+        "pages": pages,
     }
 
 
 # Process PDF (Upload -> Download -> Extract -> LLaMA)
 async def process_pdf(file_path):
     print("[1] Uploading PDF to Google Drive...")
-    file_details= upload_file(file_path)
+    with tracing.span("drive_upload"):
+        file_details= upload_file(file_path)
     print(file_details.get("webContentLink"))
 
     print("[3] Extracting meta_data from PDF...")
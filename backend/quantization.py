@@ -0,0 +1,38 @@
+"""
+Compact storage for unit-length embeddings.
+
+float16 halves the float32 size. int8 quarters it: each dimension d is
+stored as round(x_d / scale_d) with scale_d = max |x_d| / 127 over the
+calibration vectors, so dimensions with a narrow range keep their
+precision. Scores are computed without dequantising the matrix, by folding
+the scales into the query: x . q ~= q8 . (scale * q).
+"""
+import numpy as np
+
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def int8_scales(vectors):
+    """
+    Per-dimension scales mapping the largest magnitude in vectors to 127
+    """
+    peak = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0)
+    return (np.where(peak == 0, 1.0, peak) / 127).astype(np.float32)
+
+
+def quantize(vectors, dtype, scales=None):
+    """
+    vectors stored as dtype; int8 needs scales (values beyond them are clipped)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "int8":
+        return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+    return vectors.astype(STORAGE_DTYPES[dtype])
+
+
+def query_weights(query, dtype, scales=None):
+    """
+    The vector to dot with rows stored as dtype to score them against query
+    """
+    query = np.asarray(query, dtype=np.float32)
+    return query * scales if dtype == "int8" else query
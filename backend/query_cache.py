@@ -0,0 +1,99 @@
+from collections import OrderedDict
+import re
+import threading
+
+import numpy as np
+
+from config import Config
+import metrics
+
+query_cache_hits_total = metrics.counter(
+    "query_cache_hits_total", "Query-analysis cache hits", ["kind"])
+query_cache_misses_total = metrics.counter(
+    "query_cache_misses_total", "Query-analysis cache misses", ["kind"])
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class CachedAnalysis:
+    __slots__ = ("embedding", "entities", "keywords")
+
+    def __init__(self, embedding=None, entities=None, keywords=None):
+        self.embedding = embedding
+        self.entities = entities
+        self.keywords = keywords
+
+
+class QueryAnalysisCache:
+    def __init__(self, maxsize=10000):
+        """
+        Bounded LRU cache of query embeddings and spaCy output, keyed by normalised query text.
+
+        Embeddings are kept as float16 (half the size of the encoder output)
+        and handed back as float32; entities and keywords as tuples.
+        """
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query, parsed=True):
+        """
+        (embedding, entities, keywords) for the query, or None on a miss.
+        With parsed=False only the embedding has to be cached; entities and keywords may be None.
+        """
+        kind = "analysis" if parsed else "embedding"
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.embedding is None or (parsed and entry.entities is None):
+                entry = None
+            else:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            query_cache_misses_total.inc(kind=kind)
+            return None
+
+        query_cache_hits_total.inc(kind=kind)
+        entities = list(entry.entities) if entry.entities is not None else None
+        keywords = list(entry.keywords) if entry.keywords is not None else None
+        return entry.embedding.astype(np.float32), entities, keywords
+
+    def put(self, query, embedding, entities=None, keywords=None):
+        key = normalize_query(query)
+        embedding = np.asarray(embedding, dtype=np.float16)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = CachedAnalysis()
+            entry.embedding = embedding
+            if entities is not None:
+                entry.entities = tuple(entities)
+                entry.keywords = tuple(keywords or ())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        result = {"size": len(self._entries), "maxsize": self.maxsize}
+        with self._lock:
+            result["embedding_bytes"] = sum(e.embedding.nbytes for e in self._entries.values())
+        for kind in ("analysis", "embedding"):
+            hits = query_cache_hits_total.value(kind=kind)
+            misses = query_cache_misses_total.value(kind=kind)
+            result[kind] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+            }
+        return result
+
+
+# Shared by /api/search, /api/chat (Flask and ASGI) and SemanticSearch
+query_cache = QueryAnalysisCache(maxsize=Config.QUERY_CACHE_SIZE)
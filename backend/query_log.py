@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+from bson.binary import Binary
+
+import metrics
+
+queries_logged_total = metrics.counter(
+    "query_log_entries_total", "Search and chat queries written to the query log", ["source"])
+queries_dropped_total = metrics.counter(
+    "query_log_dropped_total", "Query log entries dropped (buffer full or write failed)", ["reason"])
+
+
+def encode_embedding(embedding):
+    """
+    Embedding as BSON binary float16, a quarter of the size of a list of doubles
+    """
+    return Binary(np.asarray(embedding, dtype=np.float16).tobytes())
+
+
+def decode_embeddings(blobs):
+    """
+    float32 matrix from encode_embedding() outputs of equal dimension
+    """
+    return np.frombuffer(b"".join(blobs), dtype=np.float16).reshape(len(blobs), -1).astype(np.float32)
+
+
+class QueryLog:
+    def __init__(self, collection, batch_size=256, flush_interval_seconds=5, max_queue_size=10000):
+        """
+        Buffered, append-only log of search and chat queries.
+
+        record() only puts the entry on a queue. A writer thread inserts
+        entries in batches of up to batch_size, at least every
+        flush_interval_seconds, into the collection returned by collection()
+        (resolved lazily, so MongoDB is only needed once something is logged).
+        """
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Write whatever is buffered and stop the writer thread
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)  # wake the writer
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+
+    def record(self, query, embedding, best_score, source):
+        """
+        Log a query with its embedding and the score of its best match. Never blocks.
+        """
+        if embedding is None:
+            return False
+        self.start()
+        entry = {
+            "query": query,
+            "embedding": encode_embedding(embedding),
+            "score": float(best_score),
+            "source": source,
+            "created_at": datetime.now(timezone.utc)
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            queries_dropped_total.inc(reason="buffer_full")
+            return False
+        return True
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            timeout = 0.5 if deadline is None else min(0.5, max(0.0, deadline - time.monotonic()))
+            try:
+                entry = self._queue.get(timeout=timeout)
+                if entry is not None:
+                    batch.append(entry)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval_seconds
+            except queue.Empty:
+                pass
+
+            stopping = self._stopping.is_set() and self._queue.empty()
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline or stopping):
+                self._write(batch)
+                batch, deadline = [], None
+            if stopping:
+                return
+
+    def _write(self, batch):
+        try:
+            self.collection().insert_many(batch, ordered=False)
+        except Exception as e:
+            queries_dropped_total.inc(len(batch), reason="write_failed")
+            logging.error(f"Could not write {len(batch)} query log entries: {e}")
+            return
+        for entry in batch:
+            queries_logged_total.inc(source=entry["source"])
@@ -0,0 +1,58 @@
+"""
+Per-route HTTP metrics: request counts, latency histograms, errors and
+in-flight requests. The Flask app registers the hooks below; asgi.py has
+the equivalent middleware. Routes are labelled by their URL rule
+(e.g. /api/summaries/<summary_id>), never the raw path, to keep the number
+of series bounded.
+"""
+import time
+
+from flask import g, request
+
+import metrics
+
+requests_total = metrics.counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+request_errors_total = metrics.counter(
+    "http_request_errors_total", "Requests answered with a 5xx status or failed with an exception", ["method", "route"])
+requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled")
+
+
+def observe(method, route, status, seconds):
+    requests_total.inc(method=method, route=route, status=status)
+    request_duration_seconds.observe(seconds, method=method, route=route)
+    if status >= 500:
+        request_errors_total.inc(method=method, route=route)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+# Flask hooks (registered in app.py)
+def begin_request():
+    g.request_started = time.perf_counter()
+    g.request_in_flight = True
+    requests_in_flight.inc()
+
+
+def end_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        observe(request.method, _route(), response.status_code, time.perf_counter() - started)
+    return response
+
+
+def teardown_request(exc=None):
+    # A view that raises is still answered through after_request with its 500 response, unless the
+    # exception propagates (PROPAGATE_EXCEPTIONS, i.e. debug or testing) or an after_request hook
+    # failed; only then is request_started left for us, and the request is counted as a 500
+    # (Werkzeug's debugger or the server produces the actual response)
+    started = g.pop("request_started", None)
+    if started is not None:
+        observe(request.method, _route(), 500, time.perf_counter() - started)
+    if g.pop("request_in_flight", False):
+        requests_in_flight.dec()
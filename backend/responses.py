@@ -0,0 +1,107 @@
+from functools import wraps
+import gzip
+import zlib
+
+from flask import make_response, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import generate_etag, parse_etags
+
+from config import Config
+import metrics
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+response_bytes_total = metrics.counter(
+    "http_response_bytes_total", "Response body bytes before compression", ["endpoint"])
+response_compressed_bytes_total = metrics.counter(
+    "http_response_compressed_bytes_total", "Response body bytes after compression", ["endpoint", "encoding"])
+responses_not_modified_total = metrics.counter(
+    "http_responses_not_modified_total", "Conditional GETs answered with 304 Not Modified", ["endpoint"])
+
+if orjson is not None:
+    # Same output as Flask's provider: sorted keys, datetimes formatted by the default hook
+    ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                      | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME)
+
+# (indent, separators) combinations orjson reproduces exactly
+ORJSON_LAYOUTS = {(None, None), (None, (",", ":")), (2, None), (2, (",", ": "))}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider using orjson when it is installed
+    """
+
+    def dumps(self, obj, **kwargs):
+        # response()/jsonify pass separators=(",", ":") for compact output, which is what orjson
+        # writes, or indent=2 when pretty printing. Anything else goes to the stdlib encoder.
+        layout = (kwargs.get("indent"), kwargs.get("separators"))
+        if orjson is None or set(kwargs) - {"indent", "separators"} or layout not in ORJSON_LAYOUTS:
+            return super().dumps(obj, **kwargs)
+        option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if layout[0] else ORJSON_OPTIONS
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def check_etag(body, if_none_match):
+    """
+    Weak ETag header value for body, and whether If-None-Match already names it.
+    Weak, so the same tag validates both the gzip and the identity representation.
+    """
+    tag = generate_etag(body)
+    return f'W/"{tag}"', bool(if_none_match) and parse_etags(if_none_match).contains_weak(tag)
+
+
+def conditional_get(view):
+    """
+    Add a weak ETag to successful GET responses and answer matching If-None-Match with 304
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if request.method == "GET" and response.status_code == 200:
+            response.add_etag(weak=True)
+            response.cache_control.no_cache = True
+            response.cache_control.private = True
+            response.make_conditional(request)
+            if response.status_code == 304:
+                responses_not_modified_total.inc(endpoint=request.endpoint)
+        return response
+
+    return decorated
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip/deflate bodies above COMPRESSION_MIN_BYTES when the client accepts it
+    """
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers):
+        return response
+
+    endpoint = request.endpoint or "unknown"
+    body = response.get_data()
+    response_bytes_total.inc(len(body), endpoint=endpoint)
+    response.vary.add("Accept-Encoding")
+    if len(body) < Config.COMPRESSION_MIN_BYTES:
+        return response
+
+    encoding = request.accept_encodings.best_match(["gzip", "deflate"])
+    if encoding == "gzip":
+        compressed = gzip.compress(body, compresslevel=Config.COMPRESSION_LEVEL)
+    elif encoding == "deflate":
+        compressed = zlib.compress(body, Config.COMPRESSION_LEVEL)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    response_compressed_bytes_total.inc(len(compressed), endpoint=endpoint, encoding=encoding)
+    return response
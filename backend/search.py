@@ -1,31 +1,33 @@
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
+import numpy as np
 import torch
+import heapq
 import logging
+from query_cache import query_cache
+from embedding_service import embedding_service
 
 class SemanticSearch:
-    def __init__(self):  # Fixed the constructor name
+    def __init__(self, batch_size=500):  # Fixed the constructor name
         """
-        Initialize the semantic search with a pre-trained model
+        Initialize the semantic search. The shared embedding model is loaded on first use.
+        Documents are scored batch_size at a time.
         """
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        logging.info("Semantic search model loaded")
+        self.batch_size = batch_size
+        logging.info("Semantic search initialized")
 
-    def search(self, query, knowledge_graph, top_k=5):
+    def query_embedding(self, query):
+        cached = query_cache.get(query, parsed=False)
+        if cached is not None:
+            return cached[0]
+
+        embedding = embedding_service.encode(query)
+        query_cache.put(query, embedding)
+        return embedding
+
+    def _search_items(self, documents):
         """
-        Perform semantic search on documents and tips
-        
-        Args:
-            query: The search query string
-            knowledge_graph: KnowledgeGraph instance
-            top_k: Number of top results to return
-            
-        Returns:
-            dict with search results and gap information
+        Flatten a batch of documents into the titles and tips to score
         """
-        # Get all documents with tips
-        documents = knowledge_graph.get_all_documents()
-
-        # Create a list of all content to search through
         search_items = []
         for doc in documents:
             # Add document title and its ID
@@ -33,43 +35,75 @@ class SemanticSearch:
                 "id": doc["id"],
                 "type": "document",
                 "text": doc["title"],
-                "doc_id": doc["id"]
+                "doc_id": doc["id"],
+                "embedding": doc.get("embedding")
             })
-            
+
             # Add tips and their IDs
             for tip in doc["tips"]:
+                if not tip["text"]:
+                    continue
                 search_items.append({
                     "id": tip["tip_id"],
                     "type": "tip",
                     "text": tip["text"],
                     "doc_id": doc["id"],
-                    "expert": tip["expert_name"]
+                    "expert": tip["expert_name"],
+                    "embedding": None
                 })
-                
-        # If there's nothing to search, return empty results
-        if not search_items:
-            return {"results": [], "has_gaps": False, "gaps": []}
+        return search_items
 
-        # Encode the query and all search items
-        query_embedding = self.model.encode(query, convert_to_tensor=True)
-        corpus_embeddings = self.model.encode([item["text"] for item in search_items], convert_to_tensor=True)
+    def search(self, query, knowledge_graph, top_k=5):
+        """
+        Perform semantic search on documents and tips
+        
+        Args:
+            query: The search query string
+            knowledge_graph: KnowledgeGraph instance
+            top_k: Number of top results to return
+            
+        Returns:
+            dict with search results and gap information
+        """
+        query_embedding = torch.from_numpy(self.query_embedding(query))
+
+        # Stream documents in batches and keep only the best top_k items (min-heap on score)
+        top = []
+        seen = 0
+        for documents in knowledge_graph.iter_document_batches(batch_size=self.batch_size):
+            search_items = self._search_items(documents)
+            if not search_items:
+                continue
+
+            # Titles embedded at ingestion are reused; everything else goes through the embedding service
+            missing = [item for item in search_items if item["embedding"] is None]
+            for item, vector in zip(missing, embedding_service.encode_many([item["text"] for item in missing])):
+                item["embedding"] = vector
+            corpus_embeddings = torch.from_numpy(np.array([item.pop("embedding") for item in search_items], dtype=np.float32))
 
-        # Compute similarity scores
-        cos_scores = util.cos_sim(query_embedding, corpus_embeddings)[0]
+            # Compute similarity scores
+            cos_scores = util.cos_sim(query_embedding, corpus_embeddings)[0].tolist()
+            for item, score in zip(search_items, cos_scores):
+                entry = (score, seen, item)
+                seen += 1
+                if len(top) < top_k:
+                    heapq.heappush(top, entry)
+                elif score > top[0][0]:
+                    heapq.heapreplace(top, entry)
 
-        # Get top-k results
-        top_results_indices = torch.topk(cos_scores, min(top_k, len(search_items))).indices.tolist()
+        # If there's nothing to search, return empty results
+        if not top:
+            return {"results": [], "has_gaps": False, "gaps": []}
+
+        top.sort(key=lambda entry: (-entry[0], entry[1]))
 
         # Check if we have any low-scoring results (potential knowledge gaps)
         threshold = 0.3  # Similarity threshold
-        has_gaps = any(cos_scores[i].item() < threshold for i in top_results_indices)
+        has_gaps = any(score < threshold for score, _, _ in top)
 
         # Prepare results
         results = []
-        for idx in top_results_indices:
-            item = search_items[idx]
-            score = cos_scores[idx].item()
-
+        for score, _, item in top:
             results.append({
                 "id": item["id"],
                 "type": item["type"],
@@ -0,0 +1,1062 @@
+"""
+Request handling shared by the Flask app (app.py) and the ASGI app (asgi.py).
+
+Service functions take plain values and return (payload, status) tuples so
+either framework can wrap them. Graph access goes through the shared
+KnowledgeGraph component (Neo4j or in-memory, see GRAPH_BACKEND).
+"""
+import os
+import re
+import json
+import base64
+import logging
+import asyncio
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+from datetime import datetime
+
+import bcrypt
+import markdown
+from bson import ObjectId
+from cachetools import TTLCache
+from pymongo.errors import DuplicateKeyError
+from slack_sdk import WebClient
+from werkzeug.utils import secure_filename
+
+from config import Config
+from auth import generate_token, invalidate_user
+from pdf_processor import process_pdf
+from notifications import SlackOutbox
+from query_log import QueryLog
+from passage_index import chunk_pages, select_passages
+import gap_clusters
+from gemini_client import GeminiError
+from summarizer import ChatSummarizer
+from query_cache import query_cache
+from cypher_profiler import cypher_profiler
+from embedding_service import embedding_service
+from Model.main1 import chat_with_ai
+import components
+import metrics
+import tracing
+
+# MongoDB, the graph, spaCy, the sentence encoder and the LLM are all loaded on first use
+def get_db():
+    return components.get("mongo")
+
+# Initialize Slack client for notifications
+slack_token = os.getenv("SLACK_TOKEN")
+slack_client = WebClient(token=slack_token) if slack_token else None
+expert_channel = os.getenv("SLACK_EXPERT_CHANNEL", "#knowledge-experts")
+
+# Gap notifications are posted from a background thread so searches never wait on Slack
+notification_outbox = SlackOutbox(
+    slack_client,
+    expert_channel,
+    window_seconds=Config.SLACK_DIGEST_WINDOW_SECONDS,
+    min_interval_seconds=Config.SLACK_MIN_POST_INTERVAL_SECONDS,
+    topic_cooldown_seconds=Config.SLACK_TOPIC_COOLDOWN_SECONDS,
+    frontend_url=Config.FRONTEND_URL
+) if slack_client else None
+
+if notification_outbox:
+    atexit.register(notification_outbox.stop)
+
+# Search and chat queries are logged from a background thread for gap clustering (gap_clusters.py)
+query_log = QueryLog(lambda: get_db().query_log) if Config.QUERY_LOG_ENABLED else None
+
+if query_log:
+    atexit.register(query_log.stop)
+
+# Generated questions per topic, so repeated topics skip the Gemini round trip
+questions_cache = TTLCache(maxsize=Config.QUESTIONS_CACHE_SIZE, ttl=Config.QUESTIONS_CACHE_TTL_SECONDS)
+questions_cache_lock = threading.Lock()
+questions_cache_hits_total = metrics.counter("questions_cache_hits_total", "Generated-questions cache hits")
+questions_cache_misses_total = metrics.counter("questions_cache_misses_total", "Generated-questions cache misses")
+
+QUESTIONS_PROMPT = ("Generate 10 important questions about {topic}. Format the response as a JSON array of strings, "
+                    "with each question as a separate string in the array. Do not include any other text or formatting.")
+
+# Per-stage timings for /api/search and /api/chat (encode, nlp, graph, llm)
+search_stage_seconds = metrics.counter("search_stage_seconds_total", "Time spent in each search stage", ["stage"])
+search_stage_runs = metrics.counter("search_stage_runs_total", "Search stage executions", ["stage"])
+
+summaries_total = metrics.counter("chat_summaries_total", "Chat summaries produced", ["mode"])
+summary_seconds = metrics.counter("chat_summary_seconds_total", "Time spent producing chat summaries")
+
+logger = logging.getLogger(__name__)
+handler_errors_total = metrics.counter("handler_errors_total", "Errors caught in request handlers", ["handler"])
+
+# File upload configuration
+UPLOAD_FOLDER = 'uploads'
+ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt', 'md', 'ppt', 'pptx'}
+
+if not os.path.exists(UPLOAD_FOLDER):
+    os.makedirs(UPLOAD_FOLDER)
+
+USER_LOGIN_PROJECTION = {'password': 1, 'email': 1, 'name': 1, 'role': 1, 'field': 1}
+
+GAP_ANALYSIS_PROMPT = """Based on the existing knowledge base topics and keywords, identify potential knowledge gaps
+        that should be covered. Consider industry standards, related topics, and prerequisite knowledge.
+        For each gap, provide a clear topic and reason why it should be added."""
+
+def knowledge_graph():
+    return components.get("graph")
+
+
+def report_error(handler, message):
+    """
+    Log an error caught in a handler and count it under the handler's name
+    """
+    handler_errors_total.inc(handler=handler)
+    logger.error(message)
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def render_markdown(text):
+    """
+    Convert markdown to HTML and clean it up
+    """
+    html_content = markdown.markdown(text, extensions=['extra', 'nl2br'])
+    html_content = re.sub(r'<p>\s*<br\s*/>\s*</p>', '', html_content)  # Remove empty paragraphs
+    html_content = re.sub(r'\n+', '\n', html_content)  # Remove multiple newlines
+    return html_content
+
+
+def record_stage(stage, seconds):
+    search_stage_seconds.inc(seconds, stage=stage)
+    search_stage_runs.inc(stage=stage)
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Time a search stage into the stage counters and, when tracing, a span
+    """
+    started = time.perf_counter()
+    try:
+        with tracing.span(stage) as span:
+            yield span
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+# Query analysis and result shaping
+def submit_query_embedding(query):
+    """
+    Queue the query on the embedding service; returns a future for its vector
+    """
+    started = time.perf_counter()
+    # The encode completes on the batcher thread, so its span is ended from the callback
+    encode_span = tracing.span("encode").start()
+
+    def done(f):
+        record_stage("encode", time.perf_counter() - started)
+        encode_span.finish()
+
+    future = embedding_service.submit(query)
+    future.add_done_callback(done)
+    return future
+
+
+def parse_query(query):
+    """
+    Entities and lemmatised keywords for a query
+    """
+    with stage_timer("nlp"):
+        doc = components.get("nlp")(query)
+        entities = [ent.text.lower() for ent in doc.ents]
+        keywords = [token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct]
+    return entities, keywords
+
+
+def analyze_query(query):
+    """
+    Embedding, entities and keywords for a query, from the query cache when possible.
+    On a miss the query is embedded (batched with other requests) while spaCy parses it.
+    """
+    with tracing.span("analyze_query") as span:
+        cached = query_cache.get(query)
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+
+        embedding_future = submit_query_embedding(query)
+        entities, keywords = parse_query(query)
+        query_embedding = embedding_future.result()
+        query_cache.put(query, query_embedding, entities, keywords)
+        return query_embedding, entities, keywords
+
+
+def search_params(search_query, entities, keywords, limit=None, cursor=None, include_summary_content=False):
+    # Combine all search terms
+    search_terms = set([search_query] + keywords + entities)
+    cursor_score, cursor_id = cursor if cursor else (None, None)
+    return {
+        'search_query': search_query,
+        'search_terms': list(search_terms),
+        # One extra row tells us whether there is a next page
+        'limit': (limit or Config.SEARCH_PAGE_SIZE) + 1,
+        'cursor_score': cursor_score,
+        'cursor_id': cursor_id,
+        'include_summary_content': bool(include_summary_content)
+    }
+
+
+def encode_cursor(record):
+    position = json.dumps({"s": record["relevance_score"], "id": record["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    (relevance_score, id) of the last row of the previous page; ValueError if malformed
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(position["s"]), str(position["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def page_args(limit=None, cursor=None):
+    """
+    Validate the paging arguments of a search request; ValueError if they are unusable
+    """
+    if limit is None:
+        limit = Config.SEARCH_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, Config.SEARCH_MAX_PAGE_SIZE)
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def split_page(records, limit):
+    """
+    The rows of this page and the cursor for the next one (None on the last page)
+    """
+    if len(records) > limit:
+        records = records[:limit]
+        return records, encode_cursor(records[-1])
+    return records, None
+
+
+def group_search_records(records):
+    """
+    Turn search query records into documents grouped by title
+    """
+    grouped_documents = {}
+    for record in records:
+        try:
+            doc = {
+                "id": record["id"],
+                "title": record["title"],
+                "fileLink": record["fileLink"],
+                "viewLink": record["viewLink"],
+                "keywords": record["keywords"],
+                "matched_keywords": record["matched_keywords"],
+                "field": record["field"],
+                "meme_type": record["meme_type"],
+                "filename": record["filename"],
+                "original_filename": record["original_filename"],
+                "score": record["relevance_score"],
+                "author": record["author"],
+                "created_at": record["created_at"],
+                "doc_type": record["doc_type"],
+                "summary_content": record["summary_content"]
+            }
+
+            if doc["title"] not in grouped_documents:
+                grouped_documents[doc["title"]] = []
+            grouped_documents[doc["title"]].append(doc)
+
+        except Exception as e:
+            report_error("group_search_records", f"Error processing record: {str(e)}")
+            continue
+
+    return grouped_documents
+
+
+def gaps_from_search_records(records, limit=5):
+    """
+    Documents whose title or keywords matched, read from the same rows as the search results
+    """
+    gaps = []
+    for record in records:
+        if len(gaps) >= limit:
+            break
+        if record["gap_candidate"] and not any(gap["id"] == record["id"] for gap in gaps):
+            gaps.append({
+                "topic": record["title"],
+                "id": record["id"]
+            })
+    return gaps
+
+
+def topics_from_records(records):
+    return [{
+        "topic": record["topic"],
+        "keywords": record["keywords"] if record["keywords"] else [],
+        "fields": [record["field"]] if record["field"] else [],
+        "id": record["id"]
+    } for record in records]
+
+
+def flatten_documents(relevant_docs):
+    """
+    Format grouped search results as the document list the LLM context expects
+    """
+    flattened_docs = []
+    for title, docs in relevant_docs.items():
+        for doc in docs:
+            doc_info = {
+                "id": doc["id"],
+                "title": doc["title"],
+                "original_filename": doc["original_filename"],
+                "keywords": doc["keywords"] if doc["doc_type"] == "document" else [],
+                "matched_keywords": doc["matched_keywords"] if doc["doc_type"] == "document" else [],
+                "field": doc["field"],
+                "score": doc["score"],
+                "viewLink": doc["viewLink"],
+                "fileLink": doc["fileLink"],
+                "doc_type": doc["doc_type"],
+                "summary_content": doc.get("summary_content") if doc["doc_type"] == "summary" else None
+            }
+            flattened_docs.append(doc_info)
+
+    # Sort documents by score
+    flattened_docs.sort(key=lambda x: x["score"], reverse=True)
+    return flattened_docs
+
+
+def search_response(query, results, gaps, next_cursor=None, first_page=True):
+    """
+    Ask the LLM about the results and build the /api/search payload (CPU bound)
+    """
+    # Prepare context for AI response
+    context = {
+        "query": query,
+        "relevant_documents": flatten_documents(results)
+    }
+
+    # Get AI analysis with search role
+    with stage_timer("llm"):
+        ai_response = chat_with_ai(query, context, system_role="search")
+
+    has_gaps = len(gaps) > 0
+    # Later pages of the same search would only repeat the notification
+    if has_gaps and slack_client and first_page:
+        notify_experts_about_gaps(gaps, query)
+
+    return {
+        "results": results,
+        "ai_response": ai_response,
+        "has_gaps": has_gaps,
+        "gaps": gaps,
+        "next_cursor": next_cursor
+    }
+
+
+def chat_response(query, relevant_docs, next_cursor=None, passages=None):
+    """
+    Ask the LLM with the documents and passages as context and build the /api/chat payload (CPU bound)
+    """
+    flattened_docs = flatten_documents(relevant_docs)
+
+    # Prepare context for AI
+    context = {
+        "query": query,
+        "relevant_documents": flattened_docs,
+        "passages": passages or []
+    }
+
+    # Get AI response with search role
+    with stage_timer("llm"):
+        response = chat_with_ai(query, context, system_role="search")
+
+    # Convert markdown to HTML
+    with tracing.span("render_markdown"):
+        html_response = render_markdown(response)
+
+    return {
+        "response": html_response,
+        "context": {
+            "documents_found": len(flattened_docs),
+            "relevant_topics": list(set(kw for doc in flattened_docs for kw in (doc["keywords"] if doc["doc_type"] == "document" else []))),
+            "documents": flattened_docs,
+            "passages": passages or [],
+            "next_cursor": next_cursor
+        },
+
+    }
+
+
+def analyze_gaps(topics_data, specific_topic=None):
+    """
+    Run the gap-analysis LLM over the topics and format the answer (CPU bound)
+    """
+    if specific_topic is None:
+        # Format context for gap analysis
+        context = {
+            "topics": topics_data
+        }
+
+        # Get AI analysis with gap_analysis role
+        gap_analysis = chat_with_ai(GAP_ANALYSIS_PROMPT, context, system_role="gap_analysis")
+        markdown_content = ""
+        error_markdown = "### Analysis Error\n\nCould not analyze knowledge gaps. Please try again."
+        error_reason = "Could not analyze knowledge gaps. Please try again."
+    else:
+        # Format context for gap analysis
+        context = {
+            "topic": specific_topic,
+            "topics": topics_data
+        }
+
+        # Use chat_with_ai with topic_gap_analysis role
+        analysis_prompt = f"""Analyze the knowledge base for gaps related to '{specific_topic}'.
+        Consider prerequisites, related concepts, and practical applications.
+        For each gap, provide a clear topic and reason why it should be added."""
+
+        gap_analysis = chat_with_ai(analysis_prompt, context, system_role="topic_gap_analysis")
+        markdown_content = f"## Knowledge Gaps for {specific_topic}\n\n"
+        error_markdown = f"### Analysis Error\n\nCould not analyze gaps for {specific_topic}. Please try again."
+        error_reason = "Could not analyze gaps. Please try again."
+
+    try:
+        # Parse the response
+        gaps = json.loads(gap_analysis) if isinstance(gap_analysis, str) else gap_analysis
+        if not isinstance(gaps, list):
+            raise ValueError("Expected a list of gaps")
+
+        # Validate and format gaps
+        formatted_gaps = []
+        for gap in gaps:
+            if isinstance(gap, dict) and "topic" in gap and "reason" in gap:
+                formatted_gap = {
+                    "topic": str(gap["topic"]),
+                    "reason": str(gap["reason"])
+                }
+                formatted_gaps.append(formatted_gap)
+                # Create markdown content
+                markdown_content += f"### {formatted_gap['topic']}\n\n"
+                markdown_content += f"{formatted_gap['reason']}\n\n"
+
+        return {
+            "gaps": formatted_gaps,
+            "html_content": render_markdown(markdown_content)
+        }
+
+    except (json.JSONDecodeError, ValueError) as e:
+        report_error("analyze_gaps", f"Error parsing gap analysis: {str(e)}")
+        return {
+            "gaps": [{"topic": "Analysis Error", "reason": error_reason}],
+            "html_content": markdown.markdown(error_markdown)
+        }
+
+
+def parse_questions(generated_text):
+    """
+    Turn Gemini's answer into a list of questions
+    """
+    # Clean up the text to ensure it's valid JSON
+    # Remove any markdown formatting or extra text
+    json_str = generated_text.strip()
+    if not json_str.startswith('['):
+        # Try to find the JSON array in the text
+        start_idx = json_str.find('[')
+        end_idx = json_str.rfind(']')
+        if start_idx != -1 and end_idx != -1:
+            json_str = json_str[start_idx:end_idx + 1]
+
+    try:
+        questions = json.loads(json_str)
+        if isinstance(questions, list):
+            return questions
+        else:
+            return [str(questions)]
+    except json.JSONDecodeError as je:
+        report_error("parse_questions", f"JSON decode error: {je}")
+        # If JSON parsing fails, split by newlines and clean up
+        return [q.strip().strip('*-').strip() for q in generated_text.split('\n') if q.strip()]
+
+
+def new_user_document(data):
+    """
+    Build the user document for a signup request (bcrypt, CPU bound)
+    """
+    hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+
+    user = {
+        '_id': ObjectId(),
+        'email': data['email'],
+        'password': hashed_password,
+        'name': data['name'],
+        'role': data['role'],
+        'created_at': datetime.utcnow()
+    }
+
+    if data['role'] == 'user' and 'field' in data:
+        user['field'] = data['field']
+    return user
+
+
+def signup_response(user):
+    # Generate token
+    token = generate_token(user['_id'], user['role'])
+
+    # Convert ObjectId to string for response
+    user = dict(user)
+    user['_id'] = str(user['_id'])
+    del user['password']  # Remove password from response
+
+    return {
+        'token': token,
+        'user': user
+    }
+
+
+def login_response(user, data):
+    """
+    Check the password and build the login payload (bcrypt, CPU bound)
+    """
+    if not user or not bcrypt.checkpw(data['password'].encode('utf-8'), user['password']):
+        return {'message': 'Invalid credentials'}, 401
+
+    # Generate token
+    token = generate_token(user['_id'], user['role'])
+
+    # Convert ObjectId to string and remove password for response
+    user_response = {
+        'id': str(user['_id']),
+        'email': user['email'],
+        'name': user['name'],
+        'role': user['role'],
+        'field': user.get('field')
+    }
+
+    return {
+        'token': token,
+        'user': user_response
+    }, 200
+
+
+def profile_updates(data):
+    return {key: data[key] for key in ('name', 'field') if data.get(key)}
+
+
+# Graph helpers
+def fetch_search_records(search_query, entities, keywords, limit, cursor=None, include_summary_content=False):
+    """
+    One page of document/summary search rows and the next-page cursor; empty if the graph is unavailable
+    """
+    params = search_params(search_query, entities, keywords, limit, cursor, include_summary_content)
+    try:
+        with stage_timer("graph") as span:
+            records = knowledge_graph().search_records(params)
+            span.set(rows=len(records))
+
+    except Exception as e:
+        report_error("fetch_search_records", f"Error in search_knowledge_graph: {str(e)}")
+        return [], None
+
+    return split_page(records, limit)
+
+
+def best_passage_score(query_embedding):
+    """
+    Cosine similarity of the passage closest to the query (0 for an empty index), or None if it is unavailable
+    """
+    try:
+        hits = components.get("passages").search(query_embedding, 1, min_score=-1.0)
+    except Exception as e:
+        report_error("best_passage_score", f"Error scoring query against passages: {str(e)}")
+        return None
+    return hits[0]["score"] if hits else 0.0
+
+
+def log_query(query, query_embedding, source, best_score=None):
+    """
+    Add a query to the query log with the cosine similarity of its closest passage.
+    Pass best_score when the caller already searched the passages.
+    """
+    if query_log is None:
+        return
+    if best_score is None:
+        best_score = best_passage_score(query_embedding)
+        if best_score is None:
+            return
+    query_log.record(query, query_embedding, best_score, source)
+
+
+def index_passages(document_id, title, pages):
+    """
+    Chunk a document's page texts, embed the chunks and add them to the passage index
+    """
+    chunks = chunk_pages(pages, Config.PASSAGE_CHUNK_WORDS, Config.PASSAGE_CHUNK_OVERLAP_WORDS)
+    if not chunks:
+        return 0
+    embeddings = embedding_service.encode_many([text for _, text in chunks])
+    return components.get("passages").add_document(document_id, title, chunks, embeddings)
+
+
+def retrieve_passages(query_embedding):
+    """
+    The passages closest to the query that fit in the chat token budget, and the best
+    candidate's score (None when no candidate reached PASSAGE_MIN_SCORE)
+    """
+    if query_embedding is None or Config.PASSAGE_TOKEN_BUDGET <= 0:
+        return [], None
+    try:
+        with stage_timer("passages") as span:
+            hits = components.get("passages").search(
+                query_embedding, Config.PASSAGE_CANDIDATES, Config.PASSAGE_MIN_SCORE)
+            passages = select_passages(hits, Config.PASSAGE_TOKEN_BUDGET)
+            span.set(candidates=len(hits), passages=len(passages))
+    except Exception as e:
+        # Chat still answers from the document list
+        report_error("retrieve_passages", f"Error retrieving passages: {str(e)}")
+        return [], None
+    return passages, hits[0]["score"] if hits else None
+
+
+def notify_experts_about_gaps(gaps, query):
+    if not notification_outbox:
+        return
+
+    # Only the first five gaps are announced; the outbox coalesces them into digests
+    notification_outbox.enqueue(gaps[:5], query)
+
+
+# Services. Each returns (payload, status).
+def signup(data):
+    if get_db().users.find_one({'email': data['email']}, {'_id': 1}):
+        return {'message': 'Email already registered'}, 400
+
+    user = new_user_document(data)
+    try:
+        get_db().users.insert_one(user)
+    except DuplicateKeyError:
+        # A concurrent signup for the same email got past find_one; the unique email index rejects this one
+        return {'message': 'Email already registered'}, 400
+    return signup_response(user), 201
+
+
+def login(data):
+    user = get_db().users.find_one({'email': data['email']}, USER_LOGIN_PROJECTION)
+    return login_response(user, data)
+
+
+def update_profile(current_user, data):
+    updates = profile_updates(data)
+
+    if not updates:
+        return {'message': 'Nothing to update'}, 400
+
+    get_db().users.update_one({'_id': ObjectId(current_user['_id'])}, {'$set': updates})
+    invalidate_user(current_user['_id'])
+
+    current_user.update(updates)
+    return {'user': current_user}, 200
+
+
+async def file_process(file_path):
+    metadata_result = await process_pdf(file_path)
+    return metadata_result
+
+
+def upload_knowledge(current_user, topic, original_filename, content_type, save, is_admin=False):
+    """
+    Store an uploaded file, extract its metadata and add it to the graph.
+    save(path) writes the uploaded bytes to path.
+    """
+    if not original_filename or not topic:
+        return {'message': 'File and topic are required'}, 400
+
+    if not allowed_file(original_filename):
+        return {'message': 'File type not allowed'}, 400
+
+    try:
+        filename = secure_filename(original_filename)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        unique_filename = f"{timestamp}_{filename}"
+        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+        with tracing.span("save_file"):
+            save(file_path)
+
+        # Process the file
+        try:
+            with tracing.span("process_file"):
+                metadata_result = asyncio.run(file_process(file_path))
+        except Exception as e:
+            report_error("upload_knowledge", f"Error processing file: {str(e)}")
+            metadata_result = {
+                'keywords': [],
+                'fileLink': file_path,
+                'meme_type': content_type
+            }
+        # Page texts go to the passage index, not into the response
+        pages = metadata_result.pop('pages', [])
+
+        knowledge = {
+            'title': topic,
+            'filename': unique_filename,
+            'original_filename': filename,
+            'author_id': str(current_user['_id']),
+            'author_name': current_user['name'],
+            'field': current_user.get('field'),
+            'keywords': metadata_result.get('keywords', []),
+            'fileLink': metadata_result.get('fileLink', file_path),
+            'meme_type': metadata_result.get('meme_type', content_type),
+            'created_at': datetime.utcnow()
+        }
+
+        # Title embedding, so semantic search does not re-encode the corpus on every query
+        try:
+            with tracing.span("embed_title"):
+                knowledge['embedding'] = embedding_service.encode(topic).tolist()
+        except Exception as e:
+            report_error("upload_knowledge", f"Error embedding document title: {str(e)}")
+        if is_admin:
+            knowledge['is_admin_content'] = True
+
+        # Add to knowledge graph
+        try:
+            with tracing.span("graph_write"):
+                doc_id = knowledge_graph().add_document(knowledge)
+        except Exception as e:
+            report_error("upload_knowledge", f"Error adding to knowledge graph: {str(e)}")
+            return {'message': 'Error adding to knowledge graph', 'error': str(e)}, 500
+
+        passages = 0
+        try:
+            with tracing.span("index_passages") as span:
+                passages = index_passages(doc_id, topic, pages)
+                span.set(passages=passages)
+        except Exception as e:
+            report_error("upload_knowledge", f"Error indexing document passages: {str(e)}")
+
+        return {
+            'message': 'File uploaded successfully',
+            'document_id': doc_id,
+            'passages': passages,
+            'metadata': metadata_result
+        }, 201
+
+    except Exception as e:
+        report_error("upload_knowledge", f"Error in file upload: {str(e)}")
+        return {'message': 'Error uploading file', 'error': str(e)}, 500
+
+
+def search_args(query, limit=None, cursor=None):
+    """
+    Validated (limit, cursor) of a search or chat request; ValueError with the message to answer 400 with
+    """
+    if not query:
+        raise ValueError("Query is required")
+    return page_args(limit, cursor)
+
+
+def search_page(query, query_embedding, records, next_cursor, first_page=True):
+    """
+    The /api/search payload for one page of search rows (query log and LLM, CPU bound)
+    """
+    if first_page:
+        log_query(query, query_embedding, "search")
+    # One graph read feeds both the grouped results and the knowledge-gap check
+    results = group_search_records(records)
+    gaps = gaps_from_search_records(records)
+    return search_response(query, results, gaps, next_cursor, first_page)
+
+
+def search(query, limit=None, cursor=None, include_summary_content=False):
+    try:
+        limit, cursor = search_args(query, limit, cursor)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        query_embedding, entities, keywords = analyze_query(query)
+        records, next_cursor = fetch_search_records(query, entities, keywords, limit, cursor, include_summary_content)
+        return search_page(query, query_embedding, records, next_cursor, first_page=cursor is None), 200
+
+    except Exception as e:
+        report_error("search", f"Error during search: {str(e)}")
+        return {"error": "An error occurred during search"}, 500
+
+
+def knowledge_gaps():
+    try:
+        # Query the graph for existing topics
+        topics_data = topics_from_records(knowledge_graph().get_topics())
+
+        return analyze_gaps(topics_data), 200
+
+    except Exception as e:
+        report_error("knowledge_gaps", f"Error in gap analysis: {str(e)}")
+        error_html = markdown.markdown("### Error\n\nAn error occurred while analyzing knowledge gaps.")
+        return {
+            "error": "An error occurred while analyzing knowledge gaps",
+            "html_content": error_html
+        }, 500
+
+
+def detect_gaps(specific_topic):
+    try:
+        if not specific_topic:
+            return {"error": "No topic specified"}, 400
+
+        # Query the graph for existing topics related to the specific topic
+        topics_data = topics_from_records(knowledge_graph().get_topics(specific_topic))
+
+        return analyze_gaps(topics_data, specific_topic), 200
+
+    except Exception as e:
+        report_error("detect_gaps", f"Error in gap detection: {str(e)}")
+        error_html = markdown.markdown("### Error\n\nAn error occurred during gap detection.")
+        return {
+            "error": "An error occurred during gap detection",
+            "html_content": error_html
+        }, 500
+
+
+def add_tip(document_id, tip_content, expert_id):
+    if not all([document_id, tip_content, expert_id]):
+        return {"error": "Missing required fields"}, 400
+
+    try:
+        # Add tip to the knowledge graph
+        tip_id = knowledge_graph().add_expert_tip(document_id, tip_content, expert_id)
+        return {"success": True, "tip_id": tip_id, "message": "Tip added successfully"}, 200
+
+    except Exception as e:
+        report_error("add_tip", f"Error adding expert tip: {str(e)}")
+        return {"error": "An error occurred while adding the tip"}, 500
+
+
+def add_expert(name, email, expertise_areas):
+    if not name or not email or not expertise_areas:
+        return {"success": False, "error": "Missing required fields"}, 400
+
+    expert_id = knowledge_graph().add_expert(name, email, expertise_areas)
+    return {"success": True, "expert_id": expert_id}, 200
+
+
+def get_experts():
+    return knowledge_graph().get_all_experts(), 200
+
+
+def chat_page(query, query_embedding, records, next_cursor, first_page=True):
+    """
+    The /api/chat payload for one page of search rows (passages, query log and LLM, CPU bound)
+    """
+    relevant_docs = group_search_records(records)
+    passages, best_score = retrieve_passages(query_embedding)
+    if first_page:
+        log_query(query, query_embedding, "chat", best_score)
+    return chat_response(query, relevant_docs, next_cursor, passages)
+
+
+def chat(query, limit=None, cursor=None, include_summary_content=False):
+    try:
+        limit, cursor = search_args(query, limit, cursor)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    try:
+        query_embedding, entities, keywords = analyze_query(query)
+        # Search for relevant documents and summaries
+        records, next_cursor = fetch_search_records(query, entities, keywords, limit, cursor, include_summary_content)
+        return chat_page(query, query_embedding, records, next_cursor, first_page=cursor is None), 200
+
+    except Exception as e:
+        report_error("chat", f"Error in chat endpoint: {str(e)}")
+        return {"error": "An error occurred during chat processing"}, 500
+
+
+def get_summary(summary_id):
+    """
+    Content of one chat summary; search results only reference it
+    """
+    try:
+        summary = knowledge_graph().get_chat_summary(summary_id)
+    except Exception as e:
+        report_error("get_summary", f"Error loading summary: {e}")
+        return {"error": "Failed to load summary"}, 500
+
+    if not summary:
+        return {"error": "Summary not found"}, 404
+    return {"id": summary["id"], "topic": summary["topic"], "content": summary["content"]}, 200
+
+
+def generate_questions(topic):
+    if not topic:
+        return {"error": "Topic is required"}, 400
+
+    cache_key = topic.strip().lower()
+    with questions_cache_lock:
+        questions = questions_cache.get(cache_key)
+    if questions is not None:
+        questions_cache_hits_total.inc()
+        return {"questions": questions}, 200
+    questions_cache_misses_total.inc()
+
+    if not Config.GEMINI_API_KEY:
+        return {"error": "API key not configured"}, 500
+
+    prompt = QUESTIONS_PROMPT.format(topic=topic)
+
+    try:
+        generated_text = components.get("gemini").generate(prompt)
+        if generated_text:
+            questions = parse_questions(generated_text)
+            with questions_cache_lock:
+                questions_cache[cache_key] = questions
+            return {"questions": questions}, 200
+
+        return {"error": "No questions generated"}, 500
+    except Exception as e:
+        report_error("generate_questions", f"Error generating questions: {e}")
+        return {"error": "Failed to generate questions"}, 500
+
+
+def summarize_chat(current_user, conversation, topic, summary_id=None):
+    if not conversation or not topic:
+        return {"error": "Conversation and topic are required"}, 400
+
+    if not Config.GEMINI_API_KEY:
+        return {"error": "API key not configured"}, 500
+
+    kg = knowledge_graph()
+    try:
+        # Resummarising an existing session only folds in the turns added since last time
+        previous = None
+        if summary_id:
+            try:
+                previous = kg.get_chat_summary(summary_id)
+            except Exception as e:
+                report_error("summarize_chat", f"Error loading previous summary: {e}")
+            if previous and previous["author_id"] != str(current_user['_id']):
+                previous = None
+
+        summarizer = ChatSummarizer(components.get("gemini"), chunk_chars=Config.SUMMARY_CHUNK_CHARS)
+        started = time.perf_counter()
+        summary, turn_count, turns_hash = summarizer.summarize(topic, conversation, previous)
+        summary_seconds.inc(time.perf_counter() - started)
+        summaries_total.inc(mode="incremental" if previous else "full")
+
+        if not summary:
+            return {"error": "No summary generated"}, 500
+
+        # Store the summary as a Summary node
+        try:
+            if previous:
+                kg.update_chat_summary(previous["id"], summary, turn_count, turns_hash)
+                summary_id = previous["id"]
+            else:
+                summary_id = kg.add_chat_summary(
+                    topic=topic,
+                    summary=summary,
+                    author_id=str(current_user['_id']),
+                    author_name=current_user['name'],
+                    turn_count=turn_count,
+                    turns_hash=turns_hash
+                )
+        except Exception as e:
+            report_error("summarize_chat", f"Error storing summary in knowledge graph: {e}")
+            # Continue even if storage fails
+            summary_id = None
+
+        return {
+            "summary": summary,
+            "summary_id": summary_id,
+            "turn_count": turn_count
+        }, 200
+
+    except GeminiError as e:
+        report_error("summarize_chat", f"Error calling Gemini API: {e}")
+        return {"error": "Failed to generate summary"}, 500
+    except Exception as e:
+        report_error("summarize_chat", f"Unexpected error during summarization: {e}")
+        return {"error": "An unexpected error occurred"}, 500
+
+
+def recommendations(current_user):
+    """
+    Fetch recommended documents from Neo4j based on the user's learning field.
+    """
+    try:
+        user_field = current_user.get('field')
+        if not user_field:
+            return {"message": "User does not have a learning field set"}, 400
+
+        # Materialised per field; only the first read of a field runs the full document scan
+        recommended_docs = knowledge_graph().get_recommendations(user_field)
+
+        return {"recommendations": recommended_docs}, 200
+    except Exception as e:
+        report_error("recommendations", f"Error fetching recommendations: {e}")
+        return {"error": "Failed to fetch recommendations"}, 500
+
+
+def knowledge_gap_clusters():
+    """
+    The ranked gap clusters last published by the clustering job
+    """
+    try:
+        published = gap_clusters.latest_clusters(get_db())
+    except Exception as e:
+        report_error("knowledge_gap_clusters", f"Error loading gap clusters: {e}")
+        return {"error": "Failed to load gap clusters"}, 500
+    if not published:
+        return {"clusters": [], "generated_at": None}, 200
+    return published, 200
+
+
+def admin_stats():
+    """
+    Internal counters (generation, caches, ...) for operators
+    """
+    from auth import auth_cache
+    return {
+        "metrics": metrics.snapshot(),
+        "caches": {
+            "auth": auth_cache.stats(),
+            "query_analysis": query_cache.stats(),
+            "embedding_batches": embedding_service.stats(),
+            "passages": components.get("passages").stats() if components.component("passages").loaded else None,
+            "questions": {
+                "size": len(questions_cache),
+                "hits": questions_cache_hits_total.value(),
+                "misses": questions_cache_misses_total.value()
+            }
+        }
+    }, 200
+
+
+def cypher_query_stats(order="total_ms", limit=50):
+    """
+    Per-fingerprint Cypher aggregates from the query profiler (empty with GRAPH_BACKEND=memory)
+    """
+    try:
+        stats = cypher_profiler.stats(order_by=order, limit=limit)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return dict(stats, backend=Config.GRAPH_BACKEND), 200
+
+
+def readiness(names=None):
+    ready = components.is_ready(names)
+    return {
+        "status": "ready" if ready else "loading",
+        "components": components.status()
+    }, 200 if ready else 503
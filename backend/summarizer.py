@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+
+
+def format_turns(turns):
+    return "\n".join(f"Q: {item['question']}\nA: {item['answer']}" for item in turns)
+
+
+def turns_fingerprint(turns):
+    """
+    Stable hash of the Q/A turns already folded into a summary
+    """
+    digest = hashlib.sha256()
+    for item in turns:
+        digest.update(json.dumps([item.get('question'), item.get('answer')]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ChatSummarizer:
+    def __init__(self, client, chunk_chars=12000, max_workers=4):
+        """
+        Rolling summaries for Q/A chat sessions.
+
+        Only turns that are not yet part of the stored summary are sent
+        upstream, together with the previous summary, so the prompt size
+        stays roughly constant as a session grows. New turns larger than
+        chunk_chars are summarised in chunks first (map) and then merged
+        with the previous summary (reduce).
+        """
+        self.client = client
+        self.chunk_chars = chunk_chars
+        self.max_workers = max_workers
+
+    def summarize(self, topic, conversation, previous=None):
+        """
+        Args:
+            topic: chat topic
+            conversation: full list of {'question', 'answer'} turns
+            previous: stored summary dict with 'content', 'turn_count' and
+                'turns_hash', or None
+
+        Returns:
+            (summary text or None, number of turns covered, fingerprint of those turns)
+        """
+        folded = 0
+        previous_summary = None
+        if previous and previous.get('content') and previous.get('turn_count'):
+            count = previous['turn_count']
+            # Reuse the stored summary only if the client still has the same history prefix
+            if count <= len(conversation) and turns_fingerprint(conversation[:count]) == previous.get('turns_hash'):
+                folded = count
+                previous_summary = previous['content']
+
+        new_turns = conversation[folded:]
+        if not new_turns:
+            return previous_summary, folded, turns_fingerprint(conversation)
+
+        chunks = self._chunk(new_turns)
+        if len(chunks) == 1:
+            summary = self._fold(topic, previous_summary, format_turns(chunks[0]))
+        else:
+            # Map: summarise each chunk independently, then reduce into the rolling summary
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                partials = list(executor.map(lambda chunk: self._summarize_chunk(topic, chunk), chunks))
+            summary = self._reduce(topic, previous_summary, [p for p in partials if p])
+
+        return summary, len(conversation), turns_fingerprint(conversation)
+
+    def _chunk(self, turns):
+        chunks, current, size = [], [], 0
+        for item in turns:
+            turn_size = len(item['question']) + len(item['answer'])
+            if current and size + turn_size > self.chunk_chars:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += turn_size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _fold(self, topic, previous_summary, conversation_text):
+        if not previous_summary:
+            return self.client.generate(f"""Please provide a comprehensive summary of this conversation about {topic}.
+                Focus on the key points discussed and insights shared. If any questions were skipped,
+                provide a summary of the conversation.
+
+                Conversation:
+                {conversation_text}
+
+                Please format the summary in clear paragraphs with proper spacing.""")
+
+        return self.client.generate(f"""Below is the summary of a conversation about {topic} so far, followed by
+                new questions and answers from the same conversation. Update the summary so it also covers
+                the new exchanges. Keep the key points and insights from the existing summary.
+
+                Existing summary:
+                {previous_summary}
+
+                New exchanges:
+                {conversation_text}
+
+                Please format the summary in clear paragraphs with proper spacing.""")
+
+    def _summarize_chunk(self, topic, turns):
+        return self.client.generate(f"""Summarize the key points and insights of this part of a conversation about {topic}.
+                Be concise and keep every distinct fact.
+
+                Conversation:
+                {format_turns(turns)}""")
+
+    def _reduce(self, topic, previous_summary, partials):
+        # Very long histories: merge partial summaries in groups until they fit one prompt
+        while len(partials) > 1 and sum(len(p) for p in partials) > self.chunk_chars:
+            groups, current = [], []
+            for partial in partials:
+                if current and sum(len(p) for p in current) + len(partial) > self.chunk_chars:
+                    groups.append(current)
+                    current = []
+                current.append(partial)
+            groups.append(current)
+            if len(groups) == len(partials):
+                break
+            partials = [self._merge(topic, group) if len(group) > 1 else group[0] for group in groups]
+
+        sections = []
+        if previous_summary:
+            sections.append(f"Summary of the earlier conversation:\n{previous_summary}")
+        sections.extend(f"Summary of part {i}:\n{partial}" for i, partial in enumerate(partials, 1))
+        joined = "\n\n".join(sections)
+
+        return self.client.generate(f"""Combine these partial summaries of one conversation about {topic}
+                into a single comprehensive summary. Focus on the key points discussed and insights shared.
+
+                {joined}
+
+                Please format the summary in clear paragraphs with proper spacing.""")
+
+    def _merge(self, topic, partials):
+        joined = "\n\n".join(f"Summary of part {i}:\n{partial}" for i, partial in enumerate(partials, 1))
+        return self.client.generate(f"""Merge these consecutive partial summaries of a conversation about {topic}
+                into one concise summary that keeps every distinct fact.
+
+                {joined}""")
@@ -151,5 +151,19 @@ class TestKAIApp(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(data['success'])
 
+    def test_health_endpoints(self):
+        """
+        Test the liveness and readiness probes
+        """
+        response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['status'], 'ok')
+
+        response = self.client.get('/readyz')
+        data = json.loads(response.data)
+        self.assertIn(response.status_code, (200, 503))
+        self.assertIn('llm', data['components'])
+        self.assertIn('loaded', data['components']['embedder'])
+
 if __name__ == '__main__':
     unittest.main()
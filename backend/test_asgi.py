@@ -0,0 +1,246 @@
+import tempfile
+import unittest
+
+import bcrypt
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
+
+import asgi
+import components
+import services
+from auth import auth_cache, generate_token
+from benchmarks import stubs
+from knowlege_graph import AsyncKnowledgeGraph
+from memory_graph import MemoryKnowledgeGraph
+from passage_index import PassageIndex
+from test_knowledge_graph import knowledge
+from test_search import search_row
+
+
+class FakeUsers:
+    def __init__(self, users):
+        self.users = users
+
+    def find_one(self, query, projection=None):
+        for user in self.users:
+            if all(user.get(key) == value for key, value in query.items()):
+                return {key: value for key, value in user.items() if key == '_id' or not projection or key in projection}
+        return None
+
+
+class FakeDb:
+    def __init__(self, users):
+        self.users = FakeUsers(users)
+
+
+class AsyncFakeUsers(FakeUsers):
+    async def find_one(self, query, projection=None):
+        return super().find_one(query, projection)
+
+    async def insert_one(self, document):
+        document.setdefault('_id', ObjectId())
+        self.users.append(document)
+
+
+class AsyncFakeDb:
+    def __init__(self, users):
+        self.users = AsyncFakeUsers(users)
+
+
+DUPLICATE_EMAIL = DuplicateKeyError("E11000 duplicate key error collection: knowledge_system.users index: email_unique")
+
+
+class RacingUsers(FakeUsers):
+    """
+    Another signup for the same email lands between find_one and insert_one
+    """
+    def find_one(self, query, projection=None):
+        return None
+
+    def insert_one(self, document):
+        raise DUPLICATE_EMAIL
+
+
+class AsyncRacingUsers(FakeUsers):
+    async def find_one(self, query, projection=None):
+        return None
+
+    async def insert_one(self, document):
+        raise DUPLICATE_EMAIL
+
+
+class AsyncFakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __aiter__(self):
+        return self._rows()
+
+    async def _rows(self):
+        for row in self.rows:
+            yield row
+
+    async def consume(self):
+        return None
+
+
+class AsyncFakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, **params):
+        self.driver.params.append(params)
+        return AsyncFakeResult(self.driver.rows[:params["limit"]])
+
+
+class AsyncFakeDriver:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = []
+
+    def session(self):
+        return AsyncFakeSession(self)
+
+
+class AsgiAppTest(unittest.TestCase):
+    def setUp(self):
+        stubs.install(embed_delay=0, nlp_delay=0, llm_delay=0)
+        auth_cache.clear()
+        self.user = {'_id': ObjectId(), 'email': 'ada@example.com', 'name': 'Ada', 'role': 'user', 'field': 'ML',
+                     'password': bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=4))}
+        components.component("mongo").override(FakeDb([self.user]))
+        # TestClient is not used as a context manager, so the lifespan does not create the async clients
+        asgi.app.state.db = AsyncFakeDb([self.user])
+        asgi.app.state.graph = None
+
+        kg = MemoryKnowledgeGraph()
+        for i in range(3):
+            kg.add_document(knowledge(f"Neural Networks {i}", ["neural networks"]))
+        components.component("graph").override(kg)
+
+        self.passage_dir = tempfile.TemporaryDirectory()
+        components.component("passages").override(PassageIndex(self.passage_dir.name))
+        self.saved_query_log = services.query_log
+        services.query_log = None
+
+        self.client = TestClient(asgi.app)
+        self.headers = {'Authorization': f"Bearer {generate_token(self.user['_id'], 'user')}"}
+
+    def tearDown(self):
+        services.query_log = self.saved_query_log
+        self.passage_dir.cleanup()
+        for name in ("embedder", "nlp", "llm", "mongo", "graph", "passages"):
+            components.component(name).reset()
+
+    def test_login_checks_the_password(self):
+        response = self.client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('password', response.json()['user'])
+
+        response = self.client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_signup_stores_the_user_with_the_async_client(self):
+        data = {'email': 'grace@example.com', 'password': 'secret', 'name': 'Grace', 'role': 'user', 'field': 'CS'}
+        response = self.client.post('/api/auth/signup', json=data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['user']['email'], 'grace@example.com')
+        self.assertEqual(len(asgi.app.state.db.users.users), 2)
+
+        response = self.client.post('/api/auth/signup', json=data)
+        self.assertEqual((response.status_code, response.json()), (400, {'message': 'Email already registered'}))
+
+    def test_concurrent_signups_for_one_email_are_rejected(self):
+        data = {'email': 'ada@example.com', 'password': 'secret', 'name': 'Ada', 'role': 'user'}
+        expected = ({'message': 'Email already registered'}, 400)
+
+        db = FakeDb([])
+        db.users = RacingUsers([])
+        components.component("mongo").override(db)
+        self.assertEqual(services.signup(data), expected)
+
+        asgi.app.state.db.users = AsyncRacingUsers([])
+        response = self.client.post('/api/auth/signup', json=data)
+        self.assertEqual((response.json(), response.status_code), expected)
+
+    def test_token_users_are_loaded_with_the_async_client(self):
+        response = self.client.post('/api/detect_gaps', json={'topic': 'ml'}, headers=self.headers)
+        self.assertNotEqual(response.status_code, 401)
+        self.assertEqual(auth_cache.cached_user(str(self.user['_id']))['email'], 'ada@example.com')
+
+        headers = {'Authorization': f"Bearer {generate_token(ObjectId(), 'user')}"}
+        response = self.client.post('/api/detect_gaps', json={'topic': 'ml'}, headers=headers)
+        self.assertEqual((response.status_code, response.json()), (401, {'message': 'User not found'}))
+
+    def test_token_errors(self):
+        response = self.client.post('/api/detect_gaps', json={'topic': 'ml'})
+        self.assertEqual((response.status_code, response.json()), (401, {'message': 'Token is missing'}))
+
+        response = self.client.post('/api/detect_gaps', json={'topic': 'ml'}, headers={'Authorization': 'Bearer nope'})
+        self.assertEqual((response.status_code, response.json()), (401, {'message': 'Invalid token'}))
+
+        response = self.client.get('/api/admin/stats', headers=self.headers)
+        self.assertEqual((response.status_code, response.json()), (403, {'message': 'Admin privileges required'}))
+
+    def test_search_pages_follow_the_cursor(self):
+        first = self.client.post('/api/search', json={'query': 'neural networks', 'limit': 2}).json()
+        self.assertEqual(sum(len(docs) for docs in first['results'].values()), 2)
+        self.assertIsNotNone(first['next_cursor'])
+
+        second = self.client.post('/api/search', json={'query': 'neural networks', 'limit': 2,
+                                                        'cursor': first['next_cursor']}).json()
+        self.assertEqual(sum(len(docs) for docs in second['results'].values()), 1)
+        self.assertIsNone(second['next_cursor'])
+
+        response = self.client.post('/api/search', json={'query': 'neural networks', 'cursor': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_reads_neo4j_through_the_async_driver(self):
+        driver = AsyncFakeDriver([search_row("d1", "Neural Networks", 0.9), search_row("d2", "Backprop", 0.4),
+                                  search_row("d3", "Perceptrons", 0.3)])
+        asgi.app.state.graph = AsyncKnowledgeGraph(driver)
+
+        response = self.client.post('/api/search', json={'query': 'neural networks', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(sum(len(docs) for docs in body['results'].values()), 2)
+        self.assertIsNotNone(body['next_cursor'])
+        # One row beyond the page decides whether there is a next page
+        self.assertEqual(driver.params[0]['limit'], 3)
+        self.assertEqual(driver.params[0]['search_query'], 'neural networks')
+
+    def test_chat(self):
+        services.index_passages("d1", "Neural Networks 0", ["neural networks"])
+
+        response = self.client.post('/api/chat', json={'query': 'neural networks'})
+        self.assertEqual(response.status_code, 200)
+        context = response.json()['context']
+        self.assertEqual(context['documents_found'], 3)
+        self.assertEqual([passage['document_id'] for passage in context['passages']], ['d1'])
+        self.assertEqual(self.client.post('/api/chat', json={}).status_code, 400)
+
+    def test_trace_header_is_only_returned_to_admins(self):
+        response = self.client.get('/healthz', headers={**self.headers, 'X-Debug-Trace': '1'})
+        self.assertNotIn('X-Trace', response.headers)
+
+        admin = {'Authorization': f"Bearer {generate_token(ObjectId(), 'admin')}", 'X-Debug-Trace': '1'}
+        response = self.client.get('/healthz', headers=admin)
+        self.assertIn('X-Trace', response.headers)
+
+    def test_metrics_label_routes_by_template(self):
+        self.client.get('/api/summaries/abc')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['content-type'].startswith('text/plain'))
+        self.assertIn('route="/api/summaries/{summary_id}"', response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from bson import ObjectId
+from flask import Flask
+import components
+from auth import auth_cache, generate_token, token_required, admin_required, invalidate_user
+
+class FakeUsers:
+    def __init__(self, user):
+        self.user = user
+        self.find_calls = 0
+
+    def find_one(self, query, projection=None):
+        self.find_calls += 1
+        if query['_id'] != self.user['_id']:
+            return None
+        return {key: value for key, value in self.user.items() if key == '_id' or key in projection}
+
+class FakeDb:
+    def __init__(self, user):
+        self.users = FakeUsers(user)
+
+class TestAuthCache(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up a tiny app with one protected route and an in-memory users collection
+        """
+        self.user = {'_id': ObjectId(), 'name': 'Ada', 'email': 'ada@example.com',
+                     'role': 'user', 'field': 'ml', 'password': b'hash'}
+        self.db = FakeDb(self.user)
+        components.component("mongo").override(self.db)
+        auth_cache.clear()
+
+        app = Flask(__name__)
+
+        @app.route('/me')
+        @token_required
+        def me(current_user):
+            return current_user
+
+        @app.route('/admin')
+        @admin_required
+        def admin(current_user):
+            return current_user
+
+        self.client = app.test_client()
+        self.headers = {'Authorization': f"Bearer {generate_token(self.user['_id'], 'user')}"}
+
+    def tearDown(self):
+        components.component("mongo").reset()
+
+    def test_user_is_fetched_once(self):
+        """
+        Repeated requests with the same token hit Mongo only once
+        """
+        for _ in range(3):
+            response = self.client.get('/me', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.db.users.find_calls, 1)
+        self.assertNotIn('password', response.get_json())
+        self.assertGreaterEqual(auth_cache.stats()['user']['hits'], 2)
+
+    def test_invalidate_user_refetches(self):
+        """
+        Invalidating a user forces the next request to reload the document
+        """
+        self.client.get('/me', headers=self.headers)
+        self.user['field'] = 'databases'
+        invalidate_user(self.user['_id'])
+        response = self.client.get('/me', headers=self.headers)
+        self.assertEqual(response.get_json()['field'], 'databases')
+        self.assertEqual(self.db.users.find_calls, 2)
+
+    def test_admin_and_missing_token(self):
+        """
+        Non-admin tokens are rejected by admin_required and a missing token is a 401
+        """
+        self.assertEqual(self.client.get('/admin', headers=self.headers).status_code, 403)
+        self.assertEqual(self.client.get('/me').status_code, 401)
+        self.assertEqual(self.client.get('/me', headers={'Authorization': 'Bearer junk'}).status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+import gap_clusters
+
+
+def around(center, count, rng, noise=0.05):
+    return center + noise * rng.standard_normal((count, len(center)))
+
+
+class GapClusterTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        kubernetes, baking = np.eye(16)[0], np.eye(16)[1]
+        self.embeddings = np.vstack([around(kubernetes, 12, rng), around(baking, 4, rng)])
+        self.queries = ["kubernetes helm charts"] * 8 + ["helm upgrade rollback"] * 4 + ["sourdough starter"] * 4
+        self.scores = [0.1] * 12 + [0.2] * 4
+
+    def test_low_scoring_queries_are_grouped_and_ranked(self):
+        clusters = gap_clusters.cluster_queries(self.embeddings, self.queries, self.scores, n_clusters=2)
+
+        self.assertEqual([cluster["size"] for cluster in clusters], [12, 4])
+        self.assertEqual([cluster["rank"] for cluster in clusters], [1, 2])
+        first = clusters[0]
+        self.assertEqual(first["distinct_queries"], 2)
+        self.assertEqual({entry["query"]: entry["count"] for entry in first["queries"]},
+                         {"kubernetes helm charts": 8, "helm upgrade rollback": 4})
+        self.assertAlmostEqual(first["mean_score"], 0.1, places=4)
+        self.assertGreater(first["cohesion"], 0.9)
+
+    def test_too_few_queries_make_no_clusters(self):
+        self.assertEqual(gap_clusters.cluster_queries(self.embeddings[:2], self.queries[:2], self.scores[:2]), [])
+
+    def test_names_are_reused_for_unchanged_clusters(self):
+        clusters = gap_clusters.cluster_queries(self.embeddings, self.queries, self.scores, n_clusters=2)
+        calls = []
+
+        def namer(queries):
+            calls.append(queries)
+            return "Kubernetes deployments" if "helm" in queries[0] else ""
+
+        gap_clusters.name_clusters(clusters, namer)
+        self.assertEqual([cluster["topic"] for cluster in clusters], ["Kubernetes deployments", "sourdough starter"])
+
+        previous = [dict(cluster) for cluster in clusters]
+        gap_clusters.name_clusters(clusters, namer, previous)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
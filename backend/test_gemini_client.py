@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import components
+import services
+from benchmarks import gemini_stub
+from config import Config
+from gemini_client import GeminiClient, GeminiError, gemini_requests_total
+
+
+class FlakyHandler(gemini_stub.GeminiStubHandler):
+    """
+    The Gemini stub, answering with the queued error statuses first
+    """
+    statuses = []
+    ports = []
+
+    def do_POST(self):
+        self.ports.append(self.client_address[1])
+        if not self.statuses:
+            return super().do_POST()
+
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        data = b'{"error": {"message": "try again"}}'
+        self.send_response(self.statuses.pop(0))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class GeminiClientTest(unittest.TestCase):
+    def setUp(self):
+        self.handler = type("Handler", (FlakyHandler,), {"statuses": [], "ports": []})
+        self.server = gemini_stub.ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = GeminiClient("key", f"http://127.0.0.1:{self.server.server_port}/", max_retries=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_share_one_pooled_connection(self):
+        for _ in range(5):
+            self.assertTrue(self.client.generate("Summarize this").startswith("Stub summary"))
+        self.assertEqual(len(self.handler.ports), 5)
+        self.assertEqual(len(set(self.handler.ports)), 1)
+
+    def test_rate_limits_and_server_errors_are_retried(self):
+        self.handler.statuses.extend([429, 503])
+        text = self.client.generate(services.QUESTIONS_PROMPT.format(topic="ml"))
+        self.assertEqual(json.loads(text)[0], "Stub question 1?")
+        self.assertEqual(len(self.handler.ports), 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.handler.statuses.extend([500, 500, 500, 500])
+        errors = gemini_requests_total.value(status="error")
+        started = time.perf_counter()
+        with self.assertRaises(GeminiError):
+            self.client.generate("Summarize this")
+        self.assertEqual(len(self.handler.ports), 3)
+        # Exponential backoff (backoff_factor=0.5) between the attempts
+        self.assertGreaterEqual(time.perf_counter() - started, 0.5)
+        self.assertEqual(gemini_requests_total.value(status="error"), errors + 1)
+
+    def test_client_errors_are_not_retried(self):
+        self.handler.statuses.append(400)
+        with self.assertRaises(GeminiError):
+            self.client.generate("Summarize this")
+        self.assertEqual(len(self.handler.ports), 1)
+
+    def test_stub_answers_only_the_questions_prompt_with_questions(self):
+        self.assertTrue(services.QUESTIONS_PROMPT.startswith(gemini_stub.QUESTIONS_PROMPT_PREFIX))
+        summary_prompt = "Please provide a comprehensive summary of this conversation. Q: any questions?"
+        self.assertTrue(self.client.generate(summary_prompt).startswith("Stub summary"))
+
+
+class FakeGemini:
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return self.text
+
+
+class QuestionsCacheTest(unittest.TestCase):
+    def setUp(self):
+        services.questions_cache.clear()
+        patcher = mock.patch.object(Config, "GEMINI_API_KEY", "key")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(components.component("gemini").reset)
+
+    def test_repeated_topics_are_served_from_the_cache(self):
+        gemini = FakeGemini('["What is ML?", "Why ML?"]')
+        components.component("gemini").override(gemini)
+
+        first = services.generate_questions("Machine Learning")
+        second = services.generate_questions("  machine learning ")
+
+        self.assertEqual(first, ({"questions": ["What is ML?", "Why ML?"]}, 200))
+        self.assertEqual(second, first)
+        self.assertEqual(len(gemini.prompts), 1)
+        self.assertEqual(gemini.prompts[0], services.QUESTIONS_PROMPT.format(topic="Machine Learning"))
+
+    def test_failed_generations_are_not_cached(self):
+        components.component("gemini").override(FakeGemini(None))
+        self.assertEqual(services.generate_questions("ml")[1], 500)
+
+        gemini = FakeGemini('["What is ML?"]')
+        components.component("gemini").override(gemini)
+        self.assertEqual(services.generate_questions("ml"), ({"questions": ["What is ML?"]}, 200))
+        self.assertEqual(len(gemini.prompts), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from config import Config, parse_budgets
+from Model.generation import JsonArrayTracker, find_json_array_end, get_generation_profile
+
+class TestJsonArrayTracker(unittest.TestCase):
+    def test_stops_when_array_closes(self):
+        """
+        The tracker reports the array as closed on the chunk that balances it
+        """
+        tracker = JsonArrayTracker()
+        self.assertFalse(tracker.feed('Here are the gaps: [{"topic": "A", '))
+        self.assertFalse(tracker.feed('"reason": "uses ] and [ inside"}'))
+        self.assertTrue(tracker.feed(']\n\nLet me know if'))
+        self.assertEqual(tracker.text[tracker.end:], '\n\nLet me know if')
+
+    def test_skips_bracketed_prose(self):
+        """
+        Brackets that do not form valid JSON are ignored
+        """
+        text = 'See [the list below] for details: [{"topic": "B", "reason": "r"}] trailing'
+        end = find_json_array_end(text)
+        self.assertEqual(text[end:], ' trailing')
+
+    def test_stray_quote_in_prose(self):
+        """
+        A quote inside bracketed prose does not hide the array that follows
+        """
+        text = 'Gaps [the "main ones] are: [{"topic": "A", "reason": "r"}] trailing'
+        self.assertEqual(text[find_json_array_end(text):], ' trailing')
+
+        tracker = JsonArrayTracker()
+        self.assertFalse(tracker.feed('Note [sic" on the '))
+        self.assertFalse(tracker.feed('list]: ["What is A?", '))
+        self.assertTrue(tracker.feed('"Why B?"] done'))
+        self.assertEqual(tracker.text[tracker.end:], ' done')
+
+    def test_unclosed_array(self):
+        """
+        No end offset is reported while the array is still open
+        """
+        self.assertIsNone(find_json_array_end('[{"topic": "C"'))
+
+class TestGenerationBudgets(unittest.TestCase):
+    def test_malformed_entries_are_skipped(self):
+        """
+        Entries without a role or a whole-number budget are dropped with a warning
+        """
+        with self.assertLogs(level="WARNING") as logs:
+            budgets = parse_budgets(" search=400, gap_analysis = 300 ,oops,=5,chat=ten,x=1=2,")
+        self.assertEqual(budgets, {"search": 400, "gap_analysis": 300})
+        self.assertEqual(len(logs.output), 4)
+
+class TestAssistedDecoding(unittest.TestCase):
+    def test_only_listed_roles_are_assisted(self):
+        """
+        Assisted decoding changes the replies (greedy instead of sampled), so it is off unless a role opts in
+        """
+        with mock.patch.object(Config, "ASSISTED_DECODING_ROLES", []):
+            self.assertFalse(get_generation_profile("search")["assisted"])
+        with mock.patch.object(Config, "ASSISTED_DECODING_ROLES", ["search"]):
+            self.assertTrue(get_generation_profile("search")["assisted"])
+            self.assertFalse(get_generation_profile("gap_analysis")["assisted"])
+
+if __name__ == '__main__':
+    unittest.main()
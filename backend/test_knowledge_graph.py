@@ -0,0 +1,522 @@
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from cypher_profiler import CypherProfiler, fingerprint
+import knowlege_graph
+from knowlege_graph import KnowledgeGraph
+from memory_graph import MemoryKnowledgeGraph
+import services
+
+
+class FakeResult(list):
+    def __init__(self, rows, summary=None):
+        super().__init__(rows)
+        self.summary = summary
+
+    def consume(self):
+        return self.summary
+
+
+class PagingSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, after, since, batch_size):
+        self.driver.calls.append((after, since, batch_size))
+        rows = [row for row in self.driver.rows if row["doc_id"] > after]
+        return FakeResult(rows[:batch_size])
+
+
+class PagingDriver:
+    def __init__(self, count):
+        self.rows = [{
+            "doc_id": f"doc-{i:03d}", "title": f"Title {i}", "type": None, "embedding": None,
+            "tips": [{"tip_id": None, "text": None, "expert_name": None}]
+        } for i in range(count)]
+        self.calls = []
+
+    def session(self):
+        return PagingSession(self)
+
+    def close(self):
+        pass
+
+
+class DocumentIterationTest(unittest.TestCase):
+    def graph(self, count):
+        kg = KnowledgeGraph("bolt://localhost:7687", "neo4j", "password")
+        kg.driver.close()
+        kg.driver = PagingDriver(count)
+        return kg
+
+    def test_batches_follow_the_last_id(self):
+        kg = self.graph(5)
+        batches = list(kg.iter_document_batches(batch_size=2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual([after for after, _, _ in kg.driver.calls], ["", "doc-001", "doc-003"])
+
+    def test_full_last_batch_needs_one_more_query(self):
+        kg = self.graph(4)
+        self.assertEqual(len(list(kg.iter_documents(batch_size=2))), 4)
+        self.assertEqual(len(kg.driver.calls), 3)
+
+    def test_empty_tips_are_dropped(self):
+        kg = self.graph(1)
+        document = next(kg.iter_documents())
+        self.assertEqual(document["tips"], [])
+        self.assertEqual(document["tips_count"], 0)
+
+    def test_since_is_passed_as_iso_string(self):
+        from datetime import datetime, timezone
+        kg = self.graph(1)
+        list(kg.iter_documents(since=datetime(2025, 1, 1, tzinfo=timezone.utc)))
+        self.assertEqual(kg.driver.calls[0][1], "2025-01-01T00:00:00+00:00")
+
+
+class Summary:
+    def __init__(self, profile=None):
+        self.result_available_after = 3
+        self.result_consumed_after = 4
+        self.profile = profile
+
+
+class ProfilingDriver:
+    def __init__(self):
+        self.statements = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        self.statements.append(query)
+        profile = {"dbHits": 5, "children": [{"dbHits": 7, "children": []}]} if query.startswith("PROFILE") else None
+        return FakeResult([{"doc_id": "d1", "title": "T", "content": None, "tips": []}], Summary(profile))
+
+
+class CypherProfilerTest(unittest.TestCase):
+    def test_fingerprint_ignores_literals_comments_and_whitespace(self):
+        a = fingerprint("MATCH (d:Document {id: 'a'})  // by id\nRETURN d LIMIT 10")
+        b = fingerprint("MATCH (d:Document {id: \"b\"})\n   RETURN d LIMIT 25")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a[0], fingerprint("MATCH (e:Expert) RETURN e")[0])
+
+    def test_slow_queries_are_profiled_on_their_next_run(self):
+        profiler = CypherProfiler(slow_query_ms=0, profile_above_ms=0.000001, profile_interval_seconds=3600)
+        driver = ProfilingDriver()
+        kg = KnowledgeGraph(driver=driver)
+        with mock.patch("knowlege_graph.cypher_profiler", profiler), self.assertLogs(level="WARNING"):
+            for _ in range(3):
+                kg.get_document_with_tips("d1")
+
+        # Only the second run is profiled; the interval holds back the third
+        self.assertEqual([s.startswith("PROFILE") for s in driver.statements], [False, True, False])
+        stats = profiler.stats()
+        entry, = stats["queries"]
+        self.assertEqual(entry["operations"], ["get_document_with_tips"])
+        self.assertEqual((entry["calls"], entry["rows"], entry["slow"], entry["profiled"]), (3, 3, 3, 1))
+        self.assertEqual(entry["db_hits_max"], 12)
+        self.assertEqual(entry["available_after_ms"], 9)
+
+    def test_errors_are_counted_and_reraised(self):
+        profiler = CypherProfiler(slow_query_ms=10000)
+        driver = ProfilingDriver()
+        driver.run = mock.Mock(side_effect=RuntimeError("unavailable"))
+        kg = KnowledgeGraph(driver=driver)
+        with mock.patch("knowlege_graph.cypher_profiler", profiler):
+            with self.assertRaises(RuntimeError):
+                kg.get_all_experts()
+        self.assertEqual(profiler.stats()["queries"][0]["errors"], 1)
+        with self.assertRaises(ValueError):
+            profiler.stats(order_by="nonsense")
+
+
+def knowledge(title, keywords=(), field="ML", embedding=None):
+    return {
+        "title": title, "filename": f"{title}.pdf", "original_filename": f"{title}.pdf",
+        "author_id": "u1", "author_name": "Ada", "field": field, "keywords": list(keywords),
+        "fileLink": None, "meme_type": "application/pdf", "embedding": embedding
+    }
+
+
+class MemoryGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.kg = MemoryKnowledgeGraph()
+        self.nn = self.kg.add_document(knowledge("Neural Networks", ["deep learning", "backprop"], embedding=[0.5, 0.25]))
+        self.sql = self.kg.add_document(knowledge("SQL Basics", ["databases"], field="Data"))
+        self.expert = self.kg.add_expert("Grace", "grace@example.com", ["Deep Learning"])
+
+    def test_has_every_knowledge_graph_method(self):
+        public = {name for name in vars(KnowledgeGraph) if not name.startswith("_")}
+        self.assertEqual(public, set(knowlege_graph.KnowledgeGraphBackend.__abstractmethods__))
+        self.assertIsInstance(self.kg, knowlege_graph.KnowledgeGraphBackend)
+
+        class Partial(knowlege_graph.KnowledgeGraphBackend):
+            def close(self):
+                pass
+        with self.assertRaisesRegex(TypeError, "search_records"):
+            Partial()
+
+    def test_tips_from_both_write_paths_are_read_back(self):
+        self.kg.add_tip("Normalise inputs", self.nn, self.expert)
+        self.kg.add_expert_tip(self.nn, "Watch the learning rate", self.expert)
+        document = next(d for d in self.kg.iter_documents() if d["id"] == self.nn)
+        self.assertEqual(sorted(tip["text"] for tip in document["tips"]), ["Normalise inputs", "Watch the learning rate"])
+        self.assertEqual(self.kg.find_knowledge_gaps(), [{"id": self.sql, "title": "SQL Basics", "type": None}])
+        self.assertEqual(self.kg.get_all_experts()[0]["tips_count"], 2)
+
+    def test_gap_state_follows_tips_and_is_rebuilt_on_load(self):
+        self.assertEqual([gap["id"] for gap in self.kg.find_knowledge_gaps()], [self.nn, self.sql])
+        self.kg.add_tip("Normalise inputs", self.nn, self.expert)
+        self.kg.add_expert_tip(self.nn, "Watch the learning rate", self.expert)
+        self.assertEqual(self.kg.graph.nodes[self.nn]["tip_count"], 2)
+
+        # A graph written before tip_count existed gets it back when loaded
+        for _, data in self.kg.graph.nodes(data=True):
+            data.pop("tip_count", None)
+        reloaded = MemoryKnowledgeGraph(self.kg.graph)
+        self.assertEqual(reloaded.graph.nodes[self.nn]["tip_count"], 2)
+        self.assertEqual([gap["id"] for gap in reloaded.find_knowledge_gaps()], [self.sql])
+
+    def test_tip_for_unknown_document_is_not_created(self):
+        self.assertIsNone(self.kg.add_expert_tip("missing", "text", self.expert))
+
+    def test_batches_and_since(self):
+        batches = list(self.kg.iter_document_batches(batch_size=1))
+        self.assertEqual([[d["id"] for d in b] for b in batches], [[i] for i in sorted([self.nn, self.sql])])
+        future = datetime.now(timezone.utc) + timedelta(hours=1)
+        self.assertEqual(self.kg.get_all_documents(), list(self.kg.iter_documents()))
+        self.assertEqual(list(self.kg.iter_documents(since=future)), [])
+
+    def test_search_rows_are_ranked_and_paged(self):
+        self.kg.add_chat_summary("Neural networks chat", "We discussed layers", "u1", "Ada")
+        params = services.search_params("neural networks", [], ["learning"], limit=1)
+        first = self.kg.search_records(params)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(first[0]["id"], self.nn)
+        self.assertEqual(first[0]["relevance_score"], 3 / 4)
+        self.assertEqual(first[1]["doc_type"], "summary")
+        self.assertIsNone(first[1]["summary_content"])
+
+        rows, cursor = services.split_page(first, 1)
+        second = self.kg.search_records(
+            services.search_params("neural networks", [], ["learning"], limit=1, cursor=services.decode_cursor(cursor)))
+        self.assertEqual([row["doc_type"] for row in second], ["summary"])
+
+    def test_topics_and_field_documents(self):
+        self.assertEqual([row["topic"] for row in self.kg.get_topics()], ["Neural Networks", "SQL Basics"])
+        self.assertEqual([row["id"] for row in self.kg.get_topics("backprop")], [self.nn])
+        self.assertEqual([doc["id"] for doc in self.kg.get_documents_for_field("data")], [self.sql])
+
+    def test_recommendations_are_materialised_and_kept_current(self):
+        self.assertEqual(self.kg.get_recommendations("Data"), self.kg.get_documents_for_field("Data"))
+        self.kg.get_documents_for_field = mock.Mock(side_effect=AssertionError("live query after warm-up"))
+
+        newer = self.kg.add_document(knowledge("Data Lakes", ["storage"], field="DATA"))
+        by_keyword = self.kg.add_document(knowledge("Warehouses", ["big data"], field="Ops"))
+        self.kg.add_document(knowledge("Kubernetes", ["containers"], field="Ops"))
+
+        self.assertEqual([doc["id"] for doc in self.kg.get_recommendations("data")], [by_keyword, newer, self.sql])
+        self.assertEqual(self.kg.get_recommendations("data")[0]["title"], "Warehouses")
+
+    def test_chat_summaries(self):
+        summary_id = self.kg.add_chat_summary("Topic", "v1", "u1", "Ada", turn_count=2, turns_hash="h")
+        self.kg.update_chat_summary(summary_id, "v2", 4, "h2")
+        summary = self.kg.get_chat_summary(summary_id)
+        self.assertEqual((summary["content"], summary["turn_count"]), ("v2", 4))
+        self.assertIsNone(self.kg.get_chat_summary(self.nn))
+
+    def test_snapshot_round_trip(self):
+        self.kg.add_outreach("o1", [self.nn], topic="Neural Networks", expert_ids=[self.expert])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "graph.pkl.gz")
+            self.kg.save(path)
+            loaded = MemoryKnowledgeGraph.open(path)
+
+        self.assertEqual(loaded.get_all_experts(), self.kg.get_all_experts())
+        self.assertEqual([d["id"] for d in loaded.iter_documents()], [d["id"] for d in self.kg.iter_documents()])
+        document = next(d for d in loaded.iter_documents() if d["id"] == self.nn)
+        self.assertEqual(list(document["embedding"]), [0.5, 0.25])
+        self.assertTrue(loaded.graph.has_edge("o1", self.expert, key="ASSIGNED_TO"))
+
+        # New nodes are indexed by label after loading
+        loaded.add_expert("Alan", "alan@example.com", ["SQL"])
+        self.assertEqual(len(loaded.get_all_experts()), 2)
+
+
+class StatementDriver:
+    """
+    Answers each statement with the handler registered for its exact text, recording what ran
+    """
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.statements = []
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        self.statements.append((query, params))
+        return FakeResult(self.handlers[query](**params))
+
+    def close(self):
+        pass
+
+    def ran(self, query):
+        return [params for statement, params in self.statements if statement == query]
+
+
+class RecommendationStore:
+    """
+    The documents and FieldRecommendations nodes the recommendation statements read and write
+    """
+    def __init__(self):
+        self.documents = []
+        self.lists = {}
+
+    def matches(self, document, field):
+        return document["field"].lower() == field or any(field in kw.lower() for kw in document["keywords"])
+
+    def add_document(self, recommendation_limit, **document):
+        self.documents.append(document)
+        for field, ids in self.lists.items():
+            if self.matches(document, field):
+                # SET r.document_ids = ([d.id] + r.document_ids)[0..$recommendation_limit]
+                self.lists[field] = ([document["id"]] + ids)[0:recommendation_limit]
+        return []
+
+    def field_documents(self, field):
+        newest = [doc for doc in reversed(self.documents) if self.matches(doc, field.lower())]
+        return [dict(doc, created_at=None) for doc in newest[:10]]
+
+    def field_recommendations(self, field):
+        if field not in self.lists:
+            return []
+        by_id = {doc["id"]: doc for doc in self.documents}
+        return [{"field": field, "documents": [by_id[id] for id in self.lists[field]]}]
+
+    def store(self, field, document_ids):
+        self.lists[field] = document_ids
+        return []
+
+
+class Neo4jRecommendationTest(unittest.TestCase):
+    def setUp(self):
+        self.store = RecommendationStore()
+        self.driver = StatementDriver({
+            knowlege_graph.ADD_DOCUMENT_QUERY: self.store.add_document,
+            knowlege_graph.FIELD_DOCUMENTS_QUERY: self.store.field_documents,
+            knowlege_graph.FIELD_RECOMMENDATIONS_QUERY: self.store.field_recommendations,
+            knowlege_graph.STORE_FIELD_RECOMMENDATIONS_QUERY: self.store.store,
+        })
+        self.kg = KnowledgeGraph(driver=self.driver)
+
+    def test_add_document_prepends_and_caps_the_lists_it_matches(self):
+        self.assertIn("SET r.document_ids = ([d.id] + r.document_ids)[0..$recommendation_limit]",
+                      knowlege_graph.ADD_DOCUMENT_QUERY)
+        self.store.lists = {"data": ["old"], "ops": []}
+
+        by_field = self.kg.add_document(knowledge("SQL", ["databases"], field="DATA"))
+        by_keyword = self.kg.add_document(knowledge("Warehouses", ["Big Data"], field="Ops"))
+        self.assertEqual(self.store.lists, {"data": [by_keyword, by_field, "old"], "ops": [by_keyword]})
+        self.assertEqual(self.driver.ran(knowlege_graph.ADD_DOCUMENT_QUERY)[0]["recommendation_limit"],
+                         knowlege_graph.RECOMMENDATION_LIMIT)
+
+        added = [self.kg.add_document(knowledge(f"Data {i}", field="Data")) for i in range(12)]
+        self.assertEqual(self.store.lists["data"], added[::-1][:knowlege_graph.RECOMMENDATION_LIMIT])
+
+    def test_recommendations_are_read_from_the_materialised_list(self):
+        for i in range(12):
+            self.store.add_document(knowlege_graph.RECOMMENDATION_LIMIT, **knowledge(f"Data {i}", field="Data"),
+                                    id=f"d{i:02d}")
+
+        first = self.kg.get_recommendations("Data")
+        self.assertEqual([doc["id"] for doc in first], [f"d{i:02d}" for i in range(11, 1, -1)])
+        self.assertEqual(self.driver.ran(knowlege_graph.STORE_FIELD_RECOMMENDATIONS_QUERY),
+                         [{"field": "data", "document_ids": [doc["id"] for doc in first]}])
+
+        newer = self.kg.add_document(knowledge("Data Lakes", field="data"))
+        self.driver.statements.clear()
+        second = self.kg.get_recommendations("DATA")
+
+        self.assertEqual([doc["id"] for doc in second], [newer] + [doc["id"] for doc in first][:-1])
+        # One read of the stored list; the field ranking query does not run again
+        self.assertEqual([statement for statement, _ in self.driver.statements],
+                         [knowlege_graph.FIELD_RECOMMENDATIONS_QUERY])
+        self.assertEqual(self.driver.ran(knowlege_graph.FIELD_RECOMMENDATIONS_QUERY), [{"field": "data"}])
+
+
+class GapStore:
+    """
+    Documents with their tips, labels and tip_count, as the gap statements leave them
+    """
+    def __init__(self, tips_per_document):
+        self.documents = {
+            id: {"id": id, "title": id.title(), "type": None, "labels": {"Document"}, "tips": tips}
+            for id, tips in tips_per_document.items()
+        }
+
+    def backfill(self, after, batch_size):
+        batch = sorted((doc for id, doc in self.documents.items() if id > after), key=lambda doc: doc["id"])
+        batch = batch[:batch_size]
+        for doc in batch:
+            doc["tip_count"] = doc["tips"]
+            if doc["tips"]:
+                doc["labels"].discard("Gap")
+            else:
+                doc["labels"].add("Gap")
+        # Aggregates without grouping keys return one row even when nothing matched
+        return [{"last_id": batch[-1]["id"] if batch else None, "updated": len(batch),
+                 "gaps": sum(1 for doc in batch if not doc["tips"])}]
+
+    def add_tip(self, document_id, content, expert_id):
+        doc = self.documents.get(document_id)
+        if doc is None:
+            return []
+        doc["tips"] += 1
+        # SET d.tip_count = coalesce(d.tip_count, 0) + 1 / REMOVE d:Gap
+        doc["tip_count"] = doc.get("tip_count", 0) + 1
+        doc["labels"].discard("Gap")
+        return [{"tip_id": f"tip-{doc['tips']}"}]
+
+    def gaps(self):
+        return [{"id": doc["id"], "title": doc["title"], "type": doc["type"]}
+                for doc in self.documents.values() if "Gap" in doc["labels"]]
+
+
+class Neo4jGapStateTest(unittest.TestCase):
+    def setUp(self):
+        self.store = GapStore({"a": 0, "b": 2, "c": 0, "d": 1, "e": 0})
+        self.driver = StatementDriver({
+            knowlege_graph.GAP_BACKFILL_QUERY: self.store.backfill,
+            knowlege_graph.ADD_TIP_QUERY: self.store.add_tip,
+            knowlege_graph.KNOWLEDGE_GAPS_QUERY: self.store.gaps,
+        })
+        self.kg = KnowledgeGraph(driver=self.driver)
+
+    def test_backfill_walks_the_documents_in_id_batches(self):
+        self.assertEqual(self.kg.migrate_gap_state(batch_size=2), (5, 3))
+
+        self.assertEqual([params["after"] for params in self.driver.ran(knowlege_graph.GAP_BACKFILL_QUERY)],
+                         ["", "b", "d", "e"])
+        self.assertEqual({id: doc["tip_count"] for id, doc in self.store.documents.items()},
+                         {"a": 0, "b": 2, "c": 0, "d": 1, "e": 0})
+        self.assertEqual([gap["id"] for gap in self.kg.find_knowledge_gaps()], ["a", "c", "e"])
+
+        # Re-running leaves the state as it is
+        self.assertEqual(self.kg.migrate_gap_state(batch_size=10), (5, 3))
+
+    def test_a_tip_increments_tip_count_and_removes_the_gap_label(self):
+        self.assertIn("SET d.tip_count = coalesce(d.tip_count, 0) + 1", knowlege_graph.ADD_TIP_QUERY)
+        self.assertIn("REMOVE d:Gap", knowlege_graph.ADD_TIP_QUERY)
+        self.kg.migrate_gap_state()
+
+        self.assertEqual(self.kg.add_expert_tip("a", "Read the docs", "x1"), "tip-1")
+        self.assertEqual(self.kg.add_expert_tip("a", "And the source", "x1"), "tip-2")
+        self.assertIsNone(self.kg.add_expert_tip("missing", "Nothing to attach to", "x1"))
+
+        self.assertEqual(self.store.documents["a"]["tip_count"], 2)
+        self.assertEqual([gap["id"] for gap in self.kg.find_knowledge_gaps()], ["c", "e"])
+        # The gap read is a label scan, not an anti-join over HAS_TIP
+        self.assertNotIn("HAS_TIP", knowlege_graph.KNOWLEDGE_GAPS_QUERY)
+
+
+class SearchStore:
+    """
+    The document branch of SEARCH_QUERY, evaluated over the Document nodes of a MemoryKnowledgeGraph
+    """
+    def __init__(self, graph):
+        self.graph = graph
+
+    @staticmethod
+    def contains(value, fragment):
+        # toLower(value) CONTAINS toLower(fragment)
+        return value is not None and fragment.lower() in value.lower()
+
+    def search(self, search_query, search_terms, limit, cursor_score, cursor_id, include_summary_content):
+        rows = []
+        for _, doc in self.graph.graph.nodes(data=True):
+            if doc["label"] != "Document":
+                continue
+            title_match = self.contains(doc["title"], search_query)
+            filename_match = self.contains(doc["original_filename"], search_query)
+            matched = [kw for kw in doc["keywords"] if any(self.contains(kw, term) for term in search_terms)]
+            if not (title_match or filename_match or matched):
+                continue
+            score = ((2 if title_match else 1.5 if filename_match else 0) + len(matched)) / (2 + len(search_terms))
+            if cursor_score is None or score < cursor_score or (score == cursor_score and doc["id"] > cursor_id):
+                rows.append({"id": doc["id"], "relevance_score": score, "doc_type": "document",
+                             "gap_candidate": title_match or bool(matched)})
+        return sorted(rows, key=lambda row: (-row["relevance_score"], row["id"]))[:limit]
+
+
+class SearchParityTest(unittest.TestCase):
+    def setUp(self):
+        self.memory = MemoryKnowledgeGraph()
+        self.by_title = self.memory.add_document(knowledge("Neural Networks", ["layers"]))
+        self.by_keyword = self.memory.add_document(knowledge("Backprop", ["neural networks"]))
+        self.by_filename = self.memory.add_document(
+            dict(knowledge("Perceptrons"), original_filename="neural networks intro.pdf"))
+        self.memory.add_document(knowledge("SQL Basics", ["databases"]))
+        self.driver = StatementDriver({knowlege_graph.SEARCH_QUERY: SearchStore(self.memory).search})
+        self.neo4j = KnowledgeGraph(driver=self.driver)
+
+    def rows(self, kg, params):
+        return [{key: row[key] for key in ("id", "relevance_score", "doc_type", "gap_candidate")}
+                for row in kg.search_records(params)]
+
+    def test_gap_candidates_match_the_cypher(self):
+        params = services.search_params("neural networks", [], ["layers"], limit=10)
+        rows = self.rows(self.memory, params)
+
+        self.assertEqual(rows, self.rows(self.neo4j, params))
+        self.assertEqual({row["id"]: row["gap_candidate"] for row in rows},
+                         {self.by_title: True, self.by_keyword: True, self.by_filename: False})
+
+    def test_pages_match_the_cypher(self):
+        params = services.search_params("neural networks", [], [], limit=1)
+        for _ in range(3):
+            rows = self.rows(self.memory, params)
+            self.assertEqual(rows, self.rows(self.neo4j, params))
+            _, cursor = services.split_page(rows, 1)
+            if cursor is None:
+                break
+            params = services.search_params("neural networks", [], [], limit=1, cursor=services.decode_cursor(cursor))
+        self.assertIsNone(cursor)
+
+
+class SyntheticCorpusTest(unittest.TestCase):
+    def test_corpus_is_reproducible(self):
+        from benchmarks import corpus
+        first, second = MemoryKnowledgeGraph(), MemoryKnowledgeGraph()
+        created = corpus.generate(first, documents=30, experts=5, tips=40, summaries=4, seed=7, dimension=8)
+        corpus.generate(second, documents=30, experts=5, tips=40, summaries=4, seed=7, dimension=8)
+
+        self.assertEqual((len(created["documents"]), created["tips"], len(created["summaries"])), (30, 40, 4))
+        self.assertEqual(sorted(row["topic"] for row in first.get_topics()),
+                         sorted(row["topic"] for row in second.get_topics()))
+        self.assertTrue(first.find_knowledge_gaps())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from flask import Flask, jsonify
+
+import metrics
+import request_metrics
+from Model.generation import GenerationTimer
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test_latency_seconds", "Test latency", ["route"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, route="/a")
+
+        (labels, value), = histogram.samples()
+        self.assertEqual(labels, {"route": "/a"})
+        self.assertEqual(value["buckets"], [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+        self.assertEqual(value["count"], 4)
+        self.assertAlmostEqual(value["sum"], 3.65)
+
+    def test_exposition_renders_every_kind(self):
+        metrics.counter("test_exposition_total", "Test counter", ["kind"]).inc(kind='say "hi"')
+        metrics.histogram("test_exposition_seconds", "Test histogram", buckets=(1.0,)).observe(0.5)
+
+        text = metrics.exposition()
+        self.assertIn("# TYPE test_exposition_total counter", text)
+        self.assertIn('test_exposition_total{kind="say \\"hi\\""} 1', text)
+        self.assertIn("# TYPE test_exposition_seconds histogram", text)
+        self.assertIn('test_exposition_seconds_bucket{le="1.0"} 1', text)
+        self.assertIn('test_exposition_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn("test_exposition_seconds_count 1", text)
+
+    def test_generation_timer_skips_the_prompt(self):
+        timer = GenerationTimer()
+        timer.put([[1, 2, 3]])
+        self.assertIsNone(timer.time_to_first_token)
+        timer.put([4])
+        timer.end()
+        self.assertIsNotNone(timer.time_to_first_token)
+        self.assertGreaterEqual(timer.elapsed, timer.time_to_first_token)
+
+
+class RequestMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.before_request(request_metrics.begin_request)
+        self.app.after_request(request_metrics.end_request)
+        self.app.teardown_request(request_metrics.teardown_request)
+
+        @self.app.route('/items/<item_id>')
+        def item(item_id):
+            return jsonify({"id": item_id})
+
+        @self.app.route('/broken')
+        def broken():
+            raise RuntimeError("boom")
+
+        self.client = self.app.test_client()
+
+    def test_requests_are_labelled_by_route_template(self):
+        histogram = request_metrics.request_duration_seconds
+        before = histogram.count(method="GET", route="/items/<item_id>")
+        self.client.get('/items/1')
+        self.client.get('/items/2')
+
+        self.assertEqual(histogram.count(method="GET", route="/items/<item_id>"), before + 2)
+        self.assertEqual(request_metrics.requests_in_flight.value(), 0)
+
+    def test_exceptions_count_as_errors(self):
+        errors = request_metrics.request_errors_total
+        before = errors.value(method="GET", route="/broken")
+        self.client.get('/broken')
+
+        self.assertEqual(errors.value(method="GET", route="/broken"), before + 1)
+        self.assertEqual(request_metrics.requests_in_flight.value(), 0)
+
+
+    def test_propagated_exceptions_are_counted_once(self):
+        self.app.testing = True  # PROPAGATE_EXCEPTIONS: after_request does not run
+        requests = request_metrics.requests_total
+        before = requests.value(method="GET", route="/broken", status=500)
+        with self.assertRaises(RuntimeError):
+            self.client.get('/broken')
+
+        self.assertEqual(requests.value(method="GET", route="/broken", status=500), before + 1)
+        self.assertEqual(request_metrics.requests_in_flight.value(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+from unittest import mock
+import unittest
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from config import Config
+from mongo_setup import SlowQueryLogger, ensure_indexes, mongo_commands_total, mongo_slow_commands_total
+
+
+class FakeDb(dict):
+    def __missing__(self, name):
+        self[name] = mock.Mock()
+        return self[name]
+
+
+def command_event(name, command, request_id=1, duration_ms=0):
+    return SimpleNamespace(command_name=name, command={name: "users", **command}, connection_id=("db", 27017),
+                           request_id=request_id, database_name="knowledge_system",
+                           duration_micros=int(duration_ms * 1000))
+
+
+class EnsureIndexesTest(unittest.TestCase):
+    def test_declared_indexes_are_created(self):
+        db = FakeDb()
+        ensure_indexes(db)
+
+        db["users"].create_index.assert_called_once_with([("email", ASCENDING)], name="email_unique", unique=True)
+        self.assertEqual(db["query_log"].create_index.call_args_list, [
+            mock.call([("created_at", ASCENDING)], name="created_at_ttl",
+                      expireAfterSeconds=Config.QUERY_LOG_RETENTION_DAYS * 86400),
+            mock.call([("score", ASCENDING), ("created_at", ASCENDING)], name="score_created_at"),
+        ])
+
+    def test_a_failing_index_does_not_stop_the_others(self):
+        db = FakeDb()
+        db["users"].create_index.side_effect = OperationFailure("E11000 duplicate key error")
+
+        with self.assertLogs(level="ERROR") as logs:
+            ensure_indexes(db)
+        self.assertIn("email_unique", logs.output[0])
+        self.assertEqual(db["query_log"].create_index.call_count, 2)
+
+
+class SlowQueryLoggerTest(unittest.TestCase):
+    def setUp(self):
+        self.listener = SlowQueryLogger(threshold_ms=100)
+
+    def run_command(self, name, command, duration_ms, request_id=1):
+        self.listener.started(command_event(name, command, request_id))
+        self.listener.succeeded(command_event(name, command, request_id, duration_ms))
+
+    def test_only_slow_commands_are_logged(self):
+        slow = mongo_slow_commands_total.value(command="find")
+        with self.assertNoLogs(level="WARNING"):
+            self.run_command("find", {"filter": {"email": "ada@example.com"}}, duration_ms=5)
+
+        with self.assertLogs(level="WARNING") as logs:
+            self.run_command("find", {"filter": {"email": "ada@example.com"}}, duration_ms=250, request_id=2)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Slow MongoDB find on knowledge_system.users took 250.0ms", logs.output[0])
+        self.assertEqual(mongo_slow_commands_total.value(command="find"), slow + 1)
+
+    def test_logged_commands_keep_field_names_but_not_values(self):
+        command = {"filter": {"email": "ada@example.com", "role": "admin"}, "projection": {"password": 0}}
+        with self.assertLogs(level="WARNING") as logs:
+            self.run_command("find", command, duration_ms=500)
+
+        message = logs.output[0]
+        self.assertIn("['email', 'role']", message)
+        self.assertIn("['password']", message)
+        self.assertNotIn("ada@example.com", message)
+        self.assertNotIn("admin", message)
+
+    def test_driver_housekeeping_is_ignored(self):
+        sent = mongo_commands_total.value(command="hello", status="ok")
+        with self.assertNoLogs(level="WARNING"):
+            self.run_command("hello", {}, duration_ms=1000)
+        self.assertEqual(mongo_commands_total.value(command="hello", status="ok"), sent)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import json
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from slack_sdk import WebClient
+from notifications import SlackOutbox
+
+class FakeSlackHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        server.requests.append((time.monotonic(), self.path, json.loads(body or b'{}')))
+
+        if server.rate_limit_next > 0:
+            server.rate_limit_next -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            payload = {'ok': False, 'error': 'ratelimited'}
+        else:
+            self.send_response(200)
+            payload = {'ok': True, 'channel': 'C1', 'ts': '1.0'}
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+class TestSlackOutbox(unittest.TestCase):
+    def setUp(self):
+        """
+        Start a local fake Slack Web API and an outbox pointed at it
+        """
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSlackHandler)
+        self.server.requests = []
+        self.server.rate_limit_next = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        client = WebClient(token='xoxb-test', base_url=f'http://127.0.0.1:{self.server.server_port}/api/')
+        self.outbox = SlackOutbox(client, '#experts', window_seconds=0.3, min_interval_seconds=0.2,
+                                  topic_cooldown_seconds=60)
+
+    def tearDown(self):
+        self.outbox.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait_for_requests(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.server.requests) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.server.requests
+
+    def test_enqueue_does_not_block(self):
+        """
+        Enqueueing returns immediately even though posting happens later
+        """
+        started = time.monotonic()
+        self.assertTrue(self.outbox.enqueue([{'topic': 'Kubernetes'}], 'k8s basics'))
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(len(self.server.requests), 0)
+
+    def test_gaps_are_coalesced_into_one_digest(self):
+        """
+        Several searches within one window produce a single message listing each topic once
+        """
+        self.outbox.enqueue([{'topic': 'Kubernetes'}, {'topic': 'Helm'}], 'k8s basics')
+        self.outbox.enqueue([{'topic': 'Kubernetes'}], 'deploying pods')
+        self.outbox.enqueue([{'topic': 'Helm'}], 'helm charts')
+
+        requests = self.wait_for_requests(1)
+        time.sleep(0.5)
+        self.assertEqual(len(self.server.requests), 1)
+        text = requests[0][2]['text']
+        self.assertEqual(text.count('• Kubernetes'), 1)
+        self.assertEqual(text.count('• Helm'), 1)
+        self.assertIn('"deploying pods"', text)
+
+    def test_recently_notified_topics_are_suppressed(self):
+        """
+        A topic sent in one digest is not sent again during its cooldown
+        """
+        self.outbox.enqueue([{'topic': 'Kubernetes'}], 'k8s basics')
+        self.wait_for_requests(1)
+        self.outbox.enqueue([{'topic': 'Kubernetes'}, {'topic': 'Terraform'}], 'infra as code')
+        requests = self.wait_for_requests(2)
+        self.assertEqual(len(requests), 2)
+        self.assertNotIn('Kubernetes', requests[1][2]['text'])
+        self.assertIn('Terraform', requests[1][2]['text'])
+
+    def test_rate_limited_post_is_retried(self):
+        """
+        A 429 from Slack is retried after Retry-After seconds
+        """
+        self.server.rate_limit_next = 1
+        self.outbox.enqueue([{'topic': 'Kafka'}], 'event streaming')
+        requests = self.wait_for_requests(2)
+        self.assertEqual(len(requests), 2)
+        self.assertGreaterEqual(requests[1][0] - requests[0][0], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from passage_index import PassageIndex, chunk_pages, estimate_tokens, select_passages
+
+DOC_A = "0b6f1c1e-0000-4000-8000-00000000000a"
+DOC_B = "0b6f1c1e-0000-4000-8000-00000000000b"
+
+
+class ChunkingTest(unittest.TestCase):
+    def test_chunks_overlap_within_a_page(self):
+        words = [f"w{i}" for i in range(10)]
+        chunks = chunk_pages([" ".join(words), "", "last page"], chunk_words=4, overlap_words=1)
+
+        self.assertEqual(chunks, [
+            (1, "w0 w1 w2 w3"), (1, "w3 w4 w5 w6"), (1, "w6 w7 w8 w9"), (3, "last page")
+        ])
+
+    def test_selection_keeps_to_the_token_budget(self):
+        passages = [
+            {"score": 0.9, "text": "x" * 400},
+            {"score": 0.8, "text": "y" * 400},
+            {"score": 0.7, "text": "z" * 40},
+        ]
+        selected = select_passages(passages, token_budget=estimate_tokens("x" * 400) + 20)
+        self.assertEqual([passage["score"] for passage in selected], [0.9, 0.7])
+
+
+class PassageIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add(self, index, document_id, title, vectors):
+        chunks = [(page, f"{title} passage {page}") for page in range(1, len(vectors) + 1)]
+        return index.add_document(document_id, title, chunks, np.array(vectors, dtype=np.float32))
+
+    def test_search_returns_passages_with_their_document_and_page(self):
+        index = PassageIndex(self.path, search_block_rows=2)
+        self.add(index, DOC_A, "Kubernetes", [[1, 0, 0], [0.7, 0.7, 0]])
+        self.add(index, DOC_B, "Baking", [[0, 0, 1], [0, 1, 0], [0.1, 0, 1]])
+
+        hits = index.search([2, 0, 0], k=2)
+        self.assertEqual([(hit["document_id"], hit["page"]) for hit in hits], [(DOC_A, 1), (DOC_A, 2)])
+        self.assertAlmostEqual(hits[0]["score"], 1.0, places=4)
+        self.assertEqual(hits[1]["text"], "Kubernetes passage 2")
+        self.assertEqual([hit["title"] for hit in index.search([0, 0, 1], k=5, min_score=0.5)], ["Baking", "Baking"])
+
+    def test_index_is_reopened_from_disk(self):
+        index = PassageIndex(self.path)
+        self.add(index, DOC_A, "Kubernetes", [[1, 0], [0, 1]])
+
+        reopened = PassageIndex(self.path)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.stats()["embedding_bytes"], 2 * 2 * 4)
+        self.add(reopened, DOC_B, "Baking", [[-1, 0]])
+        self.assertEqual(reopened.search([-1, 0], k=1)[0]["text"], "Baking passage 1")
+
+    def test_uncommitted_appends_are_discarded(self):
+        index = PassageIndex(self.path)
+        self.add(index, DOC_A, "Kubernetes", [[1, 0]])
+        # An append interrupted before meta.json was updated
+        with open(os.path.join(self.path, "embeddings.f32"), "ab") as f:
+            f.write(np.zeros(2, dtype=np.float32).tobytes())
+        with open(os.path.join(self.path, "passages.txt"), "ab") as f:
+            f.write(b"half written")
+
+        reopened = PassageIndex(self.path)
+        self.add(reopened, DOC_B, "Baking", [[0, 1]])
+        self.assertEqual([hit["text"] for hit in reopened.search([0, 1], k=2)],
+                         ["Baking passage 1", "Kubernetes passage 1"])
+
+    def test_dimension_mismatch_is_rejected(self):
+        index = PassageIndex(self.path)
+        self.add(index, DOC_A, "Kubernetes", [[1, 0]])
+        with self.assertRaises(ValueError):
+            self.add(index, DOC_B, "Baking", [[1, 0, 0]])
+
+
+class QuantizedPassageIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((64, 16)).astype(np.float32)
+        self.queries = self.vectors[:8] + 0.1 * rng.standard_normal((8, 16)).astype(np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def build(self, dtype, path=None, batches=4):
+        index = PassageIndex(path or self.path, dtype=dtype)
+        for batch in np.array_split(np.arange(len(self.vectors)), batches):
+            chunks = [(1, str(row)) for row in batch]
+            index.add_document(DOC_A, "Vectors", chunks, self.vectors[batch])
+        return index
+
+    def test_quantized_search_is_rescored_at_full_precision(self):
+        with tempfile.TemporaryDirectory() as exact_path:
+            exact = self.build("float32", exact_path)
+            for dtype in ("float16", "int8"):
+                with self.subTest(dtype=dtype), tempfile.TemporaryDirectory() as path:
+                    index = self.build(dtype, path)
+                    for query in self.queries:
+                        expected = [(hit["text"], hit["score"]) for hit in exact.search(query, k=5, min_score=-1)]
+                        self.assertEqual([(hit["text"], hit["score"]) for hit in index.search(query, k=5, min_score=-1)],
+                                         expected)
+
+    def test_scanned_matrix_shrinks(self):
+        index = self.build("int8")
+        stats = index.stats()
+        self.assertEqual(stats["embedding_bytes"], 64 * 16 * 4)
+        self.assertEqual(stats["scan_bytes"], 64 * 16)
+
+    def test_int8_scales_are_recalibrated_as_the_index_doubles(self):
+        self.build("int8")
+        files = [name for name in os.listdir(self.path) if name.startswith("embeddings-")]
+        # 16, 32 and 64 rows each triggered a recalibration; only the last copy is kept
+        self.assertEqual(files, ["embeddings-64.i8"])
+
+    def test_reopening_with_another_dtype_converts_the_index(self):
+        self.build("float32")
+        quantized = PassageIndex(self.path, dtype="float16")
+        self.assertEqual(quantized.stats()["scan_bytes"], 64 * 16 * 2)
+        self.assertEqual(quantized.search(self.vectors[3], k=1)[0]["text"], "3")
+
+        PassageIndex(self.path, dtype="float32")
+        self.assertFalse([name for name in os.listdir(self.path) if name.startswith("embeddings-")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from Model.prompt_lookup import find_draft_tokens
+
+class TestPromptLookup(unittest.TestCase):
+    def test_copies_tokens_after_matching_ngram(self):
+        """
+        The tokens that followed the trailing n-gram earlier in the prompt are drafted
+        """
+        tokens = [1, 2, 3, 4, 5, 9, 2, 3]
+        self.assertEqual(find_draft_tokens(tokens, max_ngram_size=2, num_pred_tokens=3), [4, 5, 9])
+
+    def test_prefers_most_recent_match(self):
+        """
+        When the n-gram appears several times the latest occurrence wins
+        """
+        tokens = [7, 8, 1, 7, 8, 2, 7, 8]
+        self.assertEqual(find_draft_tokens(tokens, max_ngram_size=2, num_pred_tokens=1), [2])
+
+    def test_falls_back_to_shorter_ngrams(self):
+        """
+        A unigram match is used when no longer n-gram matches
+        """
+        tokens = [4, 6, 1, 2, 5, 6]
+        self.assertEqual(find_draft_tokens(tokens, max_ngram_size=3, num_pred_tokens=2), [1, 2])
+
+    def test_no_match_returns_empty_draft(self):
+        """
+        Nothing is drafted when the trailing token never appeared before
+        """
+        self.assertEqual(find_draft_tokens([1, 2, 3], max_ngram_size=3, num_pred_tokens=5), [])
+        self.assertEqual(find_draft_tokens([1], max_ngram_size=3, num_pred_tokens=5), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from query_log import QueryLog, decode_embeddings, queries_dropped_total
+
+
+class FakeCollection:
+    def __init__(self, block=False):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def insert_many(self, documents, ordered=True):
+        self.entered.set()
+        self.release.wait(5)
+        self.batches.append(list(documents))
+
+    @property
+    def sizes(self):
+        return [len(batch) for batch in self.batches]
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class QueryLogTest(unittest.TestCase):
+    def setUp(self):
+        self.embedding = np.ones(4, dtype=np.float32)
+
+    def make_log(self, collection, **kwargs):
+        log = QueryLog(lambda: collection, **kwargs)
+        self.addCleanup(log.stop)
+        return log
+
+    def record(self, log, count):
+        return [log.record(f"query {i}", self.embedding, 0.1, "search") for i in range(count)]
+
+    def test_entries_are_written_in_batches(self):
+        collection = FakeCollection()
+        log = self.make_log(collection, batch_size=3, flush_interval_seconds=60)
+        self.record(log, 7)
+
+        self.assertTrue(wait_for(lambda: collection.sizes == [3, 3]))
+        log.stop()
+        self.assertEqual(collection.sizes, [3, 3, 1])
+        entries = [entry for batch in collection.batches for entry in batch]
+        self.assertEqual([entry["query"] for entry in entries], [f"query {i}" for i in range(7)])
+        self.assertEqual(decode_embeddings([entry["embedding"] for entry in entries]).shape, (7, 4))
+
+    def test_partial_batches_are_written_at_the_flush_deadline(self):
+        collection = FakeCollection()
+        log = self.make_log(collection, batch_size=100, flush_interval_seconds=0.3)
+        self.record(log, 2)
+
+        time.sleep(0.05)
+        self.assertEqual(collection.sizes, [])
+        self.assertTrue(wait_for(lambda: collection.sizes == [2]))
+
+    def test_entries_are_dropped_when_the_queue_is_full(self):
+        collection = FakeCollection(block=True)
+        log = self.make_log(collection, batch_size=1, flush_interval_seconds=60, max_queue_size=2)
+        dropped = queries_dropped_total.value(reason="buffer_full")
+
+        self.assertEqual(self.record(log, 1), [True])
+        # The writer is stuck in insert_many with the first entry; two more fit in the queue
+        self.assertTrue(collection.entered.wait(2))
+        self.assertEqual(self.record(log, 3), [True, True, False])
+        self.assertEqual(queries_dropped_total.value(reason="buffer_full"), dropped + 1)
+
+        collection.release.set()
+        log.stop()
+        self.assertEqual(collection.sizes, [1, 1, 1])
+
+    def test_stop_flushes_the_buffer(self):
+        collection = FakeCollection()
+        log = self.make_log(collection, batch_size=100, flush_interval_seconds=60)
+        self.record(log, 5)
+
+        log.stop()
+        self.assertEqual(collection.sizes, [5])
+
+    def test_queries_without_an_embedding_are_skipped(self):
+        collection = FakeCollection()
+        log = self.make_log(collection)
+        self.assertFalse(log.record("query", None, 0.1, "search"))
+        log.stop()
+        self.assertEqual(collection.sizes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
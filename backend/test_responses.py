@@ -0,0 +1,91 @@
+from datetime import datetime
+import gzip
+import unittest
+from unittest import mock
+import zlib
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+import responses
+from responses import FastJSONProvider, compress_response, conditional_get
+
+
+class ResponseLayerTest(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        app.json = FastJSONProvider(app)
+        app.after_request(compress_response)
+        self.items = [{"title": f"Document {i}", "keywords": ["a", "b"]} for i in range(200)]
+
+        @app.route('/big')
+        def big():
+            return jsonify(self.items)
+
+        @app.route('/small')
+        def small():
+            return jsonify({"status": "ok"})
+
+        @app.route('/cached')
+        @conditional_get
+        def cached():
+            return jsonify(self.items)
+
+        self.app = app
+        self.client = app.test_client()
+
+    def test_output_matches_the_default_provider(self):
+        payload = {"b": 1, "a": [1.5, None, "é"], "when": datetime(2025, 1, 2, 3, 4, 5)}
+        fast = FastJSONProvider(self.app)
+        default = DefaultJSONProvider(self.app)
+        self.assertEqual(fast.loads(fast.dumps(payload)), default.loads(default.dumps(payload)))
+
+    def test_jsonify_encodes_with_orjson(self):
+        if responses.orjson is None:
+            self.skipTest("orjson is not installed")
+        payload = {"b": 1, "a": [1.5, None, "x"], "when": datetime(2025, 1, 2, 3, 4, 5)}
+        default_app = Flask(__name__)
+        default_app.json = DefaultJSONProvider(default_app)
+
+        for debug in (False, True):
+            with self.subTest(debug=debug):
+                self.app.debug = default_app.debug = debug  # debug pretty prints with indent=2
+                with mock.patch.object(responses.orjson, "dumps", wraps=responses.orjson.dumps) as dumps:
+                    with self.app.test_request_context():
+                        body = jsonify(payload).get_data()
+                self.assertEqual(dumps.call_count, 1)
+                with default_app.test_request_context():
+                    self.assertEqual(body, jsonify(payload).get_data())
+
+    def test_large_bodies_are_gzipped(self):
+        response = self.client.get('/big', headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(self.app.json.loads(gzip.decompress(response.data)), self.items)
+
+    def test_deflate_is_used_when_gzip_is_not_accepted(self):
+        response = self.client.get('/big', headers={"Accept-Encoding": "deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "deflate")
+        self.assertTrue(zlib.decompress(response.data))
+
+    def test_small_bodies_are_not_compressed(self):
+        response = self.client.get('/small', headers={"Accept-Encoding": "gzip"})
+        self.assertLess(len(response.data), Config.COMPRESSION_MIN_BYTES)
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_matching_etag_returns_304(self):
+        first = self.client.get('/cached')
+        etag = first.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        second = self.client.get('/cached', headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b"")
+
+        self.items.append({"title": "new"})
+        third = self.client.get('/cached', headers={"If-None-Match": etag})
+        self.assertEqual(third.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
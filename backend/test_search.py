@@ -0,0 +1,270 @@
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+import components
+from config import Config
+import services
+from benchmarks import stubs
+from query_cache import QueryAnalysisCache, query_cache
+from embedding_service import EmbeddingBatcher
+from knowlege_graph import KnowledgeGraph
+from query_log import QueryLog, decode_embeddings
+from passage_index import PassageIndex
+
+
+def search_row(id, title, score, gap_candidate=True, doc_type="document"):
+    return {
+        "id": id, "title": title, "fileLink": None, "viewLink": None,
+        "keywords": ["k"], "matched_keywords": ["k"], "field": "ML",
+        "meme_type": "application/pdf", "filename": f"{id}.pdf", "original_filename": f"{id}.pdf",
+        "relevance_score": score, "author": "a", "created_at": "2025-01-01",
+        "doc_type": doc_type, "summary_content": None, "gap_candidate": gap_candidate
+    }
+
+
+class FakeResult(list):
+    def consume(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, params=None, **kwargs):
+        # Like the real driver, keyword parameters are merged into params
+        params = {**(params or {}), **kwargs} or None
+        self.driver.queries.append(query)
+        self.driver.params.append(params)
+        return FakeResult(self.driver.rows[:params["limit"]] if params else self.driver.rows)
+
+
+class FakeDriver:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.params = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+
+class SearchPipelineTest(unittest.TestCase):
+    def setUp(self):
+        stubs.install(embed_delay=0, nlp_delay=0, llm_delay=0)
+        query_cache.clear()
+        self.driver = FakeDriver([
+            search_row("d1", "Neural Networks", 0.9),
+            search_row("s1", "Neural Networks", 0.5, gap_candidate=False, doc_type="summary"),
+            search_row("d2", "Backprop", 0.4, gap_candidate=False),
+        ])
+        components.component("graph").override(KnowledgeGraph(driver=self.driver))
+        self.query_log = FakeCollection()
+        self.saved_query_log = services.query_log
+        services.query_log = QueryLog(lambda: self.query_log, flush_interval_seconds=0)
+        self.passage_dir = tempfile.TemporaryDirectory()
+        components.component("passages").override(PassageIndex(self.passage_dir.name))
+
+    def tearDown(self):
+        services.query_log.stop()
+        services.query_log = self.saved_query_log
+        self.passage_dir.cleanup()
+        for name in ("embedder", "nlp", "llm", "graph", "passages"):
+            components.component(name).reset()
+
+    def test_gaps_come_from_candidate_rows(self):
+        gaps = services.gaps_from_search_records(self.driver.rows)
+        self.assertEqual(gaps, [{"topic": "Neural Networks", "id": "d1"}])
+
+    def test_gaps_are_limited(self):
+        rows = [search_row(f"d{i}", f"T{i}", 1.0) for i in range(8)]
+        self.assertEqual(len(services.gaps_from_search_records(rows)), 5)
+
+    def test_search_runs_a_single_graph_query(self):
+        payload, status = services.search("neural networks")
+        self.assertEqual(status, 200)
+        self.assertEqual(len(self.driver.queries), 1)
+        self.assertEqual(sorted(payload["results"]), ["Backprop", "Neural Networks"])
+        self.assertTrue(payload["has_gaps"])
+
+    def test_pages_carry_a_cursor_to_the_next_row(self):
+        payload, status = services.search("neural networks", limit=2)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.driver.params[0]["limit"], 3)
+        self.assertFalse(self.driver.params[0]["include_summary_content"])
+        self.assertEqual(services.decode_cursor(payload["next_cursor"]), (0.5, "s1"))
+
+        services.search("neural networks", limit=2, cursor=payload["next_cursor"])
+        self.assertEqual((self.driver.params[1]["cursor_score"], self.driver.params[1]["cursor_id"]), (0.5, "s1"))
+
+    def test_last_page_has_no_cursor(self):
+        payload, _ = services.search("neural networks", limit=10)
+        self.assertIsNone(payload["next_cursor"])
+
+    def test_bad_paging_arguments_are_rejected(self):
+        self.assertEqual(services.search("q", cursor="not-a-cursor")[1], 400)
+        self.assertEqual(services.search("q", limit=0)[1], 400)
+        self.assertEqual(services.chat("q", limit="ten")[1], 400)
+
+    def test_first_pages_are_logged_with_their_closest_passage_score(self):
+        services.index_passages("d1", "Neural Networks", ["neural networks"])
+        payload, _ = services.search("neural networks", limit=1)
+        services.search("neural networks", limit=1, cursor=payload["next_cursor"])
+        services.chat("quantum computing")
+        services.query_log.stop()
+
+        logged = [(entry["query"], entry["source"]) for entry in self.query_log.documents]
+        self.assertEqual(logged, [("neural networks", "search"), ("quantum computing", "chat")])
+        scores = [entry["score"] for entry in self.query_log.documents]
+        # Cosine similarities, comparable with GAP_SCORE_THRESHOLD whatever the keyword scores were
+        self.assertAlmostEqual(scores[0], 1.0, places=3)
+        self.assertLess(abs(scores[1]), Config.GAP_SCORE_THRESHOLD)
+        self.assertEqual(decode_embeddings([entry["embedding"] for entry in self.query_log.documents]).shape[0], 2)
+
+    def test_queries_score_zero_against_an_empty_passage_index(self):
+        services.search("neural networks")
+        services.query_log.stop()
+        self.assertEqual([entry["score"] for entry in self.query_log.documents], [0.0])
+
+    def test_chat_answers_from_indexed_passages(self):
+        self.assertEqual(services.index_passages("d1", "Neural Networks", ["", "quantum computing"]), 1)
+
+        payload, status = services.chat("quantum computing")
+        self.assertEqual(status, 200)
+        passage, = payload["context"]["passages"]
+        self.assertEqual((passage["document_id"], passage["title"], passage["page"]), ("d1", "Neural Networks", 2))
+        self.assertAlmostEqual(passage["score"], 1.0, places=3)
+
+    def test_stage_timings_are_recorded(self):
+        before = {stage: services.search_stage_runs.value(stage=stage) for stage in ("encode", "nlp", "graph", "llm")}
+        services.search("neural networks")
+        for stage, count in before.items():
+            self.assertEqual(services.search_stage_runs.value(stage=stage), count + 1)
+
+
+class QueryAnalysisCacheTest(unittest.TestCase):
+    def test_normalised_queries_share_an_entry(self):
+        cache = QueryAnalysisCache(maxsize=10)
+        cache.put("Neural  Networks ", np.ones(4, dtype=np.float32), ["nn"], ["neural", "network"])
+        embedding, entities, keywords = cache.get("neural networks")
+        self.assertEqual(embedding.dtype, np.float32)
+        self.assertEqual(entities, ["nn"])
+        self.assertEqual(keywords, ["neural", "network"])
+
+    def test_embeddings_are_stored_as_float16(self):
+        cache = QueryAnalysisCache(maxsize=10)
+        cache.put("q", np.ones(384, dtype=np.float32))
+        self.assertEqual(cache.stats()["embedding_bytes"], 384 * 2)
+
+    def test_embedding_only_entries_miss_full_lookups(self):
+        cache = QueryAnalysisCache(maxsize=10)
+        cache.put("q", np.ones(4))
+        self.assertIsNone(cache.get("q"))
+        self.assertIsNotNone(cache.get("q", parsed=False))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = QueryAnalysisCache(maxsize=2)
+        cache.put("a", np.ones(4), [], [])
+        cache.put("b", np.ones(4), [], [])
+        cache.get("a")
+        cache.put("c", np.ones(4), [], [])
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_analyze_query_reuses_cached_analysis(self):
+        stubs.install(embed_delay=0, nlp_delay=0, llm_delay=0)
+        query_cache.clear()
+        try:
+            runs = services.search_stage_runs.value(stage="encode")
+            first = services.analyze_query("Database indexing")
+            second = services.analyze_query("database   indexing")
+            self.assertEqual(services.search_stage_runs.value(stage="encode"), runs + 1)
+            np.testing.assert_allclose(first[0], second[0], rtol=1e-3, atol=1e-3)
+            self.assertEqual(first[2], second[2])
+        finally:
+            for name in ("embedder", "nlp", "llm"):
+                components.component(name).reset()
+
+
+class EmbeddingBatcherTest(unittest.TestCase):
+    def test_concurrent_requests_share_batches(self):
+        model = stubs.StubEmbedder(delay=0.02)
+        calls = []
+
+        def get_model():
+            calls.append(1)
+            return model
+
+        batcher = EmbeddingBatcher(get_model, max_batch_size=8, max_wait_ms=20)
+        texts = [f"query {i}" for i in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            vectors = list(pool.map(batcher.encode, texts))
+
+        self.assertLess(len(calls), len(texts))
+        for text, vector in zip(texts, vectors):
+            np.testing.assert_array_equal(vector, model.encode(text))
+
+    def test_encode_many_keeps_order(self):
+        model = stubs.StubEmbedder(delay=0)
+        batcher = EmbeddingBatcher(lambda: model, max_batch_size=3, max_wait_ms=1)
+        matrix = batcher.encode_many(["a", "b", "c", "d"])
+        self.assertEqual(matrix.shape, (4, model.dimension))
+        np.testing.assert_array_equal(matrix[3], model.encode("d"))
+
+    def test_queries_are_encoded_ahead_of_bulk_texts(self):
+        model = stubs.StubEmbedder(delay=0)
+        calls, first_call, release = [], threading.Event(), threading.Event()
+
+        class BlockingModel:
+            def encode(self, texts, **kwargs):
+                calls.append(list(texts))
+                first_call.set()
+                release.wait(5)
+                return model.encode(texts)
+
+        batcher = EmbeddingBatcher(BlockingModel, max_batch_size=4, max_wait_ms=1)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            bulk = pool.submit(batcher.encode_many, [f"passage {i}" for i in range(12)])
+            self.assertTrue(first_call.wait(2))
+            query = pool.submit(batcher.encode, "query")
+            while batcher.stats()["queued"] < 9:
+                time.sleep(0.001)
+            release.set()
+            np.testing.assert_array_equal(query.result(), model.encode("query"))
+            self.assertEqual(bulk.result().shape, (12, model.dimension))
+
+        # The query waited for the batch being encoded, then went first
+        self.assertEqual(calls[0], [f"passage {i}" for i in range(4)])
+        self.assertEqual(calls[1], ["query"] + [f"passage {i}" for i in range(4, 7)])
+        self.assertEqual(sum(len(call) for call in calls), 13)
+
+    def test_encoder_errors_reach_the_caller(self):
+        def broken():
+            raise RuntimeError("no model")
+
+        batcher = EmbeddingBatcher(broken, max_batch_size=2, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.encode("q")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import unittest
+
+from summarizer import ChatSummarizer, format_turns, turns_fingerprint
+
+
+class RecordingClient:
+    """
+    Stands in for GeminiClient: records every prompt and answers with a fixed-size summary
+    """
+    def __init__(self, summary_chars=200):
+        self.summary_chars = summary_chars
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            n = len(self.prompts)
+        return f"summary {n} ".ljust(self.summary_chars, "x")
+
+    @property
+    def sizes(self):
+        return [len(prompt) for prompt in self.prompts]
+
+
+def turns(count, start=0, chars=40):
+    return [{'question': f"question {i}".ljust(chars, "?"), 'answer': f"answer {i}".ljust(chars, ".")}
+            for i in range(start, start + count)]
+
+
+def stored(result):
+    content, turn_count, turns_hash = result
+    return {'content': content, 'turn_count': turn_count, 'turns_hash': turns_hash}
+
+
+class ChatSummarizerTest(unittest.TestCase):
+    def test_summary_is_reused_when_the_history_prefix_matches(self):
+        client = RecordingClient()
+        summarizer = ChatSummarizer(client)
+        conversation = turns(3)
+        previous = stored(summarizer.summarize("ml", conversation))
+        self.assertEqual(previous['turn_count'], 3)
+        self.assertEqual(previous['turns_hash'], turns_fingerprint(conversation))
+
+        conversation = conversation + turns(1, start=3)
+        summary, turn_count, _ = summarizer.summarize("ml", conversation, previous)
+
+        self.assertEqual((summary[:9], turn_count), ("summary 2", 4))
+        prompt = client.prompts[-1]
+        self.assertIn(previous['content'], prompt)
+        self.assertIn("question 3", prompt)
+        self.assertNotIn("question 0", prompt)
+
+    def test_unchanged_history_makes_no_call(self):
+        client = RecordingClient()
+        summarizer = ChatSummarizer(client)
+        conversation = turns(3)
+        previous = stored(summarizer.summarize("ml", conversation))
+
+        self.assertEqual(summarizer.summarize("ml", conversation, previous)[0], previous['content'])
+        self.assertEqual(len(client.prompts), 1)
+
+    def test_edited_history_is_summarised_from_scratch(self):
+        client = RecordingClient()
+        summarizer = ChatSummarizer(client)
+        conversation = turns(3)
+        previous = stored(summarizer.summarize("ml", conversation))
+
+        edited = [dict(conversation[0], answer="a different answer")] + conversation[1:] + turns(1, start=3)
+        summarizer.summarize("ml", edited, previous)
+
+        prompt = client.prompts[-1]
+        self.assertNotIn(previous['content'], prompt)
+        self.assertIn(format_turns(edited), prompt)
+
+    def test_long_history_is_summarised_map_reduce(self):
+        client = RecordingClient(summary_chars=50)
+        summarizer = ChatSummarizer(client, chunk_chars=200)
+        # 80 characters per turn: two turns per chunk
+        summarizer.summarize("ml", turns(6))
+
+        self.assertEqual(len(client.prompts), 4)
+        partial_prompts, reduce_prompt = client.prompts[:3], client.prompts[3]
+        for prompt in partial_prompts:
+            self.assertTrue(prompt.startswith("Summarize the key points"))
+            self.assertEqual(prompt.count("Q: "), 2)
+        self.assertTrue(reduce_prompt.startswith("Combine these partial summaries"))
+        self.assertEqual(reduce_prompt.count("Summary of part"), 3)
+        self.assertNotIn("Q: ", reduce_prompt)
+
+    def test_prompt_size_stays_flat_as_turns_are_appended(self):
+        client = RecordingClient()
+        summarizer = ChatSummarizer(client)
+        conversation, previous = [], None
+        for i in range(40):
+            conversation = conversation + turns(1, start=i)
+            previous = stored(summarizer.summarize("ml", conversation, previous))
+
+        folds = client.sizes[1:]
+        self.assertEqual(len(client.prompts), 40)
+        self.assertLess(max(folds) - min(folds), 20)
+        self.assertLess(folds[-1], len(format_turns(conversation)) / 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import unittest
+from unittest import mock
+
+from bson import ObjectId
+from flask import Flask, jsonify
+
+from auth import generate_token
+from config import Config
+import tracing
+
+
+class TracingTest(unittest.TestCase):
+    def test_spans_are_noops_without_a_trace(self):
+        self.assertIs(tracing.span("encode"), tracing.NOOP_SPAN)
+        with tracing.span("encode") as span:
+            span.set(rows=1)
+        self.assertIsNone(tracing.current_span())
+
+    def test_spans_nest_under_the_current_span(self):
+        root = tracing.start_trace("request")
+        with tracing.span("analyze_query"):
+            with tracing.span("nlp", tokens=3):
+                pass
+        with tracing.span("llm"):
+            pass
+        tree = tracing.finish_trace(root)
+
+        self.assertIsNone(tracing.current_span())
+        self.assertEqual([child["name"] for child in tree["children"]], ["analyze_query", "llm"])
+        self.assertEqual(tree["children"][0]["children"][0]["attrs"], {"tokens": 3})
+
+    def test_spans_from_pool_threads_join_the_trace(self):
+        root = tracing.start_trace("request")
+        encode = tracing.span("encode").start()
+
+        def work():
+            with tracing.span("graph"):
+                pass
+            encode.finish()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(contextvars.copy_context().run, work).result()
+        tree = tracing.finish_trace(root)
+
+        self.assertEqual([child["name"] for child in tree["children"]], ["encode", "graph"])
+        self.assertIsNotNone(tree["children"][0]["duration_ms"])
+
+    def traced_app(self):
+        app = Flask(__name__)
+        app.before_request(tracing.begin_request_trace)
+        app.after_request(tracing.end_request_trace)
+        app.teardown_request(tracing.abandon_request_trace)
+
+        @app.route('/work')
+        def work():
+            with tracing.span("graph"):
+                pass
+            return jsonify({"ok": True})
+
+        return app.test_client()
+
+    def test_debug_header_returns_the_tree_to_admins(self):
+        client = self.traced_app()
+        admin = {"X-Debug-Trace": "1", "Authorization": f"Bearer {generate_token(ObjectId(), 'admin')}"}
+        response = client.get('/work', headers=admin)
+        tree = json.loads(response.headers["X-Trace"])
+        self.assertEqual(tree["children"][0]["name"], "graph")
+        self.assertIn("graph;dur=", response.headers["Server-Timing"])
+
+        self.assertNotIn("X-Trace", client.get('/work').headers)
+
+    def test_debug_header_is_ignored_for_other_clients(self):
+        client = self.traced_app()
+        user = f"Bearer {generate_token(ObjectId(), 'user')}"
+        for headers in ({"X-Debug-Trace": "1"}, {"X-Debug-Trace": "1", "Authorization": user},
+                        {"X-Debug-Trace": "1", "Authorization": "Bearer nope"}):
+            with self.subTest(headers=headers):
+                response = client.get('/work', headers=headers)
+                self.assertNotIn("X-Trace", response.headers)
+                self.assertNotIn("Server-Timing", response.headers)
+
+        with mock.patch.object(Config, "TRACE_DEBUG_ADMIN_ONLY", False):
+            self.assertIn("X-Trace", client.get('/work', headers={"X-Debug-Trace": "1"}).headers)
+
+    def test_requests_are_sampled(self):
+        with mock.patch.object(Config, "TRACING_ENABLED", True), mock.patch.object(Config, "TRACE_SAMPLE_RATE", 0.0):
+            self.assertEqual(tracing.wants_trace({}), (False, False))
+        with mock.patch.object(Config, "TRACING_ENABLED", True), mock.patch.object(Config, "TRACE_SAMPLE_RATE", 1.0):
+            # Sampled traces go to the log only
+            self.assertEqual(tracing.wants_trace({"X-Debug-Trace": "1"}), (True, False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+Context-local request tracing.
+
+A trace is a tree of named, timed spans. start_trace() makes a root span
+current for the running context (thread or asyncio task) and span() opens a
+child of whatever span is current. Without an active trace span() is a
+single ContextVar lookup returning a shared no-op object, so the
+instrumentation stays in the hot paths permanently.
+
+Finished traces are written to the "trace" logger as one JSON line; with
+TRACING_ENABLED a sampled fraction of requests is traced. When a request
+carries Config.TRACE_DEBUG_HEADER and an admin token, its span tree is also
+returned in the X-Trace response header and summarised in Server-Timing:
+per-stage timings are not handed to anonymous clients.
+"""
+import contextvars
+import json
+import logging
+import random
+import re
+import time
+
+from flask import g, request
+
+from config import Config
+from auth import AuthError, token_payload
+
+logger = logging.getLogger("trace")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "children", "started", "finished", "_token")
+
+    def __init__(self, name, attrs=None, parent=None):
+        """
+        A named, timed unit of work; use as a context manager, or start()/finish()
+        for work that completes on another thread
+        """
+        self.name = name
+        self.attrs = attrs or {}
+        self.children = []
+        self.started = None
+        self.finished = None
+        self._token = None
+        if parent is not None:
+            parent.children.append(self)
+
+    def start(self):
+        self.started = time.perf_counter()
+        return self
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        return False
+
+    @property
+    def duration_ms(self):
+        if self.started is None or self.finished is None:
+            return None
+        return (self.finished - self.started) * 1000
+
+    def to_dict(self, origin=None):
+        origin = self.started if origin is None else origin
+        node = {
+            "name": self.name,
+            "start_ms": round((self.started - origin) * 1000, 3) if self.started is not None else None,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None
+        }
+        if self.attrs:
+            node["attrs"] = self.attrs
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def start(self):
+        return self
+
+    def finish(self):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attrs):
+    """
+    Child span of the current span, or a no-op when nothing is being traced
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, attrs, parent)
+
+
+def current_span():
+    return _current.get()
+
+
+def start_trace(name, **attrs):
+    """
+    Start a root span and make it current; pass it to finish_trace when done
+    """
+    root = Span(name, attrs)
+    root.__enter__()
+    return root
+
+
+def finish_trace(root):
+    """
+    End the root span, log the tree and return it as a dict
+    """
+    root.__exit__(None, None, None)
+    tree = root.to_dict()
+    logger.info(json.dumps({"trace": tree}, default=str))
+    return tree
+
+
+def may_debug(headers):
+    """
+    Whether the trace may go back in the response: only for admin tokens, unless TRACE_DEBUG_ADMIN_ONLY is off
+    """
+    if not Config.TRACE_DEBUG_ADMIN_ONLY:
+        return True
+    try:
+        # The role is in the signed token, so this needs no user lookup
+        token_payload(headers.get('Authorization'), admin_only=True)
+    except AuthError:
+        return False
+    return True
+
+
+def wants_trace(headers):
+    """
+    Whether a request with these headers is traced, and whether the trace goes back in the response
+    """
+    debug = bool(Config.TRACE_DEBUG_HEADER and headers.get(Config.TRACE_DEBUG_HEADER)) and may_debug(headers)
+    sampled = Config.TRACING_ENABLED and random.random() < Config.TRACE_SAMPLE_RATE
+    return sampled or debug, debug
+
+
+def _metric_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+
+def response_headers(root, tree):
+    """
+    X-Trace (the span tree as JSON) and Server-Timing (every span's duration)
+    """
+    timings = ", ".join(
+        f"{_metric_name(s.name if s is not root else 'total')};dur={s.duration_ms:.1f}"
+        for s in root.walk() if s.duration_ms is not None
+    )
+    return {"X-Trace": json.dumps(tree, separators=(",", ":"), default=str), "Server-Timing": timings}
+
+
+# Flask hooks (registered in app.py)
+def begin_request_trace():
+    traced, debug = wants_trace(request.headers)
+    if traced:
+        g.trace = start_trace(f"{request.method} {request.path}", endpoint=request.endpoint)
+        g.trace_debug = debug
+
+
+def end_request_trace(response):
+    root = g.pop("trace", None)
+    if root is None:
+        return response
+
+    root.set(status=response.status_code)
+    tree = finish_trace(root)
+    if g.pop("trace_debug", False):
+        response.headers.update(response_headers(root, tree))
+    return response
+
+
+def abandon_request_trace(exc=None):
+    # after_request does not run when a view raises; still close the trace
+    root = g.pop("trace", None)
+    if root is not None:
+        if exc is not None:
+            root.set(error=type(exc).__name__)
+        finish_trace(root)
@@ -1,7 +1,7 @@
 import logging
 import os
-import spacy
 from dotenv import load_dotenv
+import components
 
 # Configure logging
 logging.basicConfig(
@@ -16,14 +16,11 @@ logging.basicConfig(
 # Load environment variables
 load_dotenv()
 
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
-
 def extract_keywords(text):
     """
     Extract keywords from text using spaCy
     """
-    doc = nlp(text)
+    doc = components.get("nlp")(text)
     
     # Extract noun phrases, proper nouns, and entities
     keywords = []
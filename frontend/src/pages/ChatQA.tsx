@@ -21,6 +21,7 @@ export default function ChatQA() {
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [isLoading, setIsLoading] = useState(false);
   const [summary, setSummary] = useState("");
+  const [summaryId, setSummaryId] = useState<string | null>(null);
 
   // Function to generate AI questions using the backend endpoint
   const generateQuestions = async () => {
@@ -91,10 +92,12 @@ export default function ChatQA() {
       const response = await api.post("/ai/summarize-chat", {
         topic,
         conversation,
+        summary_id: summaryId,
       });
       const data = response.data;
       if (data.summary) {
         setSummary(data.summary);
+        setSummaryId(data.summary_id ?? null);
         toast.success("Chat summarized successfully!");
       } else {
         toast.error("Failed to generate summary");
@@ -12,6 +12,7 @@ interface Message {
     documents_found: number;
     relevant_topics: string[];
     documents?: Array<{
+      id: string;
       title: string;
       original_filename: string;
       field: string;
@@ -142,11 +143,26 @@ export default function ChatWithAI() {
     }
   };
 
-  const handleDocumentClick = (
+  const handleDocumentClick = async (
     doc: NonNullable<NonNullable<Message["context"]>["documents"]>[0]
   ) => {
-    if (doc.doc_type === "summary" && doc.summary_content) {
-      setSelectedSummary(doc.summary_content);
+    if (doc.doc_type === "summary") {
+      // Chat context leaves summary content out; fetch it when opened
+      if (doc.summary_content) {
+        setSelectedSummary(doc.summary_content);
+        return;
+      }
+      try {
+        const response = await fetch(`http://localhost:8080/api/summaries/${doc.id}`);
+        const data = await response.json();
+        if (response.ok) {
+          setSelectedSummary(data.content);
+        } else {
+          console.error("Summary error: ", data.error);
+        }
+      } catch (error) {
+        console.error("Error loading summary: ", error);
+      }
     } else if (doc.fileLink) {
       window.open(doc.fileLink, "_blank");
     }
@@ -100,9 +100,24 @@ export default function SearchKnowledge() {
     setHasSearched(true);
   };
 
-  const handleDocumentClick = (doc: SearchResult) => {
-    if (doc.doc_type === "summary" && doc.summary_content) {
-      setSelectedSummary(doc.summary_content);
+  const handleDocumentClick = async (doc: SearchResult) => {
+    if (doc.doc_type === "summary") {
+      // Search results leave summary content out; fetch it when opened
+      if (doc.summary_content) {
+        setSelectedSummary(doc.summary_content);
+        return;
+      }
+      try {
+        const response = await fetch(`http://localhost:8080/api/summaries/${doc.id}`);
+        const data = await response.json();
+        if (response.ok) {
+          setSelectedSummary(data.content);
+        } else {
+          console.error("Summary error: ", data.error);
+        }
+      } catch (error) {
+        console.error("Error loading summary: ", error);
+      }
     } else if (doc.fileLink) {
       window.open(doc.fileLink, "_blank");
     }